@@ -0,0 +1,115 @@
+"""
+analytics.py
+Runs the checks in validation_queries.sql offline, with the embedded DuckDB
+engine, over the table snapshot written by flask_app/export_to_csv.py --tables.
+
+The queries are read from validation_queries.sql unchanged, so the file stays
+the single definition for both MySQL Workbench and this command. DuckDB
+reads the Parquet snapshot in place (columnar, nothing loaded up front), so
+the full set runs in milliseconds on a laptop without touching Aiven. The
+one MySQL-only function used there, FIELD(), is provided as a macro.
+
+Usage:
+    python flask_app/export_to_csv.py --tables     # once, writes exports/*.parquet
+    python analytics.py
+    python analytics.py --data exports --query 3 --query 6 --output validation_results
+"""
+
+import argparse
+import re
+import time
+from pathlib import Path
+
+QUERIES_PATH = Path(__file__).with_name("validation_queries.sql")
+DATA_DIR = "exports"
+TABLES = ("participants", "phq9_responses", "typing_data", "consent_records")
+
+# MySQL's FIELD(x, a, b, ...): 1-based position of x in the list, 0 if absent
+FIELD_MACRO = """
+    CREATE MACRO field(x, a, b := NULL, c := NULL, d := NULL, e := NULL, f := NULL) AS
+    CASE WHEN x IS NULL THEN 0 ELSE coalesce(list_position([a, b, c, d, e, f], x), 0) END
+"""
+
+_HEADER = re.compile(r"^--\s*(\d+)\.\s*(.+)$")
+
+
+def load_queries(path=QUERIES_PATH):
+    """[(number, title, sql)] for each numbered query in validation_queries.sql"""
+    queries, number, title, lines = [], None, None, []
+    for line in Path(path).read_text().splitlines():
+        header = _HEADER.match(line.strip())
+        if header:
+            number, title, lines = int(header.group(1)), header.group(2).strip(), []
+        elif number is not None and not line.strip().startswith("--"):
+            lines.append(line)
+            if line.rstrip().endswith(";"):
+                queries.append((number, title, "\n".join(lines).strip().rstrip(";")))
+                number = None
+    return queries
+
+
+def connect(data_dir=DATA_DIR):
+    """In-memory DuckDB with one view per exported table"""
+    try:
+        import duckdb
+    except ImportError:
+        raise SystemExit("duckdb is not installed (pip install duckdb)")
+
+    con = duckdb.connect()
+    for table in TABLES:
+        parquet = Path(data_dir) / f"{table}.parquet"
+        csv = Path(data_dir) / f"{table}.csv"
+        if parquet.exists():
+            source = f"read_parquet('{parquet.as_posix()}')"
+        elif csv.exists():
+            source = f"read_csv_auto('{csv.as_posix()}')"
+        else:
+            raise SystemExit(f"{parquet} not found - run: python flask_app/export_to_csv.py --tables")
+        con.execute(f"CREATE VIEW {table} AS SELECT * FROM {source}")
+    con.execute(FIELD_MACRO)
+    return con
+
+
+def run_queries(con, queries):
+    """[(number, title, DataFrame, seconds)]"""
+    results = []
+    for number, title, sql in queries:
+        start = time.perf_counter()
+        df = con.execute(sql).df()
+        results.append((number, title, df, time.perf_counter() - start))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run validation_queries.sql offline over an export")
+    parser.add_argument("--data", default=DATA_DIR, help="directory with <table>.parquet (or .csv)")
+    parser.add_argument("--query", type=int, action="append", help="query number(s) to run (default: all)")
+    parser.add_argument("--output", help="also write each result to <output>/query_<n>.csv")
+    parser.add_argument("--max-rows", type=int, default=20, help="rows printed per result")
+    args = parser.parse_args()
+
+    queries = load_queries()
+    if args.query:
+        queries = [q for q in queries if q[0] in args.query]
+    con = connect(args.data)
+    results = run_queries(con, queries)
+
+    print("=" * 60)
+    print("VALIDATION QUERIES (offline)")
+    print("=" * 60)
+    for number, title, df, seconds in results:
+        print(f"\n{number}. {title}  [{len(df)} rows, {seconds * 1000:.1f} ms]")
+        if df.empty:
+            print("  (no rows)")
+        else:
+            print(df.head(args.max_rows).to_string(index=False))
+            if len(df) > args.max_rows:
+                print(f"  ... {len(df) - args.max_rows} more rows")
+        if args.output:
+            Path(args.output).mkdir(exist_ok=True)
+            df.to_csv(Path(args.output) / f"query_{number}.csv", index=False)
+    print(f"\n{len(results)} queries in {sum(r[3] for r in results) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
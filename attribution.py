@@ -0,0 +1,145 @@
+"""
+attribution.py
+Feature attribution for ml_training.py beyond impurity importances.
+
+Permutation importance is the drop in held-out score when one feature
+column is shuffled. Every (feature, repeat) pair is independent, so the
+pairs are spread across worker processes in batches. Optionally, mean
+|SHAP| values are added for tree models when the `shap` package is installed.
+
+Results are cached in importance_cache/<model checksum>.json, so re-running
+the report for an unchanged model and test split skips the computation.
+
+Usage:
+    python ml_training.py --attribution
+    python ml_training.py --attribution --shap --importance-repeats 20
+"""
+
+import copy
+import json
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.metrics import accuracy_score, roc_auc_score
+
+CACHE_DIR = 'importance_cache'
+SHAP_MAX_ROWS = 2000
+
+
+def _stack(X_base, extra):
+    """Same column layout as DepressionClassifier._with_extra"""
+    if not extra:
+        return X_base
+    import scipy.sparse as sp
+    if any(sp.issparse(block) for block in extra):
+        return sp.hstack([sp.csr_matrix(X_base), *extra], format='csr')
+    return np.hstack([X_base, *extra])
+
+
+def _score(model, X, y):
+    if len(np.unique(y)) > 1:
+        return roc_auc_score(y, model.predict_proba(X)[:, 1])
+    return accuracy_score(y, model.predict(X))
+
+
+def _score_batch(model, X_base, extra, y, tasks, seed):
+    """Score the permuted copies for one batch of (feature, repeat) tasks in a worker"""
+    X_perm = X_base.copy()
+    out = []
+    for j, r in tasks:
+        rng = np.random.default_rng([seed, j, r])
+        X_perm[:, j] = X_base[rng.permutation(len(X_base)), j]
+        out.append((j, r, _score(model, _stack(X_perm, extra), y)))
+        X_perm[:, j] = X_base[:, j]
+    return out
+
+
+def permutation_importance(model, X_base, y, extra=None, n_repeats=10, n_jobs=-1, seed=42):
+    """
+    Mean/std score drop per column of X_base (dense, already transformed).
+    Extra blocks are appended unpermuted. Returns (means, stds, baseline score).
+    """
+    X_base = np.asarray(X_base, dtype=np.float64)
+    y = np.asarray(y)
+    baseline = _score(model, _stack(X_base, extra), y)
+    if 'n_jobs' in model.get_params():
+        # The batches are already parallel. Set it on a copy: with an in-process
+        # backend the workers share the caller's estimator, which is saved later.
+        model = copy.deepcopy(model)
+        model.set_params(n_jobs=1)
+    tasks = [(j, r) for j in range(X_base.shape[1]) for r in range(n_repeats)]
+    n_batches = min(len(tasks), max(1, effective_n_jobs(n_jobs) * 2))
+    batches = [tasks[i::n_batches] for i in range(n_batches)]
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_score_batch)(model, X_base, extra, y, batch, seed) for batch in batches
+    )
+    drops = np.zeros((X_base.shape[1], n_repeats))
+    for batch in results:
+        for j, r, score in batch:
+            drops[j, r] = baseline - score
+    return drops.mean(axis=1), drops.std(axis=1), baseline
+
+
+def shap_importance(model, X_base, extra=None, max_rows=SHAP_MAX_ROWS, seed=42):
+    """Mean |SHAP| for the positive class per column of X_base (None without `shap`)"""
+    try:
+        import shap
+    except ImportError:
+        print("shap is not installed (pip install shap); skipping SHAP values")
+        return None
+    X = _stack(np.asarray(X_base, dtype=np.float64), extra)
+    if X.shape[0] > max_rows:
+        rows = np.random.default_rng(seed).choice(X.shape[0], max_rows, replace=False)
+        X = X[rows]
+    values = shap.TreeExplainer(model).shap_values(X)
+    if isinstance(values, list):  # older shap: one array per class
+        values = values[-1]
+    values = np.asarray(values)
+    if values.ndim == 3:          # (rows, features, classes)
+        values = values[..., -1]
+    return np.abs(values).mean(axis=0)[:X_base.shape[1]]
+
+
+def feature_attribution(model, X_base, y, feature_names, extra=None, n_repeats=10,
+                        n_jobs=-1, with_shap=False, cache_dir=CACHE_DIR, seed=42):
+    """
+    Permutation (and optionally SHAP) importance table for the dense features,
+    sorted by permutation importance; cached per model checksum.
+    """
+    model_checksum = joblib.hash(model)
+    data_checksum = joblib.hash([np.asarray(X_base), extra, np.asarray(y), list(feature_names),
+                                 n_repeats, seed])
+    cache_path = Path(cache_dir) / f"{model_checksum}.json"
+    if cache_path.exists():
+        cached = json.loads(cache_path.read_text())
+        if cached['data_checksum'] == data_checksum and (cached['has_shap'] or not with_shap):
+            print(f"Feature attribution loaded from cache ({cache_path})")
+            return pd.DataFrame(cached['table'])
+
+    print(f"Permutation importance: {len(feature_names)} features x {n_repeats} repeats "
+          f"on {effective_n_jobs(n_jobs)} workers...")
+    means, stds, baseline = permutation_importance(model, X_base, y, extra, n_repeats, n_jobs, seed)
+    table = pd.DataFrame({
+        'feature': list(feature_names),
+        'permutation_importance': means,
+        'permutation_std': stds,
+    })
+    if with_shap:
+        shap_values = shap_importance(model, X_base, extra, seed=seed)
+        if shap_values is not None:
+            table['shap_mean_abs'] = shap_values
+    table = table.sort_values('permutation_importance', ascending=False).reset_index(drop=True)
+
+    Path(cache_dir).mkdir(exist_ok=True)
+    cache_path.write_text(json.dumps({
+        'model_checksum': model_checksum,
+        'data_checksum': data_checksum,
+        'baseline_score': baseline,
+        'has_shap': 'shap_mean_abs' in table,
+        'table': table.to_dict(orient='list'),
+    }, indent=2))
+    return table
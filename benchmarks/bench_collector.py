@@ -0,0 +1,286 @@
+"""
+bench_collector.py
+Throughput of the sync collector (flask_app/app.py behind N sync workers,
+as gunicorn runs it) against the async one (flask_app/asgi_app.py under
+uvicorn) when every INSERT waits on a remote database.
+
+The database is simulated: each statement and the commit sleep for
+--db-latency seconds (time.sleep for mysql.connector, asyncio.sleep for
+aiomysql), so the comparison isolates how each server overlaps that wait.
+Both servers run in-process on localhost and are driven by the same
+asyncio load generator with --concurrency requests in flight. Like
+index.html, a client answered 503 (admission.py shedding load) waits a
+Retry-After plus a full-jitter backoff and sends again; those
+responses are reported as "shed", and latency runs to the final answer.
+
+Usage:
+    python -m benchmarks.bench_collector
+    python -m benchmarks.bench_collector --requests 2000 --concurrency 200 --workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "flask_app"))
+
+PAYLOAD = {
+    "participant_id": "bench", "session_id": "bench",
+    "age": 21, "gender": "Female", "year_of_study": "2",
+    "phq9_total": 11, "phq9_severity": "Moderate", "phq9_scores": [1, 2, 1, 1, 2, 1, 1, 1, 1],
+    "copy_duration": 61.2, "copy_text": "The quick brown fox jumps over the lazy dog. " * 6,
+    "free_duration": 122.9, "free_text": "I usually walk to class in the morning. " * 20,
+    "consent_screenshot": None,
+}
+
+
+# ─────────────────────────────────────────
+# Simulated database
+# ─────────────────────────────────────────
+class FakeCursor:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def execute(self, sql, params=None):
+        time.sleep(self.latency)
+
+    def executemany(self, sql, seq_params):
+        time.sleep(self.latency)   # one multi-row INSERT, one round trip
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def cursor(self):
+        return FakeCursor(self.latency)
+
+    def commit(self):
+        time.sleep(self.latency)
+
+    def close(self):
+        pass
+
+
+class FakeAsyncCursor:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def execute(self, sql, params=None):
+        await asyncio.sleep(self.latency)
+
+    async def fetchall(self):
+        return []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeAsyncConnection:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def cursor(self):
+        return FakeAsyncCursor(self.latency)
+
+    async def commit(self):
+        await asyncio.sleep(self.latency)
+
+    async def rollback(self):
+        pass
+
+
+class FakePool:
+    """aiomysql.Pool surface used by asgi_app: at most maxsize connections out at once"""
+
+    def __init__(self, latency, maxsize):
+        self.latency = latency
+        self._slots = asyncio.Semaphore(maxsize)
+
+    async def acquire(self):
+        await self._slots.acquire()
+        return FakeAsyncConnection(self.latency)
+
+    def release(self, conn):
+        self._slots.release()
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+# ─────────────────────────────────────────
+# Servers
+# ─────────────────────────────────────────
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class PooledWSGIServer(ThreadingMixIn, WSGIServer):
+    """N request threads, like gunicorn with N sync workers: the N+1th request queues"""
+    request_queue_size = 1024
+
+    def __init__(self, *args, workers=4, **kwargs):
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        super().__init__(*args, **kwargs)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self.process_request_thread, request, client_address)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_sync(latency, workers):
+    import app as sync_app
+
+    sync_app.get_db = lambda: FakeConnection(latency)
+    port = free_port()
+    server = make_server("127.0.0.1", port, sync_app.app, handler_class=QuietHandler,
+                         server_class=lambda *a, **kw: PooledWSGIServer(*a, workers=workers, **kw))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return port, server.shutdown
+
+
+def start_async(latency, pool_max):
+    import uvicorn
+    import asgi_app
+
+    async def pool_factory():
+        return FakePool(latency, pool_max)
+
+    port = free_port()
+    app = asgi_app.create_app(pool_factory=pool_factory)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port,
+                                           log_level="warning", backlog=1024))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return port, stop
+
+
+# ─────────────────────────────────────────
+# Load generator
+# ─────────────────────────────────────────
+async def post(port, body):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        b"POST /submit HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head = response.split(b"\r\n\r\n", 1)[0].split(b"\r\n")
+    headers = dict(line.lower().split(b": ", 1) for line in head[1:])
+    return int(head[0].split(b" ", 2)[1]), float(headers.get(b"retry-after", 0))
+
+
+def backoff(attempt, retry_after, base=1.0, cap=30.0):
+    """index.html's backoffMs, in seconds"""
+    return retry_after + random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+async def load(port, n_requests, concurrency):
+    body = json.dumps(PAYLOAD).encode()
+    latencies, failures, shed = [], 0, 0
+    remaining = iter(range(n_requests))
+
+    async def client():
+        nonlocal failures, shed
+        for _ in remaining:
+            start = time.perf_counter()
+            for attempt in range(8):
+                status, retry_after = await post(port, body)
+                if status != 503:
+                    break
+                shed += 1
+                await asyncio.sleep(backoff(attempt, retry_after))
+            if status != 200:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": n_requests,
+        "failures": failures,
+        "shed": shed,
+        "throughput_rps": n_requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+
+def run(name, start, args):
+    port, stop = start()
+    try:
+        asyncio.run(load(port, min(args.concurrency, 20), min(args.concurrency, 20)))  # warm-up
+        stats = asyncio.run(load(port, args.requests, args.concurrency))
+    finally:
+        stop()
+    print(f"  {name:<30} {stats['throughput_rps']:>8.1f} req/s"
+          f"   p50 {stats['p50_ms']:>7.1f} ms   p95 {stats['p95_ms']:>7.1f} ms"
+          f"   shed {stats['shed']:>4}   failures {stats['failures']}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sync and async /submit collectors")
+    parser.add_argument("--requests", type=int, default=1000, help="timed submissions per server")
+    parser.add_argument("--concurrency", type=int, default=100, help="submissions in flight")
+    parser.add_argument("--workers", type=int, default=4, help="sync workers (gunicorn -w)")
+    parser.add_argument("--pool-max", type=int, default=20, help="async connection pool size")
+    parser.add_argument("--db-latency", type=float, default=0.02,
+                        help="simulated seconds per statement and per commit")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("COLLECTOR BENCHMARK")
+    print("=" * 60)
+    print(f"{args.requests} submissions, {args.concurrency} in flight, "
+          f"{args.db_latency * 1000:.0f} ms per DB round trip (5 per submission)\n")
+
+    sync = run(f"sync ({args.workers} workers)",
+               lambda: start_sync(args.db_latency, args.workers), args)
+    asyn = run(f"async (pool {args.pool_max})",
+               lambda: start_async(args.db_latency, args.pool_max), args)
+    print(f"\n  async / sync throughput: {asyn['throughput_rps'] / sync['throughput_rps']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
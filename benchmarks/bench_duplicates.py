@@ -0,0 +1,79 @@
+"""
+bench_duplicates.py
+Lookup cost of flask_app/duplicates.DuplicateIndex (MinHash LSH) as the
+participant table grows, against comparing the new signature with every
+indexed one, plus recall on planted near-duplicates (a few words edited).
+
+Usage:
+    python -m benchmarks.bench_duplicates
+    python -m benchmarks.bench_duplicates --scales 1000,10000,50000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "flask_app"))
+
+from benchmarks.synthetic import make_rows  # noqa: E402
+from duplicates import DuplicateIndex  # noqa: E402
+
+
+def edit(rng, text, fraction):
+    words = text.split()
+    for i in rng.sample(range(len(words)), max(1, int(len(words) * fraction))):
+        words[i] = rng.choice(["zebra", "banana", "quantum", "harbour", "violet"])
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate lookups")
+    parser.add_argument("--scales", default="1000,5000,20000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--edit-fraction", type=float, default=0.05,
+                        help="share of words replaced in the planted near-duplicates")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print("=" * 60)
+    print("NEAR-DUPLICATE INDEX")
+    print("=" * 60)
+    print(f"  {'indexed':>9} {'build s':>9} {'signature':>11} {'LSH lookup':>11} {'full scan':>11} {'recall':>7}")
+    for n in [int(s) for s in args.scales.split(",")]:
+        rows = make_rows(n, seed=n)
+        index = DuplicateIndex()
+        start = time.perf_counter()
+        index.add_rows((r["participant_id"], r["free_writing_text"], None, None, None) for r in rows)
+        build = time.perf_counter() - start
+
+        targets = rng.sample(rows, min(args.queries, n))
+        sigs = [index.signature(edit(rng, r["free_writing_text"], args.edit_fraction)) for r in targets]
+        start = time.perf_counter()
+        for r in targets[:50]:
+            index.signature(r["free_writing_text"])
+        signature_ms = (time.perf_counter() - start) / min(50, len(targets)) * 1000
+
+        start = time.perf_counter()
+        found = [index._lookup(sig, None) for sig in sigs]
+        lookup_ms = (time.perf_counter() - start) / len(sigs) * 1000
+
+        matrix = np.stack(list(index.signatures.values()))
+        start = time.perf_counter()
+        for sig in sigs[:20]:
+            np.nonzero((matrix == sig).mean(axis=1) >= index.threshold)
+        scan_ms = (time.perf_counter() - start) / min(20, len(sigs)) * 1000
+
+        recall = np.mean([any(key == r["participant_id"] for key, _, _ in matches)
+                          for r, matches in zip(targets, found)])
+        print(f"  {n:>9,} {build:>9.2f} {signature_ms:>8.3f} ms {lookup_ms:>8.3f} ms "
+              f"{scan_ms:>8.3f} ms {recall:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+bench_payload.py
+Compression ratio and upload time of /submit bodies: plain JSON against the
+gzip body index.html now sends (CompressionStream, zlib level 6) and brotli
+when the `brotli` package is installed. Also times server-side decoding
+with flask_app/submission.BodyDecoder, and the per-request cost of
+submission.decode_submission (typed, validated) against plain json.loads,
+for valid payloads and for malformed ones that are rejected. Finally compares
+the two consent capture modes: the browser-rendered PDF against the
+structured consent record, and the server-side PDF rendered from the latter.
+
+Payloads are synthetic participants (benchmarks/synthetic.py) with a
+generated consent PDF; pass --pdf to use a real exported consent PDF.
+
+Usage:
+    python -m benchmarks.bench_payload
+    python -m benchmarks.bench_payload --participants 200 --pdf consent.pdf
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "flask_app"))
+
+from benchmarks.synthetic import make_consent_pdf, make_consent_record, make_rows, to_payload  # noqa: E402
+from consent import render_pdf  # noqa: E402
+from submission import READ_CHUNK, BodyDecoder, InvalidSubmission, decode_submission  # noqa: E402
+
+# Uplink Mbit/s: congested campus Wi-Fi, typical Wi-Fi, good connection
+BANDWIDTHS = (1.0, 5.0, 20.0)
+
+
+def encoders():
+    codecs = {"gzip": lambda body: gzip.compress(body, compresslevel=6)}
+    try:
+        import brotli
+        codecs["br"] = lambda body: brotli.compress(body, quality=5)
+    except ImportError:
+        print("brotli is not installed (pip install brotli); gzip only\n")
+    return codecs
+
+
+def decode(encoding, wire):
+    decoder = BodyDecoder(encoding)
+    for start in range(0, len(wire), READ_CHUNK):
+        decoder.feed(wire[start:start + READ_CHUNK])
+    return decoder.finish()
+
+
+def per_call_us(fn, bodies, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for body in bodies:
+            fn(body)
+    return (time.perf_counter() - start) / (repeat * len(bodies)) * 1e6
+
+
+def reject(body):
+    try:
+        decode_submission(body)
+    except InvalidSubmission:
+        return
+    raise AssertionError("malformed payload was accepted")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /submit body compression")
+    parser.add_argument("--participants", type=int, default=50)
+    parser.add_argument("--pdf", help="real consent PDF to embed instead of the synthetic one")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.pdf:
+        screenshot = base64.b64encode(Path(args.pdf).read_bytes()).decode()
+    else:
+        screenshot = make_consent_pdf(rng)
+    bodies = [json.dumps(to_payload(row, screenshot)).encode()
+              for row in make_rows(args.participants, seed=args.seed)]
+
+    print("=" * 60)
+    print("SUBMIT PAYLOAD COMPRESSION")
+    print("=" * 60)
+    raw = statistics.mean(len(b) for b in bodies)
+    print(f"{args.participants} payloads, mean {raw / 1000:.1f} KB plain JSON "
+          f"({len(screenshot) / 1000:.1f} KB of it the base64 consent PDF)\n")
+
+    rows = [("identity", lambda body: body)] + list(encoders().items())
+    header = "  ".join(f"{mbit:>5.0f} Mbit/s" for mbit in BANDWIDTHS)
+    print(f"  {'encoding':<10} {'KB':>8} {'ratio':>6}   upload: {header}   decode")
+    for name, encode in rows:
+        wires = [encode(body) for body in bodies]
+        size = statistics.mean(len(w) for w in wires)
+        start = time.perf_counter()
+        for body, wire in zip(bodies, wires):
+            assert decode(name, wire) == body
+        decode_ms = (time.perf_counter() - start) / len(bodies) * 1000
+        uploads = "  ".join(f"{size * 8 / (mbit * 1e6) * 1000:>9.0f} ms" for mbit in BANDWIDTHS)
+        print(f"  {name:<10} {size / 1000:>8.1f} {raw / size:>5.2f}x           {uploads}"
+              f"   {decode_ms:>5.2f} ms")
+
+    # Malformed: a string score deep in the payload, and a missing field
+    bad = [body.replace(b'"phq9_scores": [', b'"phq9_scores": ["x", ', 1) for body in bodies]
+    bad += [body.replace(b'"age"', b'"agee"', 1) for body in bodies]
+    print("\n  per-request decode")
+    print(f"  {'json.loads (no validation)':<36} {per_call_us(json.loads, bodies):>8.1f} us")
+    print(f"  {'decode_submission':<36} {per_call_us(decode_submission, bodies):>8.1f} us")
+    print(f"  {'decode_submission, rejected':<36} {per_call_us(reject, bad):>8.1f} us")
+
+    # Consent capture modes, whole payload and the consent part alone
+    records = [json.dumps(to_payload(row, consent=make_consent_record())).encode()
+               for row in make_rows(args.participants, seed=args.seed)]
+    consent_only = json.dumps(make_consent_record()).encode()
+    submissions = [decode_submission(body) for body in records]
+    rows = [{"participant_id": s.participant_id, "session_id": s.session_id, "ip_address": "10.0.0.1",
+             "consent_timestamp": "2026-03-02 10:31:12", "consent_record": s.consent_record,
+             "consent_sha256": s.consent_sha256, "data_version": "v2"} for s in submissions]
+    render_ms = per_call_us(render_pdf, rows, repeat=5) / 1000
+
+    def gzip_size(bodies):
+        return statistics.mean(len(gzip.compress(body, compresslevel=6)) for body in bodies)
+
+    print("\n  consent capture              consent part    payload (gzip)")
+    print(f"  {'screenshot (browser PDF)':<28} {len(screenshot) / 1000:>9.1f} KB   {gzip_size(bodies) / 1000:>8.1f} KB")
+    print(f"  {'record':<28} {len(consent_only) / 1000:>9.3f} KB   {gzip_size(records) / 1000:>8.1f} KB")
+    print(f"  consent part {len(screenshot) / len(consent_only):.0f}x smaller; "
+          f"server renders the PDF on demand in {render_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
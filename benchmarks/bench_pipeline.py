@@ -0,0 +1,213 @@
+"""
+bench_pipeline.py
+Times and memory-profiles the offline pipeline
+(export -> feature extraction -> training -> scoring) on synthetic datasets.
+
+Each run is written to benchmarks/results/<timestamp>.json. Pass --compare
+with an earlier results file to flag stages that got slower. The committed
+benchmarks/results/baseline.json is a default run (1k and 10k participants);
+timings are machine-specific, so regenerate it with --output on the machine
+you compare on. Stages faster than --min-seconds in the baseline are not
+compared: at a few milliseconds, timer noise alone exceeds the threshold.
+Every stage runs once untimed first (imports, caches, first-touch
+allocation), and --compare needs --repeat >= 3 on both runs: the best of
+one or two cold timings is not a stable enough number to fail a build on.
+
+Usage:
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --scales 1000,10000,100000,1000000 --repeat 1
+    python -m benchmarks.bench_pipeline --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "flask_app"))
+
+from benchmarks.synthetic import make_rows  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DEFAULT_SCALES = [1_000, 10_000]
+MIN_COMPARE_SECONDS = 0.05
+MIN_COMPARE_REPEAT  = 3
+
+
+def measure(name, fn, repeat=3, memory=True):
+    """
+    Run fn once untimed as a warm-up, `repeat` times for wall/CPU time,
+    then once more under tracemalloc for peak Python allocations.
+    Returns (result, stats).
+    """
+    walls, cpus = [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn()
+    for _ in range(repeat):
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+        walls.append(time.perf_counter() - wall0)
+        cpus.append(time.process_time() - cpu0)
+
+    stats = {
+        "wall_s_min": min(walls),
+        "wall_s_median": statistics.median(walls),
+        "cpu_s_median": statistics.median(cpus),
+        "repeat": repeat,
+    }
+
+    if memory:
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats["peak_alloc_mb"] = peak / 1e6
+
+    print(f"  {name:<24} {stats['wall_s_min']:>9.4f}s"
+          + (f"  {stats['peak_alloc_mb']:>9.1f} MB" if memory else ""))
+    return result, stats
+
+
+def bench_scale(n, workdir, repeat=3, memory=True):
+    """Run every pipeline stage on n synthetic participants"""
+    import pandas as pd
+    from export_to_csv import write_csv
+    from csv_feature_extraction import CSVFeatureExtractor
+    from ml_training import DepressionClassifier
+    import features
+
+    print(f"\n[{n:,} participants]")
+    raw_path = str(Path(workdir) / f"raw_{n}.csv")
+    processed_path = str(Path(workdir) / f"processed_{n}.csv")
+    stages = {}
+
+    rows = make_rows(n)
+
+    _, stages["export_write_csv"] = measure(
+        "export_write_csv", lambda: write_csv(rows, raw_path), repeat, memory)
+    del rows
+
+    df, stages["csv_load"] = measure(
+        "csv_load", lambda: pd.read_csv(raw_path), repeat, memory)
+
+    extractor = CSVFeatureExtractor(raw_path)
+    texts = df["free_writing_text"].tolist()
+    _, stages["linguistic_per_row"] = measure(
+        "linguistic_per_row",
+        lambda: [extractor.extract_linguistic_features(t) for t in texts],
+        repeat, memory)
+
+    records = df.to_dict("records")
+    _, stages["features_row_api"] = measure(
+        "features_row_api",
+        lambda: [features.extract_row_features(r) for r in records],
+        repeat, memory)
+    del records
+
+    _, stages["features_batch_api"] = measure(
+        "features_batch_api", lambda: features.build_feature_frame(df), repeat, memory)
+
+    feature_df, stages["process_csv"] = measure(
+        "process_csv", extractor.process_csv, repeat, memory)
+    feature_df.to_csv(processed_path, index=False)
+    del df, texts
+
+    classifier = DepressionClassifier(processed_path)
+    (X, y, _), stages["load_and_prepare_data"] = measure(
+        "load_and_prepare_data", classifier.load_and_prepare_data, repeat, memory)
+
+    _, stages["train_model"] = measure(
+        "train_model", lambda: classifier.train_model(X, y), repeat, memory)
+
+    _, stages["score"] = measure(
+        "score",
+        lambda: classifier.model.predict_proba(classifier.preprocessor.transform(X)),
+        repeat, memory)
+
+    return stages
+
+
+def compare(current, baseline, threshold, min_seconds=MIN_COMPARE_SECONDS):
+    """Return (scale, stage, ratio) for every stage slower than baseline by > threshold"""
+    regressions = []
+    for scale, stages in current["results"].items():
+        for stage, stats in stages.items():
+            old = baseline.get("results", {}).get(scale, {}).get(stage)
+            if not old or old["wall_s_min"] < min_seconds:
+                continue
+            ratio = stats["wall_s_min"] / old["wall_s_min"]
+            if ratio > 1 + threshold:
+                regressions.append((scale, stage, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offline pipeline")
+    parser.add_argument("--scales", default=",".join(str(s) for s in DEFAULT_SCALES),
+                        help="comma-separated participant counts, e.g. 1000,10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown before a stage is flagged (0.2 = 20%%)")
+    parser.add_argument("--min-seconds", type=float, default=MIN_COMPARE_SECONDS,
+                        help="skip stages faster than this in the baseline")
+    args = parser.parse_args()
+    if args.compare and args.repeat < MIN_COMPARE_REPEAT:
+        parser.error(f"--compare needs --repeat >= {MIN_COMPARE_REPEAT}")
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    if baseline and baseline.get("meta", {}).get("repeat", 0) < MIN_COMPARE_REPEAT:
+        parser.error(f"{args.compare} was recorded with --repeat < {MIN_COMPARE_REPEAT}; rerun it")
+
+    scales = [int(s) for s in args.scales.split(",") if s]
+
+    print("=" * 60)
+    print("OFFLINE PIPELINE BENCHMARK")
+    print("=" * 60)
+
+    run = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scales": scales,
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in scales:
+            run["results"][str(n)] = bench_scale(n, workdir, args.repeat, not args.no_memory)
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = Path(args.output) if args.output else \
+        RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.write_text(json.dumps(run, indent=2))
+    print(f"\nResults saved to {output}")
+
+    if baseline:
+        regressions = compare(run, baseline, args.threshold, args.min_seconds)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) vs {args.compare}:")
+            for scale, stage, ratio in regressions:
+                print(f"  {scale:>9} {stage:<24} {ratio:.2f}x slower")
+            sys.exit(1)
+        print(f"\n✅ No regressions vs {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
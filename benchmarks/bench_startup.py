@@ -0,0 +1,96 @@
+"""
+bench_startup.py
+Import-time regression check for pipeline.py and its subcommands.
+
+Each command runs in a fresh interpreter under `python -X importtime`; the
+cumulative time of the top-level imports is compared against a budget, and
+the heavy ML/plotting packages must not be imported just to show --help.
+Exits non-zero on any violation, so it can gate CI.
+
+Usage:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 5 --scale 2.0   # slower machine
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+HEAVY = ("sklearn", "matplotlib", "seaborn", "joblib", "scipy", "torch")
+
+# (argv, import budget in ms, packages that must not be imported). The budgets
+# include the ~50 ms the interpreter itself spends importing site, argparse, json.
+CHECKS = [
+    (["--help"], 100, HEAVY + ("numpy", "pandas")),
+    (["report", "--help"], 100, HEAVY + ("numpy", "pandas")),
+    (["sync", "--help"], 100, HEAVY + ("numpy", "pandas", "mysql")),
+    (["export", "--help"], 100, HEAVY + ("numpy", "pandas", "mysql")),
+    (["score", "--help"], 100, HEAVY + ("numpy", "pandas")),
+    (["extract", "--help"], 250, HEAVY + ("pandas",)),
+    # ml_training needs numpy/pandas at import for every training path
+    (["train", "--help"], 900, HEAVY),
+]
+
+
+def import_profile(argv):
+    """(total top-level import ms, set of imported top-level packages) for one run"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "pipeline.py", *argv],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"pipeline.py {' '.join(argv)} failed:\n{proc.stderr[-2000:]}")
+    total_us, packages = 0, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        packages.add(name.strip().split(".")[0])
+        if not name[1:].startswith(" "):  # nesting is shown by extra indentation
+            total_us += int(cumulative)
+    return total_us / 1000, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check pipeline.py import time per subcommand")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per command (median is used)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/startup_<timestamp>.json)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("PIPELINE STARTUP (python -X importtime)")
+    print("=" * 60)
+    results, failures = {}, []
+    for argv, budget, forbidden in CHECKS:
+        command = " ".join(argv)
+        runs = [import_profile(argv) for _ in range(args.repeat)]
+        import_ms = statistics.median(ms for ms, _ in runs)
+        loaded = sorted(set(forbidden) & runs[0][1])
+        limit = budget * args.scale
+        ok = import_ms <= limit and not loaded
+        print(f"  {'✅' if ok else '❌'} {command:<18} {import_ms:>8.1f} ms  (budget {limit:.0f} ms)"
+              + (f"  imports {', '.join(loaded)}" if loaded else ""))
+        results[command] = {"import_ms": import_ms, "budget_ms": limit, "heavy_imports": loaded}
+        if not ok:
+            failures.append(command)
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = Path(args.output) if args.output else \
+        RESULTS_DIR / f"startup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.write_text(json.dumps({"python": sys.version.split()[0], "results": results}, indent=2))
+    print(f"\nResults saved to {output}")
+
+    if failures:
+        print(f"\n❌ {len(failures)} command(s) over budget or importing heavy packages")
+        sys.exit(1)
+    print("\n✅ All commands within budget")
+
+
+if __name__ == "__main__":
+    main()
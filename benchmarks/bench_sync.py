@@ -0,0 +1,74 @@
+"""
+bench_sync.py
+Uploading submissions collected offline (flask_app/local_store.py): the
+batched sync against writing each submission on its own, as the collectors
+do online (four INSERTs and a commit per participant).
+
+MySQL is simulated as in bench_collector.py: every statement, executemany
+batch and commit costs --db-latency seconds, which is what dominates from a
+lab laptop to the remote Aiven instance.
+
+Usage:
+    python -m benchmarks.bench_sync
+    python -m benchmarks.bench_sync --participants 2000 --batch 200 --db-latency 0.05
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "flask_app"))
+
+from benchmarks.bench_collector import FakeConnection  # noqa: E402
+from benchmarks.synthetic import make_consent_record, make_rows, to_payload  # noqa: E402
+from local_store import LocalStore  # noqa: E402
+from submission import build_inserts, decode_submission  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk sync of the offline store")
+    parser.add_argument("--participants", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=100, help="participants per sync transaction")
+    parser.add_argument("--db-latency", type=float, default=0.02,
+                        help="simulated seconds per statement, batch and commit")
+    args = parser.parse_args()
+
+    submissions = [build_inserts(decode_submission(json.dumps(to_payload(row, consent=make_consent_record()))),
+                                 "10.0.0.1", datetime(2026, 3, 2, 10, 31))
+                   for row in make_rows(args.participants)]
+
+    print("=" * 60)
+    print("OFFLINE STORE SYNC")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalStore(str(Path(tmp) / "local.db"))
+        start = time.perf_counter()
+        for inserts in submissions:
+            store.write(inserts)
+        local_s = time.perf_counter() - start
+        print(f"{args.participants} participants, {args.db_latency * 1000:.0f} ms per MySQL round trip\n")
+        print(f"  {'local write (SQLite)':<30} {local_s / args.participants * 1000:>8.2f} ms per submission")
+
+        # Online path: one transaction per participant
+        per_row = args.participants * 5 * args.db_latency
+        print(f"  {'one by one (estimated)':<30} {per_row:>8.1f} s    "
+              f"{args.participants * 5} round trips")
+
+        start = time.perf_counter()
+        inserted = store.sync(lambda: FakeConnection(args.db_latency), args.batch)["inserted"]
+        sync_s = time.perf_counter() - start
+        batches = -(-args.participants // args.batch)
+        print(f"  {'sync, batch ' + str(args.batch):<30} {sync_s:>8.1f} s    "
+              f"{batches * 6} round trips ({batches} transactions)")
+        assert inserted == args.participants
+        print(f"\n  speed-up: {per_row / sync_s:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+bench_tokenizer.py
+Per-essay cost of the linguistic tokenizer as essays get longer, comparing
+the original multi-pass implementation with features.py. Also checks that
+both (and the reference features.tokenize) produce identical counts.
+
+Usage:
+    python -m benchmarks.bench_tokenizer
+    python -m benchmarks.bench_tokenizer --lengths 25,100,400,1600,6400 --essays 200
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import features  # noqa: E402
+from benchmarks.check_feature_parity import EDGE_TEXTS  # noqa: E402
+from benchmarks.synthetic import make_free_text  # noqa: E402
+
+EXTRA_EDGE_TEXTS = ["Hello. , . World", "a.b.c d!e?f", "  . x", "x .  ", "Ünïcödé wörds. Ñ!", "İstanbul. straße?"]
+
+
+def legacy_counts(text):
+    """The original extract_linguistic_features passes, kept for comparison"""
+    text = str(text).lower()
+    words = re.findall(r'\b\w+\b', text)
+    negative = sum(1 for w in words if w in features.NEGATIVE_WORDS)
+    positive = sum(1 for w in words if w in features.POSITIVE_WORDS)
+    first_person = sum(1 for w in words if w in features.FIRST_PERSON)
+    unique = len(set(words))
+    sentences = len([s for s in re.split(r'[.!?]+', text) if s.strip()])
+    return len(words), unique, negative, positive, first_person, sentences
+
+
+def reference_counts(text):
+    tok = features.tokenize(text)
+    return (len(tok.words), len(set(tok.words)),
+            tok.classes.count(features.NEGATIVE), tok.classes.count(features.POSITIVE),
+            tok.classes.count(features.FIRST_PERSON_CLASS), len(tok.sentence_ends))
+
+
+def kernel_counts(text):
+    valid, counts = features._text_counts([text])
+    return tuple(int(c) for c in counts[:, 0]) if valid[0] else None
+
+
+def per_essay_us(fn, texts, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokenizer microbenchmark")
+    parser.add_argument("--lengths", default="25,100,400,1600,6400", help="essay lengths in words")
+    parser.add_argument("--essays", type=int, default=200, help="essays per length")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    corpus = {int(n): [make_free_text(rng, int(n)) for _ in range(args.essays)]
+              for n in args.lengths.split(",")}
+
+    checks = [t for t in EDGE_TEXTS + EXTRA_EDGE_TEXTS if t and len(t.strip()) >= 10]
+    checks += [t for texts in corpus.values() for t in texts[:20]]
+    for text in checks:
+        expected = legacy_counts(text)
+        if expected[0] == 0:
+            continue
+        assert reference_counts(text) == expected, (text, reference_counts(text), expected)
+        assert kernel_counts(text) == expected, (text, kernel_counts(text), expected)
+    print(f"✅ legacy, tokenize() and kernel counts agree on {len(checks)} texts\n")
+
+    print(f"{'words':>7}{'legacy µs':>12}{'tokenize µs':>13}{'kernel µs':>12}{'speedup':>9}")
+    for n, texts in corpus.items():
+        legacy = per_essay_us(legacy_counts, texts)
+        reference = per_essay_us(features.tokenize, texts)
+        kernel = per_essay_us(kernel_counts, texts)
+        print(f"{n:>7}{legacy:>12.1f}{reference:>13.1f}{kernel:>12.1f}{legacy / kernel:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+check_feature_parity.py
+Checks that the single-row and batch APIs in features.py agree on a large
+randomised corpus, so serving-time features match training-time features.
+
+Usage:
+    python -m benchmarks.check_feature_parity
+    python -m benchmarks.check_feature_parity --rows 50000 --seed 7
+"""
+
+import argparse
+import math
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd  # noqa: E402
+
+import features  # noqa: E402
+from benchmarks.synthetic import make_rows  # noqa: E402
+
+# Awkward inputs the synthetic essays never produce
+EDGE_TEXTS = [
+    None, "", "   ", "short", "!!!!!!!!!!!!!!", "... ??? !!! ...",
+    "I I I I I I I I I I", "Café naïve façade — déjà vu!", "word\nword\tword.word?word!",
+    "123 456 789 000 111", "snake_case words_with_underscores here.", "Ends without punctuation",
+]
+
+
+def make_corpus(n, seed):
+    rng = random.Random(seed)
+    rows = make_rows(n, seed=seed, min_words=0, max_words=300)
+    for row in rows:
+        roll = rng.random()
+        if roll < 0.05:
+            text = rng.choice(EDGE_TEXTS)
+            # Stored counts are derived from the text, as app.py does on submit
+            row["free_writing_text"] = text
+            row["free_writing_word_count"] = len((text or "").split())
+            row["free_writing_char_count"] = len(text or "")
+        elif roll < 0.07:
+            row["free_writing_duration"] = rng.choice([0, -1.0, float("nan")])
+        elif roll < 0.09:
+            row["copy_task_duration"] = 0
+    return rows
+
+
+def same(a, b):
+    if isinstance(a, float) and isinstance(b, float):
+        if math.isnan(a) or math.isnan(b):
+            return math.isnan(a) and math.isnan(b)
+        return a == b or math.isclose(a, b, rel_tol=1e-12, abs_tol=1e-12)
+    return a == b
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check row/batch feature parity")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = make_corpus(args.rows, args.seed)
+    df = pd.DataFrame(rows)
+    batch = features.build_feature_frame(df)
+    batch_records = batch.to_dict("records")
+
+    mismatches = 0
+    for i, (row, expected) in enumerate(zip(df.to_dict("records"), batch_records)):
+        got = features.extract_row_features(row)
+        if list(got) != list(expected):
+            print(f"row {i}: column mismatch {list(got)} != {list(expected)}")
+            mismatches += 1
+            continue
+        for col, value in expected.items():
+            if not same(float(got[col]) if isinstance(got[col], int) else got[col],
+                        float(value) if isinstance(value, int) else value):
+                print(f"row {i} {col}: row API {got[col]!r} != batch API {value!r}")
+                mismatches += 1
+
+    # The demo wrapper must agree with a training row built from the same inputs
+    for i, row in enumerate(rows[:2000]):
+        if not isinstance(row["free_writing_text"], str) or not isinstance(row["copy_task_text"], str):
+            continue
+        demo = features.task_features(row["copy_task_text"], row["copy_task_duration"],
+                                      row["free_writing_text"], row["free_writing_duration"])
+        for col, value in demo.items():
+            if not same(float(value), float(batch_records[i][col])):
+                print(f"row {i} {col}: task_features {value!r} != batch API {batch_records[i][col]!r}")
+                mismatches += 1
+
+    if mismatches:
+        print(f"\n❌ {mismatches} mismatch(es) across {len(rows)} rows")
+        sys.exit(1)
+    print(f"✅ Row and batch APIs agree on {len(rows)} rows ({len(batch.columns)} columns)")
+
+
+if __name__ == "__main__":
+    main()
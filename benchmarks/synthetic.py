@@ -0,0 +1,221 @@
+"""
+synthetic.py
+Builds synthetic participant rows in the same shape as all_participant_data.csv
+(the output of flask_app/export_to_csv.py) so the offline pipeline can be
+benchmarked without touching the production database.
+
+Usage:
+    from benchmarks.synthetic import make_rows, write_dataset
+    from benchmarks.synthetic import make_consent_pdf, make_consent_record, to_payload
+    from benchmarks.synthetic import make_tables
+"""
+
+import base64
+import hashlib
+import json
+import random
+import string
+import zlib
+from datetime import datetime, timedelta
+
+COPY_TEXT = """The quick brown fox jumps over the lazy dog. Mental health is an important aspect of overall well-being. University students often face unique challenges including academic pressure, social adjustments, and future uncertainties. It is essential to recognize signs of distress early and seek appropriate support when needed."""
+
+# Rough mix of filler, lexicon and first-person words so every linguistic
+# feature in CSVFeatureExtractor gets exercised.
+FILLER_WORDS = (
+    "the a and to of in it is was that for on with as at by this from but or "
+    "class lecture morning evening day week campus friends assignment exam lab "
+    "bus home library lunch dinner study notes teacher project group room phone "
+    "usually then after before sometimes often really very quite just also still"
+).split()
+NEGATIVE_WORDS = ["sad", "tired", "exhausted", "stressed", "anxious", "worried",
+                  "alone", "lonely", "bad", "hard", "difficult", "overwhelmed"]
+POSITIVE_WORDS = ["happy", "good", "great", "enjoy", "fun", "calm", "relaxed",
+                  "proud", "grateful", "better", "hope", "love"]
+FIRST_PERSON = ["i", "me", "my", "myself"]
+
+SEVERITIES = [(4, "Minimal"), (9, "Mild"), (14, "Moderate"),
+              (19, "Moderately Severe"), (27, "Severe")]
+
+
+def _severity(total):
+    for upper, label in SEVERITIES:
+        if total <= upper:
+            return label
+    return "Severe"
+
+
+def make_free_text(rng, n_words):
+    """Generate an essay of roughly n_words words split into sentences"""
+    words = []
+    sentence_len = rng.randint(6, 18)
+    for i in range(n_words):
+        roll = rng.random()
+        if roll < 0.06:
+            word = rng.choice(NEGATIVE_WORDS)
+        elif roll < 0.11:
+            word = rng.choice(POSITIVE_WORDS)
+        elif roll < 0.19:
+            word = rng.choice(FIRST_PERSON)
+        else:
+            word = rng.choice(FILLER_WORDS)
+        if not words or words[-1].endswith((".", "!", "?")):
+            word = word.capitalize()
+        sentence_len -= 1
+        if sentence_len == 0 or i == n_words - 1:
+            word += rng.choice([".", ".", ".", "!", "?"])
+            sentence_len = rng.randint(6, 18)
+        words.append(word)
+    return " ".join(words)
+
+
+def make_copy_text(rng):
+    """Copy the reference text with a few typos and a possibly truncated tail"""
+    chars = list(COPY_TEXT)
+    for _ in range(rng.randint(0, 8)):
+        pos = rng.randrange(len(chars))
+        chars[pos] = rng.choice(string.ascii_lowercase)
+    keep = rng.randint(int(len(chars) * 0.7), len(chars))
+    return "".join(chars[:keep])
+
+
+def make_rows(n, seed=42, min_words=40, max_words=400):
+    """Return n synthetic participant dicts matching the export column order"""
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    rows = []
+    for i in range(n):
+        scores = [rng.randint(0, 3) for _ in range(9)]
+        total = sum(scores)
+        copy_text = make_copy_text(rng)
+        free_text = make_free_text(rng, rng.randint(min_words, max_words))
+        copy_duration = round(rng.uniform(45, 300), 2)
+        free_duration = round(rng.uniform(90, 300), 2)
+
+        row = {
+            "participant_id": f"{i:08X}",
+            "age": rng.randint(18, 30),
+            "gender": rng.choice(["Male", "Female", "Other", "Prefer not to say"]),
+            "year_of_study": rng.choice(["1st", "2nd", "3rd", "4th", "5th"]),
+            "phq9_total": total,
+            "phq9_severity": _severity(total),
+            "depression_label": 1 if total >= 10 else 0,
+        }
+        for q, score in enumerate(scores, 1):
+            row[f"phq9_q{q}"] = score
+        row.update({
+            "copy_task_duration": copy_duration,
+            "copy_task_word_count": len(copy_text.split()),
+            "copy_task_char_count": len(copy_text),
+            "free_writing_duration": free_duration,
+            "free_writing_word_count": len(free_text.split()),
+            "free_writing_char_count": len(free_text),
+            "copy_task_text": copy_text,
+            "free_writing_text": free_text,
+            "collection_date": (start + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S"),
+        })
+        rows.append(row)
+    return rows
+
+
+def make_consent_pdf(rng, width=1190, height=1600):
+    """
+    Base64 stand-in for the consent PDF index.html builds with html2canvas +
+    jsPDF: a deflated RGB page, mostly white with rows of dark "text" runs.
+    Like the real PNG-in-PDF it is already compressed before base64.
+    """
+    page = bytearray(b"\xff" * (width * height * 3))
+    for y in range(80, height - 80, 22):
+        x = 60
+        while x < width - 200 and rng.random() < 0.97:
+            run = rng.randint(8, 60)
+            for dy in range(rng.randint(8, 12)):
+                offset = ((y + dy) * width + x) * 3
+                shade = bytes([rng.randint(20, 90)]) * 3
+                page[offset:offset + run * 3] = shade * run
+            x += run + rng.randint(4, 12)
+    return base64.b64encode(b"%PDF-1.3\n" + zlib.compress(bytes(page), 6)).decode()
+
+
+def make_consent_record(version="0" * 64, shown_at="2026-03-02T10:15:04.512Z",
+                        agreed_at="2026-03-02T10:16:41.077Z"):
+    """The structured consent record index.html sends in record mode"""
+    return {"version": version, "shown_at": shown_at, "agreed_at": agreed_at, "checkbox": True}
+
+
+def to_payload(row, consent_screenshot=None, session_id="00000000-0000-4000-8000-000000000000",
+               consent=None):
+    """The /submit JSON index.html would send for one synthetic row"""
+    return {
+        "participant_id":     row["participant_id"],
+        "session_id":         session_id,
+        "age":                row["age"],
+        "gender":             row["gender"],
+        "year_of_study":      row["year_of_study"],
+        "phq9_scores":        [row[f"phq9_q{q}"] for q in range(1, 10)],
+        "phq9_total":         row["phq9_total"],
+        "phq9_severity":      row["phq9_severity"],
+        "copy_text":          row["copy_task_text"],
+        "copy_duration":      row["copy_task_duration"],
+        "free_text":          row["free_writing_text"],
+        "free_duration":      row["free_writing_duration"],
+        "consent":            consent,
+        "consent_screenshot": consent_screenshot,
+    }
+
+
+def make_tables(n, seed=42):
+    """
+    The four database tables (participants, phq9_responses, typing_data,
+    consent_records) as DataFrames, shaped like export_to_csv.py --tables.
+    Rows before n // 4 are migrated v1 data without sessions or screenshots,
+    the last quarter uses structured consent records instead of screenshots;
+    a few IPs are shared, as on a campus network.
+    """
+    import pandas as pd
+
+    rng = random.Random(seed + 1)
+    rows = make_rows(n, seed=seed)
+    ips = [f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+           for _ in range(max(1, n // 3))]
+    participants, phq9, typing, consent = [], [], [], []
+    for i, row in enumerate(rows, 1):
+        v2 = i > n // 4
+        session_id = f"{rng.getrandbits(128):032x}" if v2 else None
+        ip_address = rng.choice(ips) if v2 else None
+        pid = row["participant_id"]
+        participants.append({
+            "id": i, "participant_id": pid, "session_id": session_id, "ip_address": ip_address,
+            "age": row["age"], "gender": row["gender"], "year_of_study": row["year_of_study"],
+            "consent_timestamp": row["collection_date"] if v2 else None,
+            "data_version": "v2" if v2 else "v1", "collection_date": row["collection_date"],
+        })
+        phq9.append({"id": i, "participant_id": pid, "phq9_total": row["phq9_total"],
+                     "phq9_severity": row["phq9_severity"], "depression_label": row["depression_label"],
+                     **{f"q{q}": row[f"phq9_q{q}"] for q in range(1, 10)}})
+        typing.append({"id": i, "participant_id": pid,
+                       **{k: row[k] for k in ("copy_task_duration", "copy_task_word_count",
+                                              "copy_task_char_count", "copy_task_text",
+                                              "free_writing_duration", "free_writing_word_count",
+                                              "free_writing_char_count", "free_writing_text")}})
+        record = None
+        if i > 3 * n // 4:
+            record = json.dumps({"participant_id": pid, "session_id": session_id,
+                                 **make_consent_record()}, separators=(",", ":"))
+        consent.append({"id": i, "participant_id": pid, "session_id": session_id,
+                        "ip_address": ip_address, "consent_timestamp": participants[-1]["consent_timestamp"],
+                        "screenshot_base64": "" if v2 and not record and rng.random() < 0.97 else None,
+                        "consent_record": record,
+                        "consent_sha256": hashlib.sha256(record.encode()).hexdigest() if record else None,
+                        "data_version": participants[-1]["data_version"], "notes": None})
+    frames = {"participants": participants, "phq9_responses": phq9,
+              "typing_data": typing, "consent_records": consent}
+    return {name: pd.DataFrame(records) for name, records in frames.items()}
+
+
+def write_dataset(path, n, seed=42):
+    """Write n synthetic participants to a CSV at path"""
+    import pandas as pd
+
+    pd.DataFrame(make_rows(n, seed=seed)).to_csv(path, index=False)
+    return path
@@ -1,8 +1,9 @@
-import pandas as pd
-import numpy as np
-import re
+import argparse
 from pathlib import Path
 
+import features
+from profiling import profile_stage
+
 class CSVFeatureExtractor:
     """
     Extract features from web-collected CSV data
@@ -11,143 +12,64 @@ class CSVFeatureExtractor:
     def __init__(self, csv_path='all_participant_data.csv'):
         self.csv_path = csv_path
         
+    @profile_stage()
     def extract_linguistic_features(self, text):
         """
         Extract linguistic features from typed text
         """
-        if not text or pd.isna(text) or len(str(text).strip()) < 10:
-            return {}
-        
-        text = str(text).lower()
-        words = re.findall(r'\b\w+\b', text)
-        
-        if len(words) == 0:
-            return {}
-        
-        # Negative emotion words
-        negative_words = set([
-            'sad', 'depressed', 'unhappy', 'miserable', 'hopeless', 'worthless',
-            'tired', 'exhausted', 'stressed', 'anxious', 'worried', 'afraid',
-            'alone', 'lonely', 'isolated', 'empty', 'numb', 'bad', 'terrible',
-            'awful', 'horrible', 'struggle', 'difficult', 'hard', 'pain', 'hurt',
-            'fail', 'failure', 'weak', 'overwhelmed', 'burden', 'useless'
-        ])
-        
-        # Positive emotion words
-        positive_words = set([
-            'happy', 'joy', 'good', 'great', 'wonderful', 'excellent', 'amazing',
-            'love', 'enjoy', 'excited', 'fun', 'beautiful', 'peaceful', 'calm',
-            'relaxed', 'confident', 'proud', 'satisfied', 'grateful', 'blessed',
-            'hope', 'better', 'improve', 'success', 'accomplish'
-        ])
-        
-        # First person pronouns
-        first_person = set(['i', 'me', 'my', 'mine', 'myself'])
-        
-        # Count occurrences
-        negative_count = sum(1 for word in words if word in negative_words)
-        positive_count = sum(1 for word in words if word in positive_words)
-        first_person_count = sum(1 for word in words if word in first_person)
-        
-        # Lexical diversity
-        unique_words = len(set(words))
-        lexical_diversity = unique_words / len(words) if len(words) > 0 else 0
-        
-        # Sentence count
-        sentences = re.split(r'[.!?]+', text)
-        sentence_count = len([s for s in sentences if s.strip()])
-        
-        features = {
-            'word_count': len(words),
-            'unique_word_count': unique_words,
-            'lexical_diversity': lexical_diversity,
-            
-            'negative_word_count': negative_count,
-            'positive_word_count': positive_count,
-            'negative_word_ratio': negative_count / len(words) if len(words) > 0 else 0,
-            'positive_word_ratio': positive_count / len(words) if len(words) > 0 else 0,
-            
-            'sentiment_balance': (positive_count - negative_count) / len(words) if len(words) > 0 else 0,
-            
-            'first_person_count': first_person_count,
-            'first_person_ratio': first_person_count / len(words) if len(words) > 0 else 0,
-            
-            'sentence_count': sentence_count,
-            'avg_words_per_sentence': len(words) / sentence_count if sentence_count > 0 else 0
-        }
-        
-        return features
+        return features.extract_linguistic_features(text)
     
+    @profile_stage()
     def process_csv(self):
         """
         Process the CSV file and extract features
         """
+        import pandas as pd
+        
         print(f"Loading data from {self.csv_path}...")
         df = pd.read_csv(self.csv_path)
         
         print(f"Total participants: {len(df)}")
         print(f"\nColumns in CSV: {list(df.columns)}")
         
-        # Extract features for each participant
-        feature_rows = []
-        
-        for idx, row in df.iterrows():
-            participant_features = {
-                'participant_id': row['participant_id'],
-                'age': row['age'],
-                'gender': row['gender'],
-                'year_of_study': row['year_of_study'],
-                'phq9_total': row['phq9_total'],
-                'phq9_severity': row['phq9_severity'],
-                'depression_label': row['depression_label']
-            }
-            
-            # Add PHQ-9 individual scores
-            for i in range(1, 10):
-                col_name = f'phq9_q{i}'
-                if col_name in df.columns:
-                    participant_features[col_name] = row[col_name]
-            
-            # Copy task features
-            if 'copy_task_duration' in df.columns:
-                participant_features['copy_task_duration'] = row.get('copy_task_duration', 0)
-                participant_features['copy_task_word_count'] = row.get('copy_task_word_count', 0)
-                participant_features['copy_task_char_count'] = row.get('copy_task_char_count', 0)
-                
-                # Calculate typing speed (WPM)
-                if row.get('copy_task_duration', 0) > 0:
-                    participant_features['copy_task_wpm'] = (row.get('copy_task_word_count', 0) / row['copy_task_duration']) * 60
-                else:
-                    participant_features['copy_task_wpm'] = 0
-            
-            # Free writing task features
-            if 'free_writing_duration' in df.columns:
-                participant_features['free_writing_duration'] = row.get('free_writing_duration', 0)
-                participant_features['free_writing_word_count'] = row.get('free_writing_word_count', 0)
-                participant_features['free_writing_char_count'] = row.get('free_writing_char_count', 0)
-                
-                # Calculate typing speed (WPM)
-                if row.get('free_writing_duration', 0) > 0:
-                    participant_features['free_writing_wpm'] = (row.get('free_writing_word_count', 0) / row['free_writing_duration']) * 60
-                else:
-                    participant_features['free_writing_wpm'] = 0
-                
-                # Extract linguistic features from free writing text
-                if 'free_writing_text' in df.columns and pd.notna(row.get('free_writing_text')):
-                    ling_features = self.extract_linguistic_features(row['free_writing_text'])
-                    for key, value in ling_features.items():
-                        participant_features[f'free_writing_{key}'] = value
-            
-            feature_rows.append(participant_features)
-        
-        # Create feature DataFrame
-        feature_df = pd.DataFrame(feature_rows)
+        # Same kernels as features.extract_row_features, used by the demo
+        feature_df = features.build_feature_frame(df)
         
         print(f"\nFeatures extracted: {len(feature_df.columns)}")
         print(f"\nSample features: {list(feature_df.columns[:10])}")
         
         return feature_df
     
+    @profile_stage()
+    def extract_text_features(self, output_prefix='processed_dataset_text'):
+        """
+        Optional hashed n-gram TF-IDF block for free_writing_text,
+        streamed over the CSV in chunks and saved as a sparse matrix
+        """
+        from text_features import build_text_features
+        
+        print(f"\nBuilding hashed n-gram TF-IDF features from {self.csv_path}...")
+        matrix_path, model_path, matrix = build_text_features(self.csv_path, output_prefix)
+        print(f"✅ Text features saved to {matrix_path} "
+              f"({matrix.shape[0]} x {matrix.shape[1]}, {matrix.nnz} non-zeros)")
+        print(f"Vectorizer saved to {model_path}")
+        return matrix_path
+    
+    @profile_stage()
+    def extract_embedding_features(self, model_path, batch_size=32, threads=None, quantize='none',
+                                   output_path='processed_dataset_embeddings.npy'):
+        """
+        Optional sentence-embedding block for free_writing_text from a local
+        CPU model; only essays missing from the on-disk cache are embedded
+        """
+        from embedding_features import EmbeddingEncoder, build_embedding_features
+        
+        encoder = EmbeddingEncoder(model_path, batch_size=batch_size, threads=threads, quantize=quantize)
+        print(f"\nEmbedding free-writing text with {model_path} (batch={batch_size}, quantize={quantize})...")
+        output_path, n_new = build_embedding_features(self.csv_path, encoder, output_path=output_path)
+        print(f"✅ Embeddings saved to {output_path} ({encoder.dim} dims, {n_new} newly embedded)")
+        return output_path
+    
     def save_processed_data(self, feature_df, output_path='processed_dataset.csv'):
         """Save processed features to CSV"""
         feature_df.to_csv(output_path, index=False)
@@ -166,10 +88,22 @@ class CSVFeatureExtractor:
         
         return output_path
 
-def main():
+def main(argv=None):
     """
     Main execution
     """
+    parser = argparse.ArgumentParser(description="Extract features from all_participant_data.csv")
+    parser.add_argument('--text-features', action='store_true',
+                        help="also build the sparse hashed n-gram TF-IDF block")
+    parser.add_argument('--embeddings', metavar='MODEL_DIR',
+                        help="also embed free-writing text with a local sentence-transformers model")
+    parser.add_argument('--embedding-batch-size', type=int, default=32)
+    parser.add_argument('--embedding-threads', type=int, default=None,
+                        help="torch CPU threads (default: torch's choice)")
+    parser.add_argument('--embedding-quantize', choices=['none', 'int8'], default='none',
+                        help="dynamic int8 quantization of the model's linear layers")
+    args = parser.parse_args(argv)
+    
     print("="*60)
     print("CSV FEATURE EXTRACTION")
     print("="*60)
@@ -183,11 +117,22 @@ def main():
     # Save processed data
     output_file = extractor.save_processed_data(feature_df)
     
+    if args.text_features:
+        extractor.extract_text_features()
+    if args.embeddings:
+        extractor.extract_embedding_features(
+            args.embeddings,
+            batch_size=args.embedding_batch_size,
+            threads=args.embedding_threads,
+            quantize=args.embedding_quantize
+        )
+    
     print("\n" + "="*60)
     print("EXTRACTION COMPLETE!")
     print("="*60)
     print(f"\nNext step: Run ML training")
-    print(f"Command: python ml_training.py")
+    flags = (" --text-features" if args.text_features else "") + (" --embeddings" if args.embeddings else "")
+    print(f"Command: python ml_training.py{flags}")
 
 if __name__ == "__main__":
     main()
@@ -3,9 +3,12 @@ import numpy as np
 import pandas as pd
 import joblib
 import time
-import re
 from pathlib import Path
 
+from features import task_features
+from preprocessing import Preprocessor
+from typing_component import typing_task
+
 # Page config
 st.set_page_config(
     page_title="AI Depression Screening Demo",
@@ -18,149 +21,81 @@ st.set_page_config(
 def load_model():
     try:
         model = joblib.load('models/depression_classifier.pkl')
-        scaler = joblib.load('models/feature_scaler.pkl')
-        return model, scaler
+        if Path('models/preprocessor.pkl').exists():
+            preprocessor = joblib.load('models/preprocessor.pkl')
+        else:
+            # Bundles saved before preprocessor.pkl: scaler only, missing features sent as 0
+            scaler = joblib.load('models/feature_scaler.pkl')
+            names = list(scaler.feature_names_in_)
+            preprocessor = Preprocessor(names, np.zeros(len(names)), scaler.mean_, scaler.scale_)
     except:
-        return None, None
+        return None, None, None, None, None
+    # Only present when the model was trained with --text-features / --embeddings
+    text_path = Path('models/text_vectorizer.pkl')
+    text_vectorizer = joblib.load(text_path) if text_path.exists() else None
+    encoder_path = Path('models/embedding_encoder.pkl')
+    embedding_encoder = joblib.load(encoder_path) if encoder_path.exists() else None
+    # Only present when the model was trained with --multi-target
+    bundle_path = Path('models/multi_target.pkl')
+    multi_target = joblib.load(bundle_path) if bundle_path.exists() else None
+    return model, preprocessor, text_vectorizer, embedding_encoder, multi_target
 
-model, scaler = load_model()
+model, preprocessor, text_vectorizer, embedding_encoder, multi_target = load_model()
 
 # Initialize session state
 if 'stage' not in st.session_state:
     st.session_state.stage = 0
 if 'tasks_data' not in st.session_state:
     st.session_state.tasks_data = {}
-if 'task_start_time' not in st.session_state:
-    st.session_state.task_start_time = None
 
 # Task texts
 COPY_TEXT = """The quick brown fox jumps over the lazy dog. Mental health is an important aspect of overall well-being. University students often face unique challenges including academic pressure, social adjustments, and future uncertainties. It is essential to recognize signs of distress early and seek appropriate support when needed."""
 
 FREE_WRITING_PROMPT = "Please write about your typical day as a university student. Describe your daily routine, activities, and how you generally feel. Write naturally for 3-4 minutes."
 
-def extract_linguistic_features(text):
-    """Extract linguistic features from text"""
-    if not text or len(text.strip()) < 10:
-        return {}
-    
-    text = str(text).lower()
-    words = re.findall(r'\b\w+\b', text)
-    
-    if len(words) == 0:
-        return {}
-    
-    # Emotion words
-    negative_words = set([
-        'sad', 'depressed', 'unhappy', 'miserable', 'hopeless', 'worthless',
-        'tired', 'exhausted', 'stressed', 'anxious', 'worried', 'afraid',
-        'alone', 'lonely', 'isolated', 'empty', 'numb', 'bad', 'terrible',
-        'awful', 'horrible', 'struggle', 'difficult', 'hard', 'pain', 'hurt',
-        'fail', 'failure', 'weak', 'overwhelmed', 'burden', 'useless'
-    ])
-    
-    positive_words = set([
-        'happy', 'joy', 'good', 'great', 'wonderful', 'excellent', 'amazing',
-        'love', 'enjoy', 'excited', 'fun', 'beautiful', 'peaceful', 'calm',
-        'relaxed', 'confident', 'proud', 'satisfied', 'grateful', 'blessed',
-        'hope', 'better', 'improve', 'success', 'accomplish'
-    ])
-    
-    first_person = set(['i', 'me', 'my', 'mine', 'myself'])
-    
-    negative_count = sum(1 for word in words if word in negative_words)
-    positive_count = sum(1 for word in words if word in positive_words)
-    first_person_count = sum(1 for word in words if word in first_person)
-    
-    unique_words = len(set(words))
-    lexical_diversity = unique_words / len(words) if len(words) > 0 else 0
-    
-    sentences = re.split(r'[.!?]+', text)
-    sentence_count = len([s for s in sentences if s.strip()])
-    
-    return {
-        'free_writing_word_count': len(words),
-        'free_writing_unique_word_count': unique_words,
-        'free_writing_lexical_diversity': lexical_diversity,
-        'free_writing_negative_word_count': negative_count,
-        'free_writing_positive_word_count': positive_count,
-        'free_writing_negative_word_ratio': negative_count / len(words) if len(words) > 0 else 0,
-        'free_writing_positive_word_ratio': positive_count / len(words) if len(words) > 0 else 0,
-        'free_writing_sentiment_balance': (positive_count - negative_count) / len(words) if len(words) > 0 else 0,
-        'free_writing_first_person_count': first_person_count,
-        'free_writing_first_person_ratio': first_person_count / len(words) if len(words) > 0 else 0,
-        'free_writing_sentence_count': sentence_count,
-        'free_writing_avg_words_per_sentence': len(words) / sentence_count if sentence_count > 0 else 0
-    }
-
 def extract_features_from_tasks(copy_text, copy_duration, free_text, free_duration):
-    """Extract all features needed for prediction"""
-    
-    features = {}
-    
-    # Copy task features
-    copy_words = len(copy_text.split())
-    copy_chars = len(copy_text)
-    features['copy_task_duration'] = copy_duration
-    features['copy_task_word_count'] = copy_words
-    features['copy_task_char_count'] = copy_chars
-    features['copy_task_wpm'] = (copy_words / copy_duration) * 60 if copy_duration > 0 else 0
-    
-    # Free writing basic features
-    free_words = len(free_text.split())
-    free_chars = len(free_text)
-    features['free_writing_duration'] = free_duration
-    features['free_writing_word_count'] = free_words
-    features['free_writing_char_count'] = free_chars
-    features['free_writing_wpm'] = (free_words / free_duration) * 60 if free_duration > 0 else 0
-    
-    # Linguistic features
-    ling_features = extract_linguistic_features(free_text)
-    features.update(ling_features)
-    
-    # Fill in any missing PHQ-9 features with 0 (not used for prediction)
-    for i in range(1, 10):
-        features[f'phq9_q{i}'] = 0
-    
-    return features
+    """Extract all features needed for prediction (same kernels as training)"""
+    
+    return task_features(copy_text, copy_duration, free_text, free_duration)
 
-def make_prediction(features_dict):
-    """Make depression prediction"""
-    if model is None or scaler is None:
-        return None, None
-    
-    # Create feature array in correct order
-    expected_features = [
-        'phq9_q1', 'phq9_q2', 'phq9_q3', 'phq9_q4', 'phq9_q5', 
-        'phq9_q6', 'phq9_q7', 'phq9_q8', 'phq9_q9',
-        'copy_task_duration', 'copy_task_word_count', 'copy_task_char_count', 'copy_task_wpm',
-        'free_writing_duration', 'free_writing_word_count', 'free_writing_char_count', 'free_writing_wpm',
-        'free_writing_lexical_diversity', 'free_writing_negative_word_count', 'free_writing_positive_word_count',
-        'free_writing_negative_word_ratio', 'free_writing_positive_word_ratio', 'free_writing_sentiment_balance',
-        'free_writing_first_person_count', 'free_writing_first_person_ratio',
-        'free_writing_sentence_count', 'free_writing_avg_words_per_sentence',
-        'free_writing_unique_word_count'
-    ]
-    
-    # Build feature vector
-    feature_vector = []
-    for feat in expected_features:
-        feature_vector.append(features_dict.get(feat, 0))
-    
-    # Scale and predict
-    X = np.array(feature_vector).reshape(1, -1)
-    X_scaled = scaler.transform(X)
+def make_prediction(features_dict, free_text=None):
+    """Make depression prediction (plus PHQ-9 score/severity estimates for a multi-target bundle)"""
+    if model is None:
+        return None, None, None
+    
+    # Training column order, median fill for missing features and scaling in one step
+    X_scaled = preprocessor.transform_row(features_dict)
+    # Same block order as DepressionClassifier._with_extra: text, then embeddings
+    if embedding_encoder is not None:
+        embedding = embedding_encoder.encode([free_text or ""]).astype(np.float16).astype(np.float32)
+    if text_vectorizer is not None:
+        import scipy.sparse as sp
+        blocks = [sp.csr_matrix(X_scaled), text_vectorizer.transform([free_text or ""])]
+        if embedding_encoder is not None:
+            blocks.append(sp.csr_matrix(embedding))
+        X_scaled = sp.hstack(blocks, format='csr')
+    elif embedding_encoder is not None:
+        X_scaled = np.hstack([X_scaled, embedding])
     
     prediction = model.predict(X_scaled)[0]
     probability = model.predict_proba(X_scaled)[0]
     
-    return prediction, probability
+    estimates = None
+    if multi_target is not None:
+        targets = multi_target['targets']
+        levels = multi_target['severity_levels']
+        total = float(targets['phq9_total']['model'].predict(X_scaled)[0])
+        level = int(np.clip(np.rint(targets['phq9_severity']['model'].predict(X_scaled)[0]), 0, len(levels) - 1))
+        estimates = {'phq9_total': min(max(total, 0.0), 27.0), 'phq9_severity': levels[level]}
+    
+    return prediction, probability, estimates
 
 # Main UI
 st.title("🧠 AI Depression Screening Demo")
 st.markdown("---")
 
 if model is None:
-    st.error("⚠️ Model files not found. Please ensure 'models/depression_classifier.pkl' and 'models/feature_scaler.pkl' exist.")
+    st.error("⚠️ Model files not found. Please ensure 'models/depression_classifier.pkl' and 'models/preprocessor.pkl' exist (run ml_training.py).")
     st.stop()
 
 # Stage 0: Welcome
@@ -210,31 +145,16 @@ elif st.session_state.stage == 1:
     
     st.markdown("**Type here:**")
     
-    if 'copy_started' not in st.session_state:
-        st.session_state.copy_started = False
-        st.session_state.copy_text = ""
+    result = typing_task(
+        key="copy_task", label="Your typing:", height=150, min_chars=30,
+        min_chars_error="Please type more text", start_label="Start Typing"
+    )
     
-    if not st.session_state.copy_started:
-        if st.button("Start Typing", type="primary"):
-            st.session_state.copy_started = True
-            st.session_state.task_start_time = time.time()
-            st.rerun()
-    else:
-        typed = st.text_area("Your typing:", value=st.session_state.copy_text, height=150, key="copy_input")
-        st.session_state.copy_text = typed
-        
-        st.caption(f"Words: {len(typed.split())}")
-        
-        if st.button("Complete Task", type="primary"):
-            if len(typed.strip()) < 30:
-                st.error("Please type more text")
-            else:
-                duration = time.time() - st.session_state.task_start_time
-                st.session_state.tasks_data['copy_text'] = typed
-                st.session_state.tasks_data['copy_duration'] = duration
-                st.session_state.stage = 2
-                st.session_state.copy_started = False
-                st.rerun()
+    if result is not None:
+        st.session_state.tasks_data['copy_text'] = result['text']
+        st.session_state.tasks_data['copy_duration'] = result['duration']
+        st.session_state.stage = 2
+        st.rerun()
 
 # Stage 2: Free Writing
 elif st.session_state.stage == 2:
@@ -242,35 +162,17 @@ elif st.session_state.stage == 2:
     
     st.info(FREE_WRITING_PROMPT)
     
-    if 'free_started' not in st.session_state:
-        st.session_state.free_started = False
-        st.session_state.free_text = ""
+    result = typing_task(
+        key="free_writing", label="Write here:", height=200, min_chars=30,
+        min_chars_error="Please write more", start_label="Start Writing",
+        complete_label="Complete & Analyze"
+    )
     
-    if not st.session_state.free_started:
-        if st.button("Start Writing", type="primary"):
-            st.session_state.free_started = True
-            st.session_state.task_start_time = time.time()
-            st.rerun()
-    else:
-        typed = st.text_area("Write here:", value=st.session_state.free_text, height=200, key="free_input")
-        st.session_state.free_text = typed
-        
-        elapsed = time.time() - st.session_state.task_start_time
-        col1, col2 = st.columns(2)
-        with col1:
-            st.caption(f"⏱️ Time: {int(elapsed // 60)}:{int(elapsed % 60):02d}")
-        with col2:
-            st.caption(f"Words: {len(typed.split())}")
-        
-        if st.button("Complete & Analyze", type="primary"):
-            if len(typed.strip()) < 30:
-                st.error("Please write more")
-            else:
-                duration = time.time() - st.session_state.task_start_time
-                st.session_state.tasks_data['free_text'] = typed
-                st.session_state.tasks_data['free_duration'] = duration
-                st.session_state.stage = 3
-                st.rerun()
+    if result is not None:
+        st.session_state.tasks_data['free_text'] = result['text']
+        st.session_state.tasks_data['free_duration'] = result['duration']
+        st.session_state.stage = 3
+        st.rerun()
 
 # Stage 3: Results
 elif st.session_state.stage == 3:
@@ -288,7 +190,7 @@ elif st.session_state.stage == 3:
         )
         
         # Make prediction
-        prediction, probability = make_prediction(features)
+        prediction, probability, estimates = make_prediction(features, st.session_state.tasks_data['free_text'])
     
     st.success("Analysis complete!")
     
@@ -332,6 +234,13 @@ elif st.session_state.stage == 3:
     with col2:
         st.metric("Model Confidence", f"{confidence:.1f}%")
     
+    if estimates is not None:
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            st.metric("Estimated PHQ-9 Score", f"{estimates['phq9_total']:.0f} / 27")
+        with col2:
+            st.metric("Estimated Severity", estimates['phq9_severity'])
+    
     st.info(message)
     st.success(recommendation)
     
@@ -0,0 +1,193 @@
+"""
+embedding_features.py
+Optional sentence-embedding features for free_writing_text.
+
+Runs a small sentence-transformers model stored on local disk, on CPU,
+with network access to the model hub disabled. Embeddings are cached in
+an append-only float16 file read back through np.memmap and indexed by
+participant_id + SHA-1 of the text, so re-running extraction only embeds
+new or edited essays.
+
+    embedding_cache/<model>_<quantize>/embeddings.f16   float16 rows
+    embedding_cache/<model>_<quantize>/index.json       key -> row
+    processed_dataset_embeddings.npy                    row-aligned with processed_dataset.csv
+    processed_dataset_embeddings.pkl                    encoder settings (needed to embed new text)
+
+Requires: pip install sentence-transformers (not needed unless --embeddings is used)
+
+Usage:
+    python csv_feature_extraction.py --embeddings models/all-MiniLM-L6-v2
+    python csv_feature_extraction.py --embeddings models/all-MiniLM-L6-v2 \\
+        --embedding-batch-size 64 --embedding-threads 4 --embedding-quantize int8
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+TEXT_COLUMN = 'free_writing_text'
+CHUNK_SIZE = 10_000
+QUANTIZE_OPTIONS = ('none', 'int8')
+
+
+class EmbeddingEncoder:
+    """Lazily loaded local CPU sentence encoder; pickles as configuration only"""
+
+    def __init__(self, model_path, batch_size=32, threads=None, quantize='none'):
+        if quantize not in QUANTIZE_OPTIONS:
+            raise ValueError(f"quantize must be one of {QUANTIZE_OPTIONS}, got {quantize!r}")
+        self.model_path = str(model_path)
+        self.batch_size = batch_size
+        self.threads = threads
+        self.quantize = quantize
+        self.dim = None
+        self._model = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_model'] = None
+        return state
+
+    @property
+    def cache_name(self):
+        return f"{Path(self.model_path).name}_{self.quantize}"
+
+    def _load(self):
+        if self._model is not None:
+            return self._model
+        if not Path(self.model_path).is_dir():
+            raise FileNotFoundError(f"Embedding model directory not found: {self.model_path}")
+        # Never reach out to the model hub at run time
+        os.environ.setdefault('HF_HUB_OFFLINE', '1')
+        os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("Embedding features need sentence-transformers: "
+                              "pip install sentence-transformers") from e
+
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        model = SentenceTransformer(self.model_path, device='cpu')
+        if self.quantize == 'int8':
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.dim = model.get_sentence_embedding_dimension()
+        self._model = model
+        return model
+
+    def encode(self, texts):
+        """L2-normalised float32 embeddings, one row per text"""
+        model = self._load()
+        texts = ['' if not isinstance(t, str) else t for t in texts]
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True,
+                            normalize_embeddings=True, show_progress_bar=False).astype(np.float32)
+
+    def feature_names(self):
+        return [f'free_writing_emb_{i}' for i in range(self.dim)]
+
+
+class EmbeddingCache:
+    """
+    Append-only float16 embedding store keyed by participant_id + text hash.
+    Rows are appended to the data file before index.json is replaced, so after
+    a crash between the two the file can only hold trailing rows no key points
+    to; they are dropped on the next load.
+    """
+
+    def __init__(self, cache_dir, dim):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.data_path = self.cache_dir / 'embeddings.f16'
+        self.index_path = self.cache_dir / 'index.json'
+        self.dim = dim
+        self.index = {}
+        if self.index_path.exists():
+            saved = json.loads(self.index_path.read_text())
+            if saved['dim'] != dim:
+                raise ValueError(f"{self.cache_dir} holds {saved['dim']}-d embeddings, model gives {dim}-d")
+            self.index = saved['rows']
+        self._check_rows()
+
+    @property
+    def row_bytes(self):
+        return self.dim * np.dtype(np.float16).itemsize
+
+    def n_rows(self):
+        """Whole rows in the data file"""
+        return self.data_path.stat().st_size // self.row_bytes if self.data_path.exists() else 0
+
+    def _check_rows(self):
+        n_rows = self.n_rows()
+        if n_rows < len(self.index):
+            raise ValueError(f"{self.data_path} holds {n_rows} rows but {self.index_path} "
+                             f"indexes {len(self.index)}; delete {self.cache_dir} to rebuild")
+        if self.data_path.exists() and self.data_path.stat().st_size != len(self.index) * self.row_bytes:
+            # rows (or a partial row) written after the last index.json
+            with open(self.data_path, 'r+b') as f:
+                f.truncate(len(self.index) * self.row_bytes)
+
+    @staticmethod
+    def key(participant_id, text):
+        digest = hashlib.sha1(('' if not isinstance(text, str) else text).encode('utf-8')).hexdigest()
+        return f"{participant_id}:{digest}"
+
+    def __len__(self):
+        return len(self.index)
+
+    def add(self, keys, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float16)
+        start = self.n_rows()
+        with open(self.data_path, 'ab') as f:
+            f.write(vectors.tobytes())
+        for row, key in enumerate(keys, start):
+            self.index[key] = row
+        tmp_path = self.index_path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps({'dim': self.dim, 'rows': self.index}))
+        os.replace(tmp_path, self.index_path)
+
+    def matrix(self):
+        if not self.index:
+            return np.zeros((0, self.dim), dtype=np.float16)
+        return np.memmap(self.data_path, dtype=np.float16, mode='r', shape=(self.n_rows(), self.dim))
+
+
+def build_embedding_features(csv_path, encoder, cache_dir='embedding_cache',
+                             output_path='processed_dataset_embeddings.npy', chunksize=CHUNK_SIZE):
+    """
+    Embed every participant's free-writing text (cache misses only) and write
+    a float16 matrix row-aligned with the CSV. Returns (output_path, n_new).
+    """
+    encoder._load()
+    cache = EmbeddingCache(Path(cache_dir) / encoder.cache_name, encoder.dim)
+
+    all_keys = []
+    n_new = 0
+    for chunk in pd.read_csv(csv_path, usecols=['participant_id', TEXT_COLUMN], chunksize=chunksize):
+        texts = chunk[TEXT_COLUMN].tolist()
+        keys = [cache.key(pid, text) for pid, text in zip(chunk['participant_id'], texts)]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cache.index and key not in missing:
+                missing[key] = text
+        if missing:
+            cache.add(list(missing), encoder.encode(list(missing.values())))
+            n_new += len(missing)
+        all_keys.extend(keys)
+
+    rows = np.fromiter((cache.index[key] for key in all_keys), dtype=np.int64, count=len(all_keys))
+    np.save(output_path, np.asarray(cache.matrix()[rows], dtype=np.float16))
+    joblib.dump(encoder, Path(output_path).with_suffix('.pkl'))
+    return output_path, n_new
+
+
+def load_embedding_features(path='processed_dataset_embeddings.npy'):
+    """Return (memory-mapped float16 matrix, EmbeddingEncoder config)"""
+    return np.load(path, mmap_mode='r'), joblib.load(Path(path).with_suffix('.pkl'))
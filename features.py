@@ -0,0 +1,265 @@
+"""
+features.py
+Single source of truth for the typing and linguistic features used by
+csv_feature_extraction.py (training), demo_app.py (serving) and batch scoring.
+
+Both entry points run the same array kernels, so a participant scored one
+row at a time gets exactly the features the model was trained on:
+
+    build_feature_frame(df)      batch API: raw export DataFrame -> feature DataFrame
+    extract_row_features(row)    single-row API: raw export dict -> feature dict
+    task_features(...)           convenience wrapper for the demo's two typing tasks
+"""
+
+import re
+from collections import namedtuple
+
+import numpy as np
+
+NEGATIVE_WORDS = frozenset([
+    'sad', 'depressed', 'unhappy', 'miserable', 'hopeless', 'worthless',
+    'tired', 'exhausted', 'stressed', 'anxious', 'worried', 'afraid',
+    'alone', 'lonely', 'isolated', 'empty', 'numb', 'bad', 'terrible',
+    'awful', 'horrible', 'struggle', 'difficult', 'hard', 'pain', 'hurt',
+    'fail', 'failure', 'weak', 'overwhelmed', 'burden', 'useless'
+])
+
+POSITIVE_WORDS = frozenset([
+    'happy', 'joy', 'good', 'great', 'wonderful', 'excellent', 'amazing',
+    'love', 'enjoy', 'excited', 'fun', 'beautiful', 'peaceful', 'calm',
+    'relaxed', 'confident', 'proud', 'satisfied', 'grateful', 'blessed',
+    'hope', 'better', 'improve', 'success', 'accomplish'
+])
+
+FIRST_PERSON = frozenset(['i', 'me', 'my', 'mine', 'myself'])
+
+MIN_TEXT_CHARS = 10
+
+META_COLUMNS = ['participant_id', 'age', 'gender', 'year_of_study',
+                'phq9_total', 'phq9_severity', 'depression_label']
+PHQ9_ITEM_COLUMNS = [f'phq9_q{i}' for i in range(1, 10)]
+# Ordered PHQ-9 severity bands (totals 0-4, 5-9, 10-14, 15-19, 20-27)
+PHQ9_SEVERITY_LEVELS = ['Minimal', 'Mild', 'Moderate', 'Moderately Severe', 'Severe']
+
+LINGUISTIC_FEATURES = [
+    'word_count', 'unique_word_count', 'lexical_diversity',
+    'negative_word_count', 'positive_word_count',
+    'negative_word_ratio', 'positive_word_ratio', 'sentiment_balance',
+    'first_person_count', 'first_person_ratio',
+    'sentence_count', 'avg_words_per_sentence',
+]
+_COUNT_FEATURES = {'word_count', 'unique_word_count', 'negative_word_count',
+                   'positive_word_count', 'first_person_count', 'sentence_count'}
+
+# Lexicon class IDs (the three word lists are disjoint)
+NEGATIVE, POSITIVE, FIRST_PERSON_CLASS = 1, 2, 3
+LEXICON_CLASS = {
+    **{w: NEGATIVE for w in NEGATIVE_WORDS},
+    **{w: POSITIVE for w in POSITIVE_WORDS},
+    **{w: FIRST_PERSON_CLASS for w in FIRST_PERSON},
+}
+
+# Compiled once at import. A "word" is a maximal \w run and a sentence is a
+# run of text between [.!?]+ terminators that contains something other than
+# whitespace (the original re.findall / re.split definitions).
+WORD_RE = re.compile(r'\w+')
+SENTENCE_RE = re.compile(r'[^.!?]*[^.!?\s][^.!?]*')
+TOKEN_RE = re.compile(r'(\w+)|([.!?]+)|[^\w\s.!?]+')
+
+# ASCII fast path: str.translate + str.split run in C and are several times
+# faster than the regex engine, and give identical tokens for ASCII input
+_ASCII_NON_WORD = str.maketrans({c: ' ' for c in map(chr, range(128))
+                                 if not (c.isalnum() or c == '_')})
+_TERMINATORS = str.maketrans('!?', '..')
+
+TokenizedText = namedtuple('TokenizedText', ['words', 'spans', 'classes', 'sentence_ends'])
+
+
+# ─────────────────────────────────────────
+# Kernels
+# ─────────────────────────────────────────
+def _is_valid_text(text):
+    if text is None or (isinstance(text, float) and np.isnan(text)):
+        return False
+    return len(str(text).strip()) >= MIN_TEXT_CHARS
+
+
+def tokenize(text):
+    """
+    Single scan over lower-cased text returning word tokens, their (start, end)
+    offsets, lexicon class IDs (0 = none) and the offset where each sentence ends.
+    Reference tokenizer; the feature kernels use the equivalent counts-only path.
+    """
+    text = str(text).lower()
+    words, spans, sentence_ends = [], [], []
+    in_sentence = False
+    for m in TOKEN_RE.finditer(text):
+        if m.lastindex == 1:
+            words.append(m.group(1))
+            spans.append(m.span())
+            in_sentence = True
+        elif m.lastindex == 2:
+            if in_sentence:
+                sentence_ends.append(m.start())
+                in_sentence = False
+        else:
+            in_sentence = True
+    if in_sentence:
+        sentence_ends.append(len(text))
+    classes = [LEXICON_CLASS.get(w, 0) for w in words]
+    return TokenizedText(words, spans, classes, sentence_ends)
+
+
+def _words_and_sentences(text):
+    """Counts-only tokenizer over lower-cased text: (words, sentence count)"""
+    if text.isascii():
+        words = text.translate(_ASCII_NON_WORD).split()
+        sentences = sum(1 for s in text.translate(_TERMINATORS).split('.') if s.strip())
+    else:
+        words = WORD_RE.findall(text)
+        sentences = len(SENTENCE_RE.findall(text))
+    return words, sentences
+
+
+def _text_counts(texts):
+    """Raw per-text counts; rows with missing/too-short text are flagged invalid"""
+    n = len(texts)
+    valid = np.zeros(n, dtype=bool)
+    counts = np.zeros((6, n), dtype=np.float64)
+    lexicon_get = LEXICON_CLASS.get
+    for i, text in enumerate(texts):
+        if not _is_valid_text(text):
+            continue
+        words, sentences = _words_and_sentences(str(text).lower())
+        if not words:
+            continue
+        classes = list(map(lexicon_get, words))
+        valid[i] = True
+        counts[0, i] = len(words)
+        counts[1, i] = len(set(words))
+        counts[2, i] = classes.count(NEGATIVE)
+        counts[3, i] = classes.count(POSITIVE)
+        counts[4, i] = classes.count(FIRST_PERSON_CLASS)
+        counts[5, i] = sentences
+    return valid, counts
+
+
+def _linguistic_kernel(texts):
+    """Vectorised linguistic features; invalid rows come back as NaN"""
+    valid, (words, unique, neg, pos, fp, sentences) = _text_counts(texts)
+    safe_words = np.where(words > 0, words, 1)
+    safe_sentences = np.where(sentences > 0, sentences, 1)
+
+    out = {
+        'word_count': words,
+        'unique_word_count': unique,
+        'lexical_diversity': unique / safe_words,
+        'negative_word_count': neg,
+        'positive_word_count': pos,
+        'negative_word_ratio': neg / safe_words,
+        'positive_word_ratio': pos / safe_words,
+        'sentiment_balance': (pos - neg) / safe_words,
+        'first_person_count': fp,
+        'first_person_ratio': fp / safe_words,
+        'sentence_count': sentences,
+        'avg_words_per_sentence': np.where(sentences > 0, words / safe_sentences, 0.0),
+    }
+    for name in out:
+        out[name] = np.where(valid, out[name], np.nan)
+    return valid, out
+
+
+def _wpm_kernel(word_counts, durations):
+    word_counts = np.asarray(word_counts, dtype=np.float64)
+    durations = np.asarray(durations, dtype=np.float64)
+    positive = durations > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(positive, word_counts / np.where(positive, durations, 1) * 60, 0.0)
+
+
+def _compute(columns):
+    """
+    Shared core of both APIs. `columns` maps raw export column names to
+    equal-length sequences; returns an ordered dict of feature arrays.
+    """
+    n = len(next(iter(columns.values()))) if columns else 0
+    zeros = np.zeros(n)
+    out = {}
+    for col in META_COLUMNS + PHQ9_ITEM_COLUMNS:
+        if col in columns:
+            out[col] = columns[col]
+
+    for task in ('copy_task', 'free_writing'):
+        if f'{task}_duration' not in columns:
+            continue
+        duration = columns[f'{task}_duration']
+        word_count = columns.get(f'{task}_word_count', zeros)
+        out[f'{task}_duration'] = duration
+        out[f'{task}_word_count'] = word_count
+        out[f'{task}_char_count'] = columns.get(f'{task}_char_count', zeros)
+        out[f'{task}_wpm'] = _wpm_kernel(word_count, duration)
+
+    if 'free_writing_duration' in columns and 'free_writing_text' in columns:
+        valid, ling = _linguistic_kernel(columns['free_writing_text'])
+        # The token count from the text replaces the stored split() count
+        # whenever the text is usable (historical training behaviour)
+        out['free_writing_word_count'] = np.where(
+            valid, ling.pop('word_count'),
+            np.asarray(out['free_writing_word_count'], dtype=np.float64))
+        for name, values in ling.items():
+            out[f'free_writing_{name}'] = values
+
+    return out
+
+
+# ─────────────────────────────────────────
+# Public API
+# ─────────────────────────────────────────
+def extract_linguistic_features(text):
+    """Un-prefixed linguistic features for one text ({} if unusable)"""
+    valid, ling = _linguistic_kernel([text])
+    if not valid[0]:
+        return {}
+    return {name: (int(ling[name][0]) if name in _COUNT_FEATURES else float(ling[name][0]))
+            for name in LINGUISTIC_FEATURES}
+
+
+def build_feature_frame(df):
+    """Batch API: raw export DataFrame (all_participant_data.csv) -> feature DataFrame"""
+    import pandas as pd  # the single-row API and its callers do without it
+
+    columns = {col: df[col].to_numpy() for col in df.columns}
+    out = _compute(columns)
+    feature_df = pd.DataFrame(out, index=df.index)
+
+    # Keep counts integer when no row needed NaN
+    for col in feature_df.columns:
+        name = col.replace('free_writing_', '', 1)
+        if (col.startswith('free_writing_') and name in _COUNT_FEATURES
+                and feature_df[col].notna().all()):
+            feature_df[col] = feature_df[col].astype(np.int64)
+    return feature_df.reset_index(drop=True)
+
+
+def extract_row_features(row):
+    """Single-row API: raw export dict -> feature dict (NaN where a feature is unavailable)"""
+    columns = {col: np.array([value], dtype=object if isinstance(value, str) else None)
+               for col, value in row.items()}
+    out = _compute(columns)
+    return {name: values[0].item() if hasattr(values[0], 'item') else values[0]
+            for name, values in out.items()}
+
+
+def task_features(copy_text, copy_duration, free_text, free_duration):
+    """Features for a live demo session, computed exactly like a training row"""
+    features = extract_row_features({
+        'copy_task_duration': copy_duration,
+        'copy_task_word_count': len(copy_text.split()),
+        'copy_task_char_count': len(copy_text),
+        'free_writing_duration': free_duration,
+        'free_writing_word_count': len(free_text.split()),
+        'free_writing_char_count': len(free_text),
+        'free_writing_text': free_text,
+    })
+    return {k: v for k, v in features.items()
+            if not (isinstance(v, float) and np.isnan(v))}
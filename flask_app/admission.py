@@ -0,0 +1,107 @@
+"""
+admission.py
+Admission control for the database work behind /submit, shared by app.py
+(threads) and asgi_app.py (coroutines).
+
+At most SUBMIT_MAX_INFLIGHT submissions (asgi_app.py: MYSQL_POOL_MAX, one
+per pooled connection) hold a database connection at once.
+Up to SUBMIT_MAX_QUEUED more (asgi_app.py: 10 per pooled connection by
+default) wait for a slot, each for at most SUBMIT_QUEUE_SECONDS. Anything
+beyond that is refused immediately with Saturated, which the apps answer
+with 503 and Retry-After. index.html keeps
+the payload in localStorage and retries with jittered backoff, so a class
+opening the link at once gets slightly later writes instead of MySQL's
+connection limit and a wall of 500s.
+
+The limits are per process: with several workers, MySQL sees up to
+workers x SUBMIT_MAX_INFLIGHT connections.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from metrics import SHED, SUBMIT_PHASE_SECONDS
+
+MAX_INFLIGHT  = int(os.environ.get("SUBMIT_MAX_INFLIGHT", 8))
+MAX_QUEUED    = int(os.environ.get("SUBMIT_MAX_QUEUED", 16))
+QUEUE_SECONDS = float(os.environ.get("SUBMIT_QUEUE_SECONDS", 2.0))
+RETRY_AFTER   = int(os.environ.get("SUBMIT_RETRY_AFTER", 2))
+
+
+class Saturated(Exception):
+    def __init__(self, reason, retry_after=RETRY_AFTER):
+        super().__init__(f"Server busy ({reason.replace('_', ' ')}), retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Admission:
+    """Bounded slots plus a bounded, time-limited wait, for threaded workers"""
+
+    def __init__(self, limit=MAX_INFLIGHT, max_queued=MAX_QUEUED, timeout=QUEUE_SECONDS):
+        self.limit = limit
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.waiting = 0
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.max_queued:
+                    SHED.inc(reason="queue_full")
+                    raise Saturated("queue_full")
+                self.waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                SHED.inc(reason="queue_timeout")
+                raise Saturated("queue_timeout")
+        SUBMIT_PHASE_SECONDS.observe(time.perf_counter() - start, phase="admission")
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+class AsyncAdmission:
+    """The same policy for one event loop (asgi_app.py)"""
+
+    def __init__(self, limit=MAX_INFLIGHT, max_queued=MAX_QUEUED, timeout=QUEUE_SECONDS):
+        self.limit = limit
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        start = time.perf_counter()
+        if self._slots.locked():
+            if self.waiting >= self.max_queued:
+                SHED.inc(reason="queue_full")
+                raise Saturated("queue_full")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                SHED.inc(reason="queue_timeout")
+                raise Saturated("queue_timeout") from None
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        SUBMIT_PHASE_SECONDS.observe(time.perf_counter() - start, phase="admission")
+        try:
+            yield
+        finally:
+            self._slots.release()
@@ -1,11 +1,25 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, request, jsonify, render_template, send_file, g, Response, abort
 import mysql.connector
-import uuid
-import base64
+import functools
 import os
+import threading
+import time
 from datetime import datetime
 
-app = Flask(__name__)
+from admission import Admission, Saturated
+from assets import IMMUTABLE, REVALIDATE, Page, StaticAssets
+from consent import check_archived, render_index
+from duplicates import BOOTSTRAP_QUERY, DuplicateIndex, duplicate_note, submission_fingerprint
+from local_store import COLLECTION_MODE, already_saved, get_local_store
+from metrics import (REGISTRY, REQUESTS, ERRORS, REQUEST_SECONDS, SUBMIT_PHASE_SECONDS,
+                     PAYLOAD_BYTES, DECODED_PAYLOAD_BYTES, COMPRESSION_RATIO, NEAR_DUPLICATES,
+                     LOCAL_SUBMISSIONS, SHED, CONTENT_TYPE)
+from submission import (BodyDecoder, InvalidSubmission, PayloadTooLarge, UnsupportedEncoding,
+                        READ_CHUNK, build_inserts, client_ip, decode_submission)
+
+# static/ is served by the hashed-name route below, not Flask's default one
+app = Flask(__name__, static_folder=None)
+ASSETS = StaticAssets()
 
 # ─────────────────────────────────────────
 # MySQL config - set these as environment variables on Render
@@ -22,88 +36,158 @@ DB_CONFIG = {
 def get_db():
     return mysql.connector.connect(**DB_CONFIG)
 
+# Near-duplicate index for this worker, filled from typing_data on the first /submit
+DUPLICATES = DuplicateIndex()
+# One thread runs that table scan; the others wait for it instead of repeating it
+BOOTSTRAP_LOCK = threading.Lock()
+
+# Bounds the submissions holding a DB connection in this worker (gthread workers)
+ADMISSION = Admission()
+
+# ─────────────────────────────────────────
+# Instrumentation
+# ─────────────────────────────────────────
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+@app.route("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+@functools.cache
+def index_page():
+    # Rendered once per worker: the page has no per-request content
+    html, version, _ = render_index(lambda **ctx: render_template(
+        "index.html", asset_url=ASSETS.url, asset_integrity=ASSETS.integrity, **ctx))
+    check_archived(version)
+    return Page(html)
+
 @app.route("/")
 def index():
-    return render_template("index.html")
+    page = index_page()
+    if page.not_modified(request.headers.get("If-None-Match")):
+        response = Response(status=304)
+    else:
+        response = Response(page.body, mimetype="text/html")
+    response.headers["ETag"] = page.etag
+    response.headers["Cache-Control"] = REVALIDATE
+    return response
+
+@app.route("/static/<path:name>")
+def static_asset(name):
+    path = ASSETS.path(name)
+    if path is None:
+        abort(404)
+    response = send_file(path)
+    response.headers["Cache-Control"] = IMMUTABLE
+    return response
 
 @app.route("/submit", methods=["POST"])
 def submit():
     try:
-        data = request.get_json()
-
-        participant_id = data["participant_id"]
-        session_id     = data["session_id"]
-        ip_address     = request.headers.get("X-Forwarded-For", request.remote_addr).split(",")[0].strip()
-        now            = datetime.now()
-
-        conn   = get_db()
-        cursor = conn.cursor()
-
-        # participants
-        cursor.execute("""
-            INSERT INTO participants
-                (participant_id, session_id, ip_address, age, gender,
-                 year_of_study, consent_timestamp, data_version, collection_date)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            participant_id, session_id, ip_address,
-            data["age"], data["gender"], data["year_of_study"],
-            now, "v2", now
-        ))
-
-        # phq9
-        cursor.execute("""
-            INSERT INTO phq9_responses
-                (participant_id, phq9_total, phq9_severity, depression_label,
-                 q1,q2,q3,q4,q5,q6,q7,q8,q9)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            participant_id,
-            data["phq9_total"], data["phq9_severity"],
-            1 if data["phq9_total"] >= 10 else 0,
-            *data["phq9_scores"]
-        ))
-
-        # typing
-        cursor.execute("""
-            INSERT INTO typing_data
-                (participant_id,
-                 copy_task_duration, copy_task_word_count, copy_task_char_count, copy_task_text,
-                 free_writing_duration, free_writing_word_count, free_writing_char_count, free_writing_text)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            participant_id,
-            data["copy_duration"],
-            len(data["copy_text"].split()),
-            len(data["copy_text"]),
-            data["copy_text"],
-            data["free_duration"],
-            len(data["free_text"].split()),
-            len(data["free_text"]),
-            data["free_text"],
-        ))
-
-        # consent record with screenshot
-        cursor.execute("""
-            INSERT INTO consent_records
-                (participant_id, session_id, ip_address, consent_timestamp,
-                 screenshot_base64, data_version, notes)
-            VALUES (%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            participant_id, session_id, ip_address, now,
-            data.get("consent_screenshot"),
-            "v2", None
-        ))
-
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with SUBMIT_PHASE_SECONDS.time(phase="read"):
+            decoder = BodyDecoder(request.headers.get("Content-Encoding"))
+            for chunk in iter(lambda: request.stream.read(READ_CHUNK), b""):
+                decoder.feed(chunk)
+            body = decoder.finish()
+        PAYLOAD_BYTES.observe(decoder.wire_bytes)
+        DECODED_PAYLOAD_BYTES.observe(decoder.size)
+        COMPRESSION_RATIO.observe(decoder.ratio)
+        with SUBMIT_PHASE_SECONDS.time(phase="parse"):
+            submission = decode_submission(body)
+
+        ip_address = client_ip(request.headers.get("X-Forwarded-For"), request.remote_addr)
+
+        with ADMISSION.slot():
+            save_submission(submission, ip_address)
 
         return jsonify({"status": "ok"})
 
+    except Saturated as e:
+        return jsonify({"status": "busy", "message": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+
+    except InvalidSubmission as e:
+        ERRORS.inc(type=type(e).__name__)
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    except PayloadTooLarge as e:
+        ERRORS.inc(type=type(e).__name__)
+        return jsonify({"status": "error", "message": str(e)}), 413
+
+    except UnsupportedEncoding as e:
+        ERRORS.inc(type=type(e).__name__)
+        return jsonify({"status": "error", "message": str(e)}), 415
+
     except Exception as e:
+        ERRORS.inc(type=type(e).__name__)
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+def save_submission(submission, ip_address):
+    """Dedup check and the four inserts, to MySQL or (local mode) the local store"""
+    conn = cursor = None
+    if COLLECTION_MODE != "local":
+        try:
+            with SUBMIT_PHASE_SECONDS.time(phase="connect"):
+                conn   = get_db()
+                cursor = conn.cursor()
+        except mysql.connector.Error:
+            # Nothing here would sync a local copy and the disk is ephemeral, so
+            # refuse it: index.html keeps the payload and retries with backoff
+            SHED.inc(reason="mysql_unavailable")
+            raise Saturated("mysql_unavailable") from None
+
+    try:
+        if not DUPLICATES.bootstrapped:
+            with BOOTSTRAP_LOCK, SUBMIT_PHASE_SECONDS.time(phase="dedup_bootstrap"):
+                if not DUPLICATES.bootstrapped:
+                    if conn is not None:
+                        cursor.execute(BOOTSTRAP_QUERY)
+                        DUPLICATES.add_rows(cursor.fetchall())
+                    else:
+                        DUPLICATES.add_rows(get_local_store().query(BOOTSTRAP_QUERY))
+                    DUPLICATES.bootstrapped = True
+        with SUBMIT_PHASE_SECONDS.time(phase="dedup"):
+            timing  = submission_fingerprint(submission)
+            matches = DUPLICATES.query(submission.free_text, timing)
+        inserts = build_inserts(submission, ip_address, datetime.now(), notes=duplicate_note(matches))
+
+        try:
+            if conn is None:
+                with SUBMIT_PHASE_SECONDS.time(phase="local_write"):
+                    get_local_store().write(inserts)
+                LOCAL_SUBMISSIONS.inc(reason="local_mode")
+            else:
+                # participants, phq9, typing, consent record
+                for table, sql, params in inserts:
+                    with SUBMIT_PHASE_SECONDS.time(phase=f"insert_{table}"):
+                        cursor.execute(sql, params)
+
+                with SUBMIT_PHASE_SECONDS.time(phase="commit"):
+                    conn.commit()
+        except Exception as e:
+            if conn is not None:
+                conn.rollback()
+            if not already_saved(e):
+                raise
+            return   # a retry of a submission that is already stored
+
+        if matches:
+            NEAR_DUPLICATES.inc(reason=matches[0][2])
+        DUPLICATES.add(submission.participant_id, submission.free_text, timing)
+    finally:
+        if conn is not None:
+            cursor.close()
+            conn.close()
+
+
 if __name__ == "__main__":
     app.run(debug=True)
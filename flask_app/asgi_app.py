@@ -0,0 +1,286 @@
+"""
+asgi_app.py
+Async entry point for the collector: the same /, /submit, /metrics and
+/static routes as app.py, served by an ASGI server with an aiomysql connection pool.
+
+Under gunicorn's sync workers a /submit waiting on the remote MySQL holds a
+whole worker; here it only holds a coroutine, so one small instance keeps
+hundreds of submissions in flight while the pool caps database connections.
+Both apps write the same rows (submission.py) and share the same metrics.
+
+Run:
+    uvicorn asgi_app:app --host 0.0.0.0 --port $PORT
+
+Environment:
+    MYSQL_* as for app.py
+    MYSQL_POOL_MIN / MYSQL_POOL_MAX   connection pool bounds (default 2 / 20)
+    COLLECTION_MODE / LOCAL_DB        as for app.py (local_store.py)
+    SUBMIT_MAX_QUEUED                 /submit calls waiting for a pool slot (default 10 x pool)
+    SUBMIT_QUEUE_SECONDS / SUBMIT_RETRY_AFTER   as for app.py (admission.py)
+"""
+
+import asyncio
+import os
+import ssl
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, HTMLResponse, JSONResponse, Response
+from starlette.routing import Route
+
+from admission import AsyncAdmission, Saturated
+from assets import IMMUTABLE, REVALIDATE, Page, StaticAssets, load_template
+from consent import check_archived, render_index
+from duplicates import BOOTSTRAP_QUERY, DuplicateIndex, duplicate_note, submission_fingerprint
+from local_store import COLLECTION_MODE, already_saved, get_local_store
+from metrics import (REGISTRY, REQUESTS, ERRORS, REQUEST_SECONDS, SUBMIT_PHASE_SECONDS,
+                     PAYLOAD_BYTES, DECODED_PAYLOAD_BYTES, COMPRESSION_RATIO, NEAR_DUPLICATES,
+                     LOCAL_SUBMISSIONS, SHED, CONTENT_TYPE)
+from submission import (BodyDecoder, InvalidSubmission, PayloadTooLarge, UnsupportedEncoding,
+                        build_inserts, client_ip, decode_submission)
+
+DB_CONFIG = {
+    "host":     os.environ.get("MYSQL_HOST"),
+    "port":     int(os.environ.get("MYSQL_PORT", 23634)),
+    "user":     os.environ.get("MYSQL_USER"),
+    "password": os.environ.get("MYSQL_PASSWORD"),
+    "db":       os.environ.get("MYSQL_DATABASE", "defaultdb"),
+}
+SSL_CA   = os.environ.get("MYSQL_SSL_CA", "ca.pem")
+POOL_MIN = int(os.environ.get("MYSQL_POOL_MIN", 2))
+POOL_MAX = int(os.environ.get("MYSQL_POOL_MAX", 20))
+# A waiting coroutine costs next to nothing (a waiting gthread request holds a
+# thread), so here the queue is mostly bounded by SUBMIT_QUEUE_SECONDS
+QUEUE_MAX = int(os.environ.get("SUBMIT_MAX_QUEUED", 10 * POOL_MAX))
+# While MySQL is unreachable, retry creating the pool at most this often
+POOL_RETRY_SECONDS = 30
+
+
+async def create_pool():
+    import aiomysql
+
+    return await aiomysql.create_pool(
+        **DB_CONFIG,
+        ssl=ssl.create_default_context(cafile=SSL_CA),
+        minsize=POOL_MIN,
+        maxsize=POOL_MAX,
+        autocommit=False,
+        pool_recycle=3600,
+    )
+
+
+async def get_pool(app):
+    """The MySQL pool, created on first use; None in local mode or while MySQL is unreachable"""
+    if COLLECTION_MODE == "local":
+        return None
+    async with app.state.pool_lock:
+        if app.state.pool is None and time.monotonic() >= app.state.pool_retry_at:
+            try:
+                app.state.pool = await app.state.pool_factory()
+            except Exception as e:
+                print(f"MySQL unavailable ({e}); answering /submit with 503 until it is back")
+                app.state.pool_retry_at = time.monotonic() + POOL_RETRY_SECONDS
+    return app.state.pool
+
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.pool = None
+    app.state.pool_retry_at = 0.0
+    app.state.pool_lock = asyncio.Lock()
+    await get_pool(app)
+    try:
+        yield
+    finally:
+        if app.state.pool is not None:
+            app.state.pool.close()
+            await app.state.pool.wait_closed()
+
+
+def instrumented(endpoint):
+    """Request count and latency per route, as app.py's before/after_request hooks"""
+    def decorator(handler):
+        async def wrapper(request):
+            start = time.perf_counter()
+            response = await handler(request)
+            REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+            return response
+        return wrapper
+    return decorator
+
+
+@instrumented("/metrics")
+async def metrics(request):
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@instrumented("/")
+async def index(request):
+    page = request.app.state.index_page
+    headers = {"ETag": page.etag, "Cache-Control": REVALIDATE}
+    if page.not_modified(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(page.body, headers=headers)
+
+
+@instrumented("/static/<path:name>")
+async def static_asset(request):
+    path = request.app.state.assets.path(request.path_params["name"])
+    if path is None:
+        return Response("Not Found", status_code=404)
+    return FileResponse(path, headers={"Cache-Control": IMMUTABLE})
+
+
+@instrumented("/submit")
+async def submit(request):
+    try:
+        with SUBMIT_PHASE_SECONDS.time(phase="read"):
+            decoder = BodyDecoder(request.headers.get("content-encoding"))
+            async for chunk in request.stream():
+                decoder.feed(chunk)
+            body = decoder.finish()
+        PAYLOAD_BYTES.observe(decoder.wire_bytes)
+        DECODED_PAYLOAD_BYTES.observe(decoder.size)
+        COMPRESSION_RATIO.observe(decoder.ratio)
+        with SUBMIT_PHASE_SECONDS.time(phase="parse"):
+            submission = decode_submission(body)
+
+        peer       = request.client.host if request.client else None
+        ip_address = client_ip(request.headers.get("x-forwarded-for"), peer)
+
+        async with request.app.state.admission.slot():
+            await save_submission(request.app, submission, ip_address)
+
+        return JSONResponse({"status": "ok"})
+
+    except Saturated as e:
+        return JSONResponse({"status": "busy", "message": str(e)}, status_code=503,
+                            headers={"Retry-After": str(e.retry_after)})
+
+    except InvalidSubmission as e:
+        ERRORS.inc(type=type(e).__name__)
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=400)
+
+    except PayloadTooLarge as e:
+        ERRORS.inc(type=type(e).__name__)
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=413)
+
+    except UnsupportedEncoding as e:
+        ERRORS.inc(type=type(e).__name__)
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=415)
+
+    except Exception as e:
+        ERRORS.inc(type=type(e).__name__)
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+
+async def save_submission(app, submission, ip_address):
+    """app.py's save_submission on the pool, or (local mode) the local store"""
+    if COLLECTION_MODE == "local":
+        await write_local(app, submission, ip_address)
+        return
+    duplicates = app.state.duplicates
+    conn = None
+    with SUBMIT_PHASE_SECONDS.time(phase="connect"):
+        pool = await get_pool(app)
+        if pool is not None:
+            try:
+                conn = await pool.acquire()
+            except Exception:
+                conn = None
+    if conn is None:
+        # As app.py: refused rather than kept on this ephemeral disk; index.html retries
+        SHED.inc(reason="mysql_unavailable")
+        raise Saturated("mysql_unavailable")
+    try:
+        async with conn.cursor() as cursor:
+            if not duplicates.bootstrapped:
+                async with app.state.bootstrap_lock:
+                    if not duplicates.bootstrapped:
+                        with SUBMIT_PHASE_SECONDS.time(phase="dedup_bootstrap"):
+                            await cursor.execute(BOOTSTRAP_QUERY)
+                            # MinHash over the whole table: off the event loop
+                            await run_in_threadpool(duplicates.add_rows, await cursor.fetchall())
+                            duplicates.bootstrapped = True
+            with SUBMIT_PHASE_SECONDS.time(phase="dedup"):
+                timing  = submission_fingerprint(submission)
+                matches = duplicates.query(submission.free_text, timing)
+            inserts = build_inserts(submission, ip_address, datetime.now(),
+                                    notes=duplicate_note(matches))
+            for table, sql, params in inserts:
+                with SUBMIT_PHASE_SECONDS.time(phase=f"insert_{table}"):
+                    await cursor.execute(sql, params)
+        with SUBMIT_PHASE_SECONDS.time(phase="commit"):
+            await conn.commit()
+    except Exception as e:
+        await conn.rollback()
+        if not already_saved(e):
+            raise
+        return   # a retry of a submission that is already stored
+    finally:
+        pool.release(conn)
+    if matches:
+        NEAR_DUPLICATES.inc(reason=matches[0][2])
+    duplicates.add(submission.participant_id, submission.free_text, timing)
+
+
+async def write_local(app, submission, ip_address):
+    """app.py's local-store path: sqlite3 blocks, so it runs in the threadpool"""
+    store, duplicates = get_local_store(), app.state.duplicates
+    if not duplicates.bootstrapped:
+        async with app.state.bootstrap_lock:
+            if not duplicates.bootstrapped:
+                with SUBMIT_PHASE_SECONDS.time(phase="dedup_bootstrap"):
+                    rows = await run_in_threadpool(store.query, BOOTSTRAP_QUERY)
+                    await run_in_threadpool(duplicates.add_rows, rows)
+                    duplicates.bootstrapped = True
+    with SUBMIT_PHASE_SECONDS.time(phase="dedup"):
+        timing  = submission_fingerprint(submission)
+        matches = duplicates.query(submission.free_text, timing)
+    inserts = build_inserts(submission, ip_address, datetime.now(), notes=duplicate_note(matches))
+    try:
+        with SUBMIT_PHASE_SECONDS.time(phase="local_write"):
+            await run_in_threadpool(store.write, inserts)
+    except Exception as e:
+        if not already_saved(e):
+            raise
+        return
+    if matches:
+        NEAR_DUPLICATES.inc(reason=matches[0][2])
+    LOCAL_SUBMISSIONS.inc(reason="local_mode")
+    duplicates.add(submission.participant_id, submission.free_text, timing)
+
+
+def create_app(pool_factory=create_pool):
+    app = Starlette(
+        routes=[
+            Route("/", index),
+            Route("/submit", submit, methods=["POST"]),
+            Route("/metrics", metrics),
+            Route("/static/{name:path}", static_asset),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.pool_factory = pool_factory
+    # Near-duplicate index for this process, filled from typing_data on the first /submit
+    app.state.duplicates = DuplicateIndex()
+    # One coroutine runs that table scan; the others wait for it instead of repeating it
+    app.state.bootstrap_lock = asyncio.Lock()
+    # One admission slot per pooled connection, so no request queues inside aiomysql
+    app.state.admission = AsyncAdmission(limit=POOL_MAX, max_queued=QUEUE_MAX)
+    # Same template and hashed asset URLs as app.py, rendered once per process
+    app.state.assets = StaticAssets()
+    template = load_template("index.html")
+    assets = app.state.assets
+    html, version, _ = render_index(lambda **ctx: template.render(
+        asset_url=assets.url, asset_integrity=assets.integrity, **ctx))
+    check_archived(version)
+    app.state.index_page = Page(html)
+    return app
+
+
+app = create_app()
@@ -0,0 +1,188 @@
+"""
+assets.py
+Static assets and the index page for app.py and asgi_app.py.
+
+Files under static/ are served from /static/ with the first 12 hex digits of
+their SHA-256 in the name (vendor/html2canvas.min.<hash>.js), so they can be
+cached as immutable for a year: a new build changes the URL, never the bytes
+behind it. The page itself is rendered once per process and revalidated by
+ETag, so a repeat visit costs one 304 with no body.
+
+The consent-step libraries are pinned in VENDOR, by URL and by cdnjs's
+published Subresource Integrity hash, and committed under static/vendor/.
+The build only runs `python assets.py --check`, which fails unless every
+pinned library is committed with exactly the pinned bytes; it never touches
+the network. To add or bump a library, change its pin and run
+`python assets.py --fetch` on a machine with network access, then commit
+the file. A checkout without the files (local development) falls back to
+the same pinned CDN URLs, loaded with the same hash as their integrity
+attribute.
+
+Usage:
+    python assets.py            # list assets and their hashed URLs
+    python assets.py --check    # verify the committed libraries (build step)
+    python assets.py --fetch    # download missing pinned libraries (developers)
+"""
+
+import argparse
+import base64
+import hashlib
+import sys
+import urllib.request
+from pathlib import Path
+
+STATIC_DIR = Path(__file__).with_name("static")
+STATIC_PREFIX = "/static/"
+TEMPLATES_DIR = Path(__file__).with_name("templates")
+
+# name -> (pinned URL, SRI hash as published by cdnjs)
+VENDOR = {
+    "vendor/html2canvas.min.js": (
+        "https://cdnjs.cloudflare.com/ajax/libs/html2canvas/1.4.1/html2canvas.min.js",
+        "sha512-BNaRQnYJYiPSqHHDb58B0yaPfCu+Wgds8Gp/gU33kqBtgNS4tSPHuGibyoeqMV/TJlSKda6FXzoEyYGjTe+vXA==",
+    ),
+    "vendor/jspdf.umd.min.js": (
+        "https://cdnjs.cloudflare.com/ajax/libs/jspdf/2.5.1/jspdf.umd.min.js",
+        "sha512-qZvrmS2ekKPF2mSznTQsxqPgnpkI4DNTlrdUmTzrDgektczlKNRRhy5X5AAOnx5S09ydFYWWNSfcEqDTTHgtNA==",
+    ),
+}
+
+IMMUTABLE   = "public, max-age=31536000, immutable"
+REVALIDATE  = "no-cache"
+HASH_LENGTH = 12
+
+
+def hashed_name(name, data):
+    """vendor/jspdf.umd.min.js -> vendor/jspdf.umd.min.<sha256[:12]>.js"""
+    stem, dot, ext = name.rpartition(".")
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    return f"{stem}.{digest}.{ext}" if dot else f"{name}.{digest}"
+
+
+def sri_hash(data, algorithm="sha512"):
+    """Subresource Integrity value of `data`, e.g. sha512-<base64 digest>"""
+    digest = hashlib.new(algorithm, data).digest()
+    return f"{algorithm}-{base64.b64encode(digest).decode('ascii')}"
+
+
+class IntegrityError(Exception):
+    pass
+
+
+def check_integrity(name, data):
+    """Raise IntegrityError unless `data` is the pinned build of vendor library `name`"""
+    expected = VENDOR[name][1]
+    actual = sri_hash(data, expected.split("-", 1)[0])
+    if actual != expected:
+        raise IntegrityError(f"{name}: got {actual}, pinned {expected}")
+
+
+class StaticAssets:
+    """Content-hashed URLs for the files under static/, computed once at startup"""
+
+    def __init__(self, static_dir=STATIC_DIR, prefix=STATIC_PREFIX):
+        self.prefix = prefix
+        self.urls  = {}   # name -> URL
+        self.files = {}   # hashed name -> path
+        if Path(static_dir).is_dir():
+            for path in sorted(Path(static_dir).rglob("*")):
+                if path.is_file() and not path.name.startswith("."):
+                    name   = path.relative_to(static_dir).as_posix()
+                    hashed = hashed_name(name, path.read_bytes())
+                    self.urls[name]    = prefix + hashed
+                    self.files[hashed] = path
+
+    def url(self, name):
+        """URL to put in the page; pinned CDN copy for a library not vendored yet"""
+        if name in self.urls:
+            return self.urls[name]
+        if name in VENDOR:
+            return VENDOR[name][0]
+        raise KeyError(f"static/{name} not found")
+
+    def integrity(self, name):
+        """Pinned SRI hash of a vendor library (the same bytes vendored or on the CDN), else None"""
+        return VENDOR[name][1] if name in VENDOR else None
+
+    def path(self, hashed):
+        """File behind a hashed name, None for anything else (stale or unknown hash)"""
+        return self.files.get(hashed)
+
+
+class Page:
+    """A rendered page with a strong ETag over its bytes"""
+
+    def __init__(self, html):
+        self.body = html.encode("utf-8")
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+
+    def not_modified(self, if_none_match):
+        """True if an If-None-Match header already names this version"""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison (RFC 9110 13.1.2): W/"x" matches "x"
+        return "*" in tags or any(tag.removeprefix("W/") == self.etag for tag in tags)
+
+
+def load_template(name):
+    """A template outside a Flask app context (asgi_app.py, consent.py), same autoescaping"""
+    import jinja2
+
+    environment = jinja2.Environment(loader=jinja2.FileSystemLoader(TEMPLATES_DIR), autoescape=True)
+    return environment.get_template(name)
+
+
+def check_vendor(static_dir=STATIC_DIR):
+    """Raise IntegrityError unless every pinned library is vendored with its pinned bytes"""
+    for name in VENDOR:
+        path = Path(static_dir) / name
+        if not path.exists():
+            raise IntegrityError(f"{name}: not vendored (run `python assets.py --fetch` and commit it)")
+        check_integrity(name, path.read_bytes())
+
+
+def fetch_vendor(static_dir=STATIC_DIR):
+    """
+    Download every pinned library that is not vendored yet and check every
+    vendored one against its pinned hash; [(name, hashed name)] downloaded.
+    Raises IntegrityError (writing nothing) on a mismatch.
+    """
+    fetched = []
+    for name, (url, _) in VENDOR.items():
+        path = Path(static_dir) / name
+        if path.exists():
+            check_integrity(name, path.read_bytes())
+            continue
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        check_integrity(name, data)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        fetched.append((name, hashed_name(name, data)))
+    return fetched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List or vendor the collector's static assets")
+    parser.add_argument("--check", action="store_true",
+                        help="fail unless static/vendor/ holds every pinned library, byte for byte")
+    parser.add_argument("--fetch", action="store_true", help="download the pinned libraries into static/vendor/")
+    args = parser.parse_args()
+
+    if args.check:
+        try:
+            check_vendor()
+        except IntegrityError as e:
+            sys.exit(f"Integrity check failed: {e}")
+    if args.fetch:
+        try:
+            fetched = fetch_vendor()
+        except IntegrityError as e:
+            sys.exit(f"Integrity check failed, not vendoring: {e}")
+        for name, hashed in fetched:
+            print(f"Vendored {name} -> static/{hashed}")
+    assets = StaticAssets()
+    for name in sorted(set(assets.urls) | set(VENDOR)):
+        source = "" if name in assets.urls else "  (not vendored: CDN fallback)"
+        print(f"{name:<32} {assets.url(name)}{source}")
@@ -0,0 +1,258 @@
+"""
+consent.py
+Consent text versions and the ethics-committee PDF for a consent record.
+
+The text a participant agrees to is whatever index.html marks with
+data-consent-text, rendered for the current CONSENT_CAPTURE mode. Its
+SHA-256 is the version the page sends back in the consent record
+(submission.ConsentRecord). Each version's text is archived under
+consent_texts/<version>.txt and committed, so the exact wording behind any
+stored record can be shown years later. The app warns at startup if the
+version it serves is not archived yet.
+
+The PDF is rendered on demand from the stored record rather than captured
+in the browser: a plain-text A4 page with the record, its integrity checks
+and the archived text, written directly (no PDF library needed).
+
+Usage:
+    python consent.py --archive                 # after editing the consent wording
+    python consent.py 3F8K2Q1Z                  # -> consent_pdfs/3F8K2Q1Z.pdf
+    python consent.py 3F8K2Q1Z 7H2M0P4X --output-dir ethics_review
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import textwrap
+import zlib
+from html.parser import HTMLParser
+from pathlib import Path
+
+# "record" (structured consent record) or "screenshot" (browser-rendered PDF)
+CONSENT_CAPTURE = os.environ.get("CONSENT_CAPTURE", "record")
+TEXTS_DIR = Path(__file__).with_name("consent_texts")
+OUTPUT_DIR = "consent_pdfs"
+
+RECORD_QUERY = """
+    SELECT participant_id, session_id, ip_address, consent_timestamp,
+           consent_record, consent_sha256, data_version
+    FROM consent_records
+    WHERE participant_id = %s
+"""
+
+
+class _ConsentTextParser(HTMLParser):
+    """Text inside elements carrying data-consent-text, in document order"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._depth = 0   # >0 while inside a marked element
+
+    def handle_starttag(self, tag, attrs):
+        if self._depth:
+            self._depth += 1
+        elif any(name == "data-consent-text" for name, _ in attrs):
+            self._depth = 1
+        if self._depth and tag == "li":
+            self.parts.append("\n- ")
+
+    def handle_endtag(self, tag):
+        if self._depth:
+            self._depth -= 1
+            if not self._depth:
+                self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if self._depth:
+            self.parts.append(data)
+
+
+def consent_text(html):
+    """Normalized consent text of a rendered page: one paragraph or bullet per line"""
+    parser = _ConsentTextParser()
+    parser.feed(html)
+    lines = (re.sub(r"\s+", " ", line).strip() for line in "".join(parser.parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def text_version(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def render_index(render, mode=CONSENT_CAPTURE):
+    """
+    (html, version, text) for index.html. `render(**context)` renders the
+    template; it runs twice because the page embeds the version of its own
+    consent text, which is only known once that text has been rendered.
+    """
+    text = consent_text(render(consent_mode=mode, consent_version=""))
+    version = text_version(text)
+    return render(consent_mode=mode, consent_version=version), version, text
+
+
+def archived_text(version, texts_dir=TEXTS_DIR):
+    path = Path(texts_dir) / f"{version}.txt"
+    return path.read_text(encoding="utf-8") if path.exists() else None
+
+
+def archive_text(text, texts_dir=TEXTS_DIR):
+    """Write consent_texts/<version>.txt (unchanged if already there); returns the version"""
+    version = text_version(text)
+    path = Path(texts_dir) / f"{version}.txt"
+    if not path.exists():
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    return version
+
+
+def check_archived(version, texts_dir=TEXTS_DIR):
+    if archived_text(version, texts_dir) is None:
+        print(f"WARNING: consent text {version[:12]} is not in {texts_dir}; "
+              f"run `python consent.py --archive` and commit it")
+
+
+# ─────────────────────────────────────────
+# PDF
+# ─────────────────────────────────────────
+PAGE_WIDTH, PAGE_HEIGHT, MARGIN = 595, 842, 56   # A4 in points
+FONTS = {"F1": "Helvetica", "F2": "Helvetica-Bold", "F3": "Courier"}
+
+
+def _pdf_string(text):
+    raw = text.encode("cp1252", "replace")   # WinAnsiEncoding covers the consent text (—, ’, …)
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def write_pdf(lines):
+    """
+    Minimal PDF from [(font, size, text)], one entry per output line,
+    wrapped to the page width and paginated. Returns the file's bytes.
+    """
+    pages, ops, y = [], [], PAGE_HEIGHT - MARGIN
+    for font, size, text in lines:
+        # Helvetica averages ~0.5em per character, Courier is exactly 0.6em
+        per_line = int((PAGE_WIDTH - 2 * MARGIN) / (size * (0.6 if font == "F3" else 0.5)))
+        for piece in textwrap.wrap(text, per_line, break_long_words=True) or [""]:
+            if y < MARGIN + size:
+                pages.append(b"\n".join(ops))
+                ops, y = [], PAGE_HEIGHT - MARGIN
+            y -= size * 1.4
+            ops.append(b"BT /%s %d Tf %d %.1f Td %s Tj ET" % (font.encode(), size, MARGIN, y,
+                                                              _pdf_string(piece)))
+    pages.append(b"\n".join(ops))
+
+    # 1 catalog, 2 page tree, 3.. fonts, then a page and its content stream per page
+    font_ids = {name: 3 + i for i, name in enumerate(FONTS)}
+    first_page = 3 + len(FONTS)
+    page_ids = [first_page + 2 * i for i in range(len(pages))]
+    font_refs = b" ".join(b"/%s %d 0 R" % (name.encode(), font_ids[name]) for name in FONTS)
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), len(pages)),
+    ]
+    objects += [b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % base.encode()
+                for base in FONTS.values()]
+    for page_id, content in zip(page_ids, pages):
+        stream = zlib.compress(content)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << %s >> >> "
+                       b"/Contents %d 0 R >>" % (PAGE_WIDTH, PAGE_HEIGHT, font_refs, page_id + 1))
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(stream), stream))
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def render_pdf(row, texts_dir=TEXTS_DIR):
+    """Consent PDF for one consent_records row (dict with RECORD_QUERY's columns)"""
+    lines = [("F2", 16, "Mental Health Typing Study - Record of Consent"), ("F1", 10, "")]
+    if not row.get("consent_record"):
+        # v1 rows and screenshot-mode submissions have no structured record
+        lines += [("F1", 11, f"Participant ID: {row['participant_id']}"),
+                  ("F1", 11, "No structured consent record is stored for this participant "
+                             f"(data version {row.get('data_version')}). Any browser-captured consent "
+                             "PDF is in consent_records.screenshot_base64.")]
+        return write_pdf(lines)
+
+    record = json.loads(row["consent_record"])
+    record_ok = hashlib.sha256(row["consent_record"].encode("utf-8")).hexdigest() == row["consent_sha256"]
+    text = archived_text(record["version"], texts_dir)
+    text_ok = text is not None and text_version(text) == record["version"]
+
+    lines += [
+        ("F1", 11, f"Participant ID: {record['participant_id']}"),
+        ("F1", 11, f"Session ID: {record['session_id']}"),
+        ("F1", 11, f"Consent form shown: {record['shown_at']}"),
+        ("F1", 11, f"Consent given: {record['agreed_at']}"),
+        ("F1", 11, f"Consent checkbox ticked: {'yes' if record['checkbox'] else 'no'}"),
+        ("F1", 11, f"Received by server: {row.get('consent_timestamp')}"),
+        ("F1", 11, f"IP address: {row.get('ip_address')}"),
+        ("F1", 10, ""),
+        ("F2", 11, "Integrity"),
+        ("F1", 10, "Record SHA-256 " + ("(matches stored record):" if record_ok else "(DOES NOT MATCH stored record):")),
+        ("F3", 9, row["consent_sha256"] or ""),
+        ("F1", 10, "Consent text version " + ("(archived text matches):" if text_ok else "(TEXT NOT ARCHIVED):")),
+        ("F3", 9, record["version"]),
+        ("F1", 10, ""),
+        ("F2", 11, "Consent text shown to the participant"),
+    ]
+    for paragraph in (text or "(not available)").split("\n"):
+        lines.append(("F1", 10, paragraph))
+    return write_pdf(lines)
+
+
+def fetch_record(cursor, participant_id):
+    cursor.execute(RECORD_QUERY, (participant_id,))
+    return cursor.fetchone()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive consent text versions and render consent PDFs")
+    parser.add_argument("participant_ids", nargs="*", help="participants to render a consent PDF for")
+    parser.add_argument("--archive", action="store_true",
+                        help="archive the consent text index.html currently shows (both capture modes)")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    args = parser.parse_args(argv)
+
+    if args.archive:
+        from assets import StaticAssets, load_template
+
+        template = load_template("index.html")
+        assets = StaticAssets()
+        for mode in ("record", "screenshot"):
+            _, version, text = render_index(lambda **ctx: template.render(
+                asset_url=assets.url, asset_integrity=assets.integrity, **ctx), mode)
+            archive_text(text)
+            print(f"{mode:<10} {version}  -> {TEXTS_DIR.name}/{version}.txt")
+
+    if args.participant_ids:
+        import mysql.connector
+        from export_to_csv import DB_CONFIG
+
+        Path(args.output_dir).mkdir(exist_ok=True)
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor(dictionary=True)
+        for participant_id in args.participant_ids:
+            row = fetch_record(cursor, participant_id)
+            if row is None:
+                print(f"{participant_id}: no consent record")
+                continue
+            path = Path(args.output_dir) / f"{participant_id}.pdf"
+            path.write_bytes(render_pdf(row))
+            print(f"{participant_id}: {path}")
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
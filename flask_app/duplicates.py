@@ -0,0 +1,256 @@
+"""
+duplicates.py
+Near-duplicate submission detection with a MinHash LSH index.
+
+validation_queries.sql #3 and #4 only catch repeated ip_address/session_id.
+Here every submission is indexed by
+  - a MinHash signature of its free-writing text (word 3-gram shingles), so
+    a pasted or lightly edited essay matches whatever network it came from;
+  - a copy-task timing fingerprint (durations to the second + copy char
+    count). It is far too coarse to identify anyone (every copy task has
+    the same text, and unrelated participants share whole-second durations),
+    so it never flags a submission by itself: it only corroborates a text
+    match, reported as "text+timing".
+
+Signatures are split into bands and each band is hashed into a bucket, so a
+lookup touches only the submissions sharing a bucket instead of scanning the
+whole participant table. Candidates are confirmed by estimated Jaccard
+similarity >= threshold. With 32 bands of 4 rows, pairs at Jaccard 0.5 are
+found with probability 0.87 and at 0.7 with 0.9998.
+
+The collectors keep one index per process, filled from typing_data on the
+first /submit and updated after each commit; matches are written to
+consent_records.notes. export_to_csv.py updates duplicate_index.pkl with the
+exported rows.
+
+Usage:
+    python duplicates.py                              # report over duplicate_index.pkl
+    python duplicates.py all_participant_data.csv     # report over an export
+"""
+
+import argparse
+import pickle
+import re
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+INDEX_PATH = "duplicate_index.pkl"
+NUM_PERM   = 128
+BANDS      = 32
+THRESHOLD  = 0.5
+SHINGLE    = 3
+
+# Columns the collectors bootstrap from; the export has the same names
+COLUMNS = ["participant_id", "free_writing_text", "copy_task_duration",
+           "copy_task_char_count", "free_writing_duration"]
+BOOTSTRAP_QUERY = """
+    SELECT participant_id, free_writing_text, copy_task_duration,
+           copy_task_char_count, free_writing_duration
+    FROM typing_data
+"""
+
+# Unicode word characters, so non-Latin essays shingle like English ones
+_WORD = re.compile(r"\w+(?:'\w+)*")
+
+
+def shingle_hashes(text, k=SHINGLE):
+    """
+    crc32 of each word k-gram of the lower-cased text (all its words if
+    fewer than k); empty for text with no words, which gets no signature
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    grams = {" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))}
+    return np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def timing_fingerprint(copy_duration, copy_char_count, free_duration):
+    if copy_duration is None or free_duration is None:
+        return None
+    return (round(float(copy_duration)), int(copy_char_count or 0), round(float(free_duration)))
+
+
+def submission_fingerprint(submission):
+    """timing_fingerprint of a decoded submission.Submission"""
+    return timing_fingerprint(submission.copy_duration, submission.copy_char_count,
+                              submission.free_duration)
+
+
+class DuplicateIndex:
+    """MinHash LSH over free-writing text; timing fingerprints corroborate its matches"""
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, threshold=THRESHOLD, seed=1):
+        assert num_perm % bands == 0
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: (a*x + b) mod 2**64, top 32 bits; a odd
+        self._a = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+        self.signatures = {}
+        self.timings = {}
+        self._buckets = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        self.bootstrapped = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        state.pop("_by_timing", None)   # timing-only matching, in indexes saved before it was dropped
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def signature(self, text):
+        hashes = shingle_hashes(text or "")
+        if len(hashes) == 0:
+            return None
+        with np.errstate(over="ignore"):
+            mixed = (hashes[:, None] * self._a + self._b) >> np.uint64(32)
+        return mixed.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, sig):
+        return [sig[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, key, text, timing=None):
+        """Index one submission; re-adding a key is a no-op"""
+        sig = self.signature(text)
+        with self._lock:
+            if key in self.signatures or key in self.timings:
+                return
+            if sig is not None:
+                self.signatures[key] = sig
+                for bucket, band in zip(self._buckets, self._band_keys(sig)):
+                    bucket.setdefault(band, []).append(key)
+            if timing is not None:
+                self.timings[key] = timing
+
+    def add_rows(self, rows):
+        """Rows as (participant_id, free_writing_text, copy_task_duration,
+        copy_task_char_count, free_writing_duration), i.e. BOOTSTRAP_QUERY's columns"""
+        for key, text, copy_duration, copy_chars, free_duration in rows:
+            if isinstance(text, float):  # NaN from pandas
+                text = ""
+            self.add(str(key), text, timing_fingerprint(copy_duration, copy_chars, free_duration))
+        return self
+
+    def _lookup(self, sig, timing, exclude=None):
+        matches = {}
+        if sig is not None:
+            candidates = set()
+            for bucket, band in zip(self._buckets, self._band_keys(sig)):
+                candidates.update(bucket.get(band, ()))
+            candidates.discard(exclude)
+            for key in candidates:
+                similarity = float(np.mean(self.signatures[key] == sig))
+                if similarity >= self.threshold:
+                    same_timing = timing is not None and self.timings.get(key) == timing
+                    matches[key] = (similarity, "text+timing" if same_timing else "text")
+        return sorted(((key, sim, reason) for key, (sim, reason) in matches.items()),
+                      key=lambda match: -match[1])
+
+    def query(self, text, timing=None):
+        """[(participant_id, estimated Jaccard, reason)] for an unindexed submission"""
+        return self._lookup(self.signature(text), timing)
+
+    def near_duplicates(self, key):
+        """Matches for an already indexed submission, excluding itself"""
+        return self._lookup(self.signatures.get(key), self.timings.get(key), exclude=key)
+
+    def clusters(self):
+        """Groups of two or more submissions connected by near-duplicate matches"""
+        parent = {}
+
+        def find(x):
+            while parent.get(x, x) != x:
+                parent[x] = parent.get(parent[x], parent[x])
+                x = parent[x]
+            return x
+
+        keys = set(self.signatures) | set(self.timings)
+        for key in keys:
+            for other, _, _ in self.near_duplicates(key):
+                parent[find(key)] = find(other)
+        groups = {}
+        for key in keys:
+            groups.setdefault(find(key), []).append(key)
+        return sorted((sorted(g) for g in groups.values() if len(g) > 1), key=len, reverse=True)
+
+    def save(self, path=INDEX_PATH):
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        """The saved index, or an empty one if there is none yet"""
+        if not Path(path).exists():
+            return cls()
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def update_from_export(df, path=INDEX_PATH):
+    """Add the exported rows not yet in the saved index and save it; returns (index, rows added)"""
+    index = DuplicateIndex.load(path)
+    before = len(index)
+    index.add_rows(df[COLUMNS].itertuples(index=False, name=None))
+    index.save(path)
+    return index, len(index) - before
+
+
+def _describe(key, similarity, reason):
+    return f"{key} ({reason} {similarity:.2f})"
+
+
+def duplicate_note(matches, limit=5):
+    """consent_records.notes text for a submission's matches (None if there are none)"""
+    if not matches:
+        return None
+    parts = [_describe(*match) for match in matches[:limit]]
+    more = f" +{len(matches) - limit} more" if len(matches) > limit else ""
+    return "near-duplicate of: " + ", ".join(parts) + more
+
+
+def print_report(index):
+    print("=" * 60)
+    print("NEAR-DUPLICATE SUBMISSIONS")
+    print("=" * 60)
+    clusters = index.clusters()
+    print(f"{len(index)} submissions indexed, {len(clusters)} cluster(s) flagged\n")
+    for i, cluster in enumerate(clusters, 1):
+        print(f"Cluster {i} ({len(cluster)} submissions)")
+        for key in cluster:
+            matches = ", ".join(_describe(*match) for match in index.near_duplicates(key))
+            print(f"  {key:<12} -> {matches}")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report near-duplicate submissions")
+    parser.add_argument("csv", nargs="?", help="export to index (default: the saved index)")
+    parser.add_argument("--index", default=INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.csv:
+        import pandas as pd
+
+        df = pd.read_csv(args.csv, dtype={"participant_id": str})
+        index = DuplicateIndex().add_rows(df[COLUMNS].itertuples(index=False, name=None))
+    else:
+        index = DuplicateIndex.load(args.index)
+    print_report(index)
+
+
+if __name__ == "__main__":
+    main()
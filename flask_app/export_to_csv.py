@@ -3,13 +3,20 @@ export_to_csv.py
 Exports MySQL data to all_participant_data.csv in the same format
 as the original Google Sheets export, so csv_feature_extraction.py works unchanged.
 
+With --tables it also snapshots the four tables to exports/<table>.parquet,
+which analytics.py queries offline instead of the live database.
+
 Usage:
     python export_to_csv.py
+    python export_to_csv.py --tables
 """
 
-import mysql.connector
-import pandas as pd
+import argparse
 import os
+from pathlib import Path
+
+# mysql.connector, pandas and duplicates (numpy) are imported where they are
+# used, so `--help` and the pipeline.py subcommand list start instantly
 
 DB_CONFIG = {
     "host":     "mysql-2f7ea6c7-azlaanmohammad95-9df7.a.aivencloud.com",
@@ -20,11 +27,9 @@ DB_CONFIG = {
     "ssl_ca":   "ca.pem",
 }
 
-def export():
-    conn   = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor(dictionary=True)
+OUTPUT_PATH = "all_participant_data.csv"
 
-    cursor.execute("""
+EXPORT_QUERY = """
         SELECT
             p.participant_id,
             p.age,
@@ -55,16 +60,72 @@ def export():
         JOIN phq9_responses q ON p.participant_id = q.participant_id
         JOIN typing_data    t ON p.participant_id = t.participant_id
         ORDER BY p.collection_date
-    """)
+"""
 
+TABLES_DIR = "exports"
+
+# One SELECT per table for the offline snapshot. The consent PDFs stay in the
+# database: screenshot_base64 keeps its NULLs and is '' otherwise, which is all
+# validation query #11 looks at. The structured consent records are small and
+# exported whole.
+TABLE_QUERIES = {
+    "participants":    "SELECT * FROM participants",
+    "phq9_responses":  "SELECT * FROM phq9_responses",
+    "typing_data":     "SELECT * FROM typing_data",
+    "consent_records": """
+        SELECT id, participant_id, session_id, ip_address, consent_timestamp,
+               IF(screenshot_base64 IS NULL, NULL, '') AS screenshot_base64,
+               consent_record, consent_sha256, data_version, notes
+        FROM consent_records
+    """,
+}
+
+def fetch_rows(query=EXPORT_QUERY):
+    import mysql.connector
+
+    conn   = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(query)
     rows = cursor.fetchall()
     cursor.close()
     conn.close()
+    return rows
+
+def write_csv(rows, output_path=OUTPUT_PATH):
+    """Write fetched rows to CSV (kept separate so it can be benchmarked offline)"""
+    import pandas as pd
 
     df = pd.DataFrame(rows)
-    df.rename(columns={"collection_date": "collection_date"}, inplace=True)
-    df.to_csv("all_participant_data.csv", index=False)
-    print(f"Exported {len(df)} rows to all_participant_data.csv")
+    df.to_csv(output_path, index=False)
+    return df
 
-if __name__ == "__main__":
+def export():
+    from duplicates import update_from_export
+
+    df = write_csv(fetch_rows())
+    print(f"Exported {len(df)} rows to {OUTPUT_PATH}")
+    index, added = update_from_export(df)
+    print(f"Duplicate index: {added} new, {len(index.clusters())} near-duplicate cluster(s) "
+          f"(python duplicates.py for the report)")
+
+def export_tables(output_dir=TABLES_DIR):
+    """Snapshot each table to <output_dir>/<table>.parquet for analytics.py"""
+    import pandas as pd
+
+    Path(output_dir).mkdir(exist_ok=True)
+    for table, query in TABLE_QUERIES.items():
+        df = pd.DataFrame(fetch_rows(query))
+        df.to_parquet(Path(output_dir) / f"{table}.parquet", index=False)
+        print(f"Exported {len(df)} rows to {output_dir}/{table}.parquet")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the study database")
+    parser.add_argument("--tables", action="store_true",
+                        help=f"also snapshot every table to {TABLES_DIR}/ for analytics.py")
+    args = parser.parse_args(argv)
     export()
+    if args.tables:
+        export_tables()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+local_store.py
+Offline-first collection: submissions written to an embedded SQLite database
+with the four tables from migrate.py, pushed to MySQL later in bulk.
+
+The collectors (app.py, asgi_app.py, streamlit_collector.py) write here
+when COLLECTION_MODE=local, so a lab session with no network never loses a
+submission. In the default remote mode only streamlit_collector.py falls
+back here when MySQL cannot be reached, since it runs a sync worker; the
+web collectors answer 503 instead and index.html keeps and retries the
+payload, as nothing would push a copy left on their ephemeral disk. The rows are the same (table, sql, params) inserts that would
+have gone to MySQL, with the %s placeholders swapped for SQLite's.
+
+`sync` pushes every pending participant with its three child rows, a batch
+of participants per MySQL transaction with one multi-row INSERT per table,
+then marks them synced (participants.sync_state). It is idempotent:
+participants already in MySQL, e.g. from a sync that committed there but
+was interrupted before marking them here, are only marked, never inserted
+twice. Only the same submission counts as already there: a MySQL row
+with the same participant_id but another session_id is a different
+participant whose generated ID collided, and the local one is marked
+conflict and kept. A batch MySQL rejects is retried one participant at a
+time, and a participant whose rows MySQL still rejects (a value too long
+for its column, say) is marked failed with the error, so it is reported
+by `status` instead of holding up everything collected after it.
+
+Usage:
+    python local_store.py status
+    python local_store.py sync
+    python local_store.py sync --db lab_session.db --batch 200
+    python local_store.py retry        # failed -> pending, after fixing the cause
+"""
+
+import argparse
+import functools
+import os
+import sqlite3
+from collections import Counter
+from contextlib import closing
+from datetime import datetime
+
+LOCAL_DB = os.environ.get("LOCAL_DB", "local_submissions.db")
+# "remote": MySQL, falling back to LOCAL_DB when it is unreachable; "local": LOCAL_DB only
+COLLECTION_MODE = os.environ.get("COLLECTION_MODE", "remote")
+SYNC_BATCH = 100
+
+TABLES = ("participants", "phq9_responses", "typing_data", "consent_records")
+
+# migrate.py's schema in SQLite types. sync_state (pending, synced, failed, conflict),
+# synced_at and sync_error exist only here; the child rows are synced with
+# their participant.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS participants (
+    id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+    participant_id      TEXT UNIQUE NOT NULL,
+    session_id          TEXT,
+    ip_address          TEXT,
+    age                 INTEGER,
+    gender              TEXT,
+    year_of_study       TEXT,
+    consent_timestamp   TEXT,
+    data_version        TEXT DEFAULT 'v1',
+    collection_date     TEXT,
+    created_at          TEXT DEFAULT CURRENT_TIMESTAMP,
+    sync_state          TEXT NOT NULL DEFAULT 'pending',
+    synced_at           TEXT,
+    sync_error          TEXT
+);
+CREATE INDEX IF NOT EXISTS participants_sync_state ON participants (sync_state, id);
+
+CREATE TABLE IF NOT EXISTS phq9_responses (
+    id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+    participant_id      TEXT NOT NULL REFERENCES participants(participant_id),
+    phq9_total          INTEGER,
+    phq9_severity       TEXT,
+    depression_label    INTEGER,
+    q1 INTEGER, q2 INTEGER, q3 INTEGER, q4 INTEGER, q5 INTEGER,
+    q6 INTEGER, q7 INTEGER, q8 INTEGER, q9 INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS typing_data (
+    id                          INTEGER PRIMARY KEY AUTOINCREMENT,
+    participant_id              TEXT NOT NULL REFERENCES participants(participant_id),
+    copy_task_duration          REAL,
+    copy_task_word_count        INTEGER,
+    copy_task_char_count        INTEGER,
+    copy_task_text              TEXT,
+    free_writing_duration       REAL,
+    free_writing_word_count     INTEGER,
+    free_writing_char_count     INTEGER,
+    free_writing_text           TEXT
+);
+
+CREATE TABLE IF NOT EXISTS consent_records (
+    id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+    participant_id      TEXT NOT NULL REFERENCES participants(participant_id),
+    session_id          TEXT,
+    ip_address          TEXT,
+    consent_timestamp   TEXT,
+    screenshot_base64   TEXT,
+    consent_record      TEXT,
+    consent_sha256      TEXT,
+    data_version        TEXT DEFAULT 'v1',
+    notes               TEXT
+);
+"""
+
+# Columns that stay local: MySQL assigns its own ids and created_at
+LOCAL_ONLY = {"id", "created_at", "sync_state", "synced_at", "sync_error"}
+
+# PEP 249 errors caused by the rows being written rather than the connection;
+# matched by name so any driver's classes qualify
+ROW_ERRORS = {"DataError", "IntegrityError"}
+
+
+def _row_error(error):
+    return any(cls.__name__ in ROW_ERRORS for cls in type(error).__mro__)
+
+
+class LocalStore:
+    """The SQLite file; one short-lived connection per call, so any thread can use it"""
+
+    def __init__(self, path=LOCAL_DB):
+        self.path = path
+        with closing(self._connect()) as db:
+            db.execute("PRAGMA journal_mode=WAL")   # readers (status, sync) never block a write
+            db.executescript(SCHEMA)
+            if "sync_error" not in {row[1] for row in db.execute("PRAGMA table_info(participants)")}:
+                db.execute("ALTER TABLE participants ADD COLUMN sync_error TEXT")   # older files
+            self.columns = {table: [row[1] for row in db.execute(f"PRAGMA table_info({table})")
+                                    if row[1] not in LOCAL_ONLY]
+                            for table in TABLES}
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA foreign_keys=ON")
+        return db
+
+    def write(self, inserts):
+        """One submission's (table, sql, params) inserts, in a single transaction"""
+        with closing(self._connect()) as db, db:
+            for _, sql, params in inserts:
+                db.execute(sql.replace("%s", "?"), [_sqlite_value(value) for value in params])
+
+    def query(self, sql, params=()):
+        with closing(self._connect()) as db:
+            return db.execute(sql, params).fetchall()
+
+    def counts(self):
+        """{sync_state: participants}"""
+        return dict(self.query("SELECT sync_state, COUNT(*) FROM participants GROUP BY sync_state"))
+
+    def pending(self, limit):
+        return [row[0] for row in self.query(
+            "SELECT participant_id FROM participants WHERE sync_state = 'pending' ORDER BY id LIMIT ?",
+            (limit,))]
+
+    def rows(self, table, participant_ids):
+        marks = ",".join("?" * len(participant_ids))
+        return self.query(f"SELECT {', '.join(self.columns[table])} FROM {table} "
+                          f"WHERE participant_id IN ({marks}) ORDER BY id", participant_ids)
+
+    def mark_synced(self, participant_ids):
+        marks = ",".join("?" * len(participant_ids))
+        with closing(self._connect()) as db, db:
+            db.execute(f"UPDATE participants SET sync_state = 'synced', synced_at = ? "
+                       f"WHERE participant_id IN ({marks})",
+                       [datetime.now().isoformat(sep=" ", timespec="seconds"), *participant_ids])
+
+    def mark_failed(self, participant_id, error, state="failed"):
+        message = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+        with closing(self._connect()) as db, db:
+            db.execute("UPDATE participants SET sync_state = ?, sync_error = ? WHERE participant_id = ?",
+                       (state, message, participant_id))
+
+    def failures(self):
+        """[(participant_id, sync_state, sync_error)] for participants that could not be synced"""
+        return self.query("SELECT participant_id, sync_state, sync_error FROM participants "
+                          "WHERE sync_state IN ('failed', 'conflict') ORDER BY id")
+
+    def requeue_failed(self):
+        """Put failed participants back in the queue; returns how many"""
+        with closing(self._connect()) as db, db:
+            return db.execute("UPDATE participants SET sync_state = 'pending', sync_error = NULL "
+                              "WHERE sync_state = 'failed'").rowcount
+
+    def _insert(self, cursor, participant_ids):
+        for table in TABLES if participant_ids else ():
+            columns = self.columns[table]
+            # mysql.connector turns executemany of an INSERT into one multi-row INSERT
+            cursor.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({','.join(['%s'] * len(columns))})",
+                self.rows(table, participant_ids))
+
+    def _insert_each(self, conn, cursor, participant_ids, outcomes):
+        """After a batch failed: one transaction per participant, marking each as it goes"""
+        for participant_id in participant_ids:
+            try:
+                self._insert(cursor, [participant_id])
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                if not _row_error(e):
+                    raise
+                self.mark_failed(participant_id, e)
+                outcomes["failed"] += 1
+                continue
+            self.mark_synced([participant_id])
+            outcomes["inserted"] += 1
+
+    def sync(self, connect, batch_size=SYNC_BATCH):
+        """
+        Push pending submissions to MySQL through `connect()` (a DB-API
+        connection factory). Connection errors propagate and leave the rest
+        pending. Returns a Counter: inserted, already_in_mysql, conflict, failed.
+        """
+        outcomes = Counter()
+        batch = self.pending(batch_size)
+        if not batch:
+            return outcomes
+        conn = connect()
+        cursor = conn.cursor()
+        try:
+            while batch:
+                marks = ",".join(["%s"] * len(batch))
+                cursor.execute(f"SELECT participant_id, session_id FROM participants "
+                               f"WHERE participant_id IN ({marks})", batch)
+                in_mysql = dict(cursor.fetchall())
+                sessions = dict(self.query(f"SELECT participant_id, session_id FROM participants "
+                                           f"WHERE participant_id IN ({','.join('?' * len(batch))})", batch))
+                existing = {pid for pid in in_mysql if in_mysql[pid] == sessions[pid]}
+                for pid in in_mysql.keys() - existing:
+                    self.mark_failed(pid, f"participant_id already in MySQL for session {in_mysql[pid]}",
+                                     state="conflict")
+                    outcomes["conflict"] += 1
+                new = [pid for pid in batch if pid not in in_mysql]
+                try:
+                    self._insert(cursor, new)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    if not _row_error(e):
+                        raise
+                    self.mark_synced(list(existing))
+                    self._insert_each(conn, cursor, new, outcomes)
+                else:
+                    self.mark_synced(list(existing) + new)
+                    outcomes["inserted"] += len(new)
+                outcomes["already_in_mysql"] += len(existing)
+                batch = self.pending(batch_size)
+        finally:
+            cursor.close()
+            conn.close()
+        return outcomes
+
+
+def already_saved(error):
+    """
+    True for the duplicate-key error of a submission that is already stored,
+    here or in MySQL: index.html retries until it sees a response, and a
+    Streamlit session can submit twice, so a write can repeat one that
+    already committed.
+    """
+    if isinstance(error, sqlite3.IntegrityError):
+        return "participants.participant_id" in str(error)
+    # mysql.connector sets errno, aiomysql (PyMySQL) passes it as args[0]
+    code = getattr(error, "errno", None) or (error.args[0] if error.args else None)
+    return code == 1062
+
+
+@functools.cache
+def get_local_store(path=LOCAL_DB):
+    """One LocalStore per process, created (with its file) on first use"""
+    return LocalStore(path)
+
+
+def _sqlite_value(value):
+    # sqlite3's datetime adapter is deprecated; store what MySQL would print
+    return value.isoformat(sep=" ") if isinstance(value, datetime) else value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or sync the offline submission store")
+    parser.add_argument("command", choices=["status", "sync", "retry"])
+    parser.add_argument("--db", default=LOCAL_DB, help="SQLite file written by the collectors")
+    parser.add_argument("--batch", type=int, default=SYNC_BATCH, help="participants per MySQL transaction")
+    args = parser.parse_args(argv)
+
+    store = LocalStore(args.db)
+    if args.command == "sync":
+        import mysql.connector
+        from export_to_csv import DB_CONFIG
+
+        outcomes = store.sync(lambda: mysql.connector.connect(**DB_CONFIG), args.batch)
+        print(f"Synced {outcomes['inserted']} participants to MySQL "
+              f"({outcomes['already_in_mysql']} were already there, {outcomes['conflict']} conflicting, "
+              f"{outcomes['failed']} rejected)")
+    elif args.command == "retry":
+        print(f"Requeued {store.requeue_failed()} failed participants")
+    counts = store.counts()
+    print(f"{args.db}: {counts.get('pending', 0)} pending, {counts.get('synced', 0)} synced, "
+          f"{counts.get('failed', 0)} failed, {counts.get('conflict', 0)} conflicting")
+    for participant_id, state, error in store.failures():
+        print(f"  {state} {participant_id}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+metrics.py
+Low-overhead, dependency-free counters and histograms for the collector,
+rendered in the Prometheus text exposition format on /metrics.
+
+Metrics are per process: with several gunicorn workers each worker keeps
+its own numbers, so scrape every worker or run a single worker with threads.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds: DB work against a remote Aiven instance lands in the 5ms - 2s range
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes: typed text alone is a few KB, the consent PDF pushes it to hundreds of KB
+SIZE_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 250_000,
+                500_000, 1_000_000, 2_500_000, 5_000_000)
+# Decoded / wire bytes: base64 of the (already deflated) PDF gains ~1.3x, text far more
+RATIO_BUCKETS = (1.0, 1.1, 1.25, 1.5, 2.0, 3.0, 4.0, 6.0, 8.0, 12.0)
+
+
+def _label_str(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{k}="{v}"' for k, v in zip(labelnames, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[k]) for k in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_label_str(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram: one bisect and three adds per observation"""
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}   # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[k]) for k in self.labelnames)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 3)
+            series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-2]):
+                cumulative += count
+                labels = _label_str(self.labelnames + ("le",), key + (str(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_str(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series[-2]}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    "collector_requests_total", "HTTP requests handled", ("endpoint", "status")))
+ERRORS = REGISTRY.register(Counter(
+    "collector_errors_total", "Exceptions raised while handling /submit", ("type",)))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "collector_request_seconds", "End-to-end request latency", labelnames=("endpoint",)))
+SUBMIT_PHASE_SECONDS = REGISTRY.register(Histogram(
+    "collector_submit_phase_seconds", "Time spent in each /submit phase", labelnames=("phase",)))
+PAYLOAD_BYTES = REGISTRY.register(Histogram(
+    "collector_payload_bytes", "Size of /submit request bodies", SIZE_BUCKETS))
+DECODED_PAYLOAD_BYTES = REGISTRY.register(Histogram(
+    "collector_decoded_payload_bytes", "Size of /submit bodies after Content-Encoding", SIZE_BUCKETS))
+NEAR_DUPLICATES = REGISTRY.register(Counter(
+    "collector_near_duplicates_total", "Submissions matching an earlier one (duplicates.py)", ("reason",)))
+COMPRESSION_RATIO = REGISTRY.register(Histogram(
+    "collector_compression_ratio", "Decoded / wire size of /submit bodies", RATIO_BUCKETS))
+SHED = REGISTRY.register(Counter(
+    "collector_shed_total", "Submissions refused with 503: admission control (admission.py) or MySQL unreachable", ("reason",)))
+LOCAL_SUBMISSIONS = REGISTRY.register(Counter(
+    "collector_local_submissions_total", "Submissions written to the local SQLite store (local_store.py)",
+    ("reason",)))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,256 @@
+"""
+submission.py
+Body decoding and the SQL for one /submit payload, shared by the sync
+collector (app.py) and the async one (asgi_app.py) so both accept the same
+requests and write identical rows.
+
+index.html gzips the JSON body (CompressionStream) and sends it with
+Content-Encoding: gzip. BodyDecoder inflates it chunk by chunk as it is read
+off the socket and stops as soon as the decoded size passes MAX_BODY_BYTES,
+so a small compressed body cannot expand into an unbounded buffer.
+
+The decoded JSON is then parsed and validated in one pass into a typed
+Submission (msgspec), which also computes the derived columns. A malformed
+payload is rejected with InvalidSubmission before any database work.
+
+Consent arrives as a ConsentRecord (the SHA-256 of the consent text shown,
+when it was shown and agreed to, the checkbox) rather than a rasterized PDF.
+It is stored as canonical JSON with its own SHA-256; consent.py renders the
+ethics-committee PDF from it on demand.
+"""
+
+import hashlib
+import os
+import zlib
+from datetime import datetime
+from typing import Annotated, Literal, Optional
+
+import msgspec
+from msgspec import Meta
+
+DATA_VERSION = "v2"
+
+# Decoded JSON; a screenshot-mode consent PDF is the bulk of it at a few hundred KB
+MAX_BODY_BYTES = int(os.environ.get("MAX_BODY_BYTES", 5_000_000))
+READ_CHUNK = 64 * 1024
+
+INSERT_SQL = {
+    "participants": """
+        INSERT INTO participants
+            (participant_id, session_id, ip_address, age, gender,
+             year_of_study, consent_timestamp, data_version, collection_date)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    """,
+    "phq9": """
+        INSERT INTO phq9_responses
+            (participant_id, phq9_total, phq9_severity, depression_label,
+             q1,q2,q3,q4,q5,q6,q7,q8,q9)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    """,
+    "typing": """
+        INSERT INTO typing_data
+            (participant_id,
+             copy_task_duration, copy_task_word_count, copy_task_char_count, copy_task_text,
+             free_writing_duration, free_writing_word_count, free_writing_char_count, free_writing_text)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    """,
+    "consent": """
+        INSERT INTO consent_records
+            (participant_id, session_id, ip_address, consent_timestamp,
+             screenshot_base64, consent_record, consent_sha256, data_version, notes)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    """,
+}
+
+
+class InvalidSubmission(ValueError):
+    pass
+
+
+class PayloadTooLarge(ValueError):
+    pass
+
+
+class UnsupportedEncoding(ValueError):
+    pass
+
+
+class BodyDecoder:
+    """
+    Incremental Content-Encoding decoder (identity, gzip, deflate, and br
+    when the `brotli` package is installed) with a cap on the decoded size.
+    """
+
+    def __init__(self, content_encoding, limit=MAX_BODY_BYTES):
+        self.encoding = (content_encoding or "identity").strip().lower()
+        self.limit = limit
+        self.wire_bytes = 0
+        self.size = 0
+        self._parts = []
+        if self.encoding == "gzip":
+            self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding == "deflate":
+            self._inflater = zlib.decompressobj()
+        elif self.encoding == "br":
+            try:
+                import brotli
+            except ImportError:
+                raise UnsupportedEncoding("br is not supported by this server")
+            self._inflater = brotli.Decompressor()
+        elif self.encoding == "identity":
+            self._inflater = None
+        else:
+            raise UnsupportedEncoding(f"Unsupported Content-Encoding: {self.encoding}")
+
+    def feed(self, chunk):
+        self.wire_bytes += len(chunk)
+        remaining = self.limit - self.size
+        if self._inflater is None:
+            out = chunk
+        elif self.encoding == "br":
+            # brotli's Decompressor has no output cap; the check below bounds it per chunk
+            out = self._inflater.process(chunk)
+        else:
+            try:
+                out = self._inflater.decompress(chunk, remaining + 1)
+            except zlib.error as e:
+                raise InvalidSubmission(f"Corrupt {self.encoding} request body: {e}") from None
+        if len(out) > remaining:
+            raise PayloadTooLarge(f"Request body exceeds {self.limit} bytes")
+        self.size += len(out)
+        self._parts.append(out)
+
+    def finish(self):
+        """The decoded body; raises InvalidSubmission on a truncated stream"""
+        if self.encoding in ("gzip", "deflate") and not self._inflater.eof:
+            raise InvalidSubmission(f"Truncated {self.encoding} request body")
+        if self.encoding == "br" and not self._inflater.is_finished():
+            raise InvalidSubmission("Truncated br request body")
+        return b"".join(self._parts)
+
+    @property
+    def ratio(self):
+        return self.size / self.wire_bytes if self.wire_bytes else 1.0
+
+
+def client_ip(forwarded_for, remote_addr):
+    """First hop of X-Forwarded-For (Render's proxy), else the socket peer"""
+    return (forwarded_for or remote_addr or "").split(",")[0].strip()
+
+
+# String limits are the VARCHAR sizes in migrate.py, so MySQL never truncates
+ParticipantId = Annotated[str, Meta(min_length=1, max_length=20)]
+SessionId     = Annotated[str, Meta(min_length=1, max_length=60)]
+Gender        = Annotated[str, Meta(min_length=1, max_length=30)]
+YearOfStudy   = Annotated[str, Meta(min_length=1, max_length=10)]
+Score    = Annotated[int, Meta(ge=0, le=3)]
+Duration = Annotated[float, Meta(ge=0)]
+Severity = Literal["Minimal", "Mild", "Moderate", "Moderately Severe", "Severe"]
+Sha256   = Annotated[str, Meta(pattern="^[0-9a-f]{64}$")]
+Instant  = Annotated[datetime, Meta(tz=True)]
+
+# Upper PHQ-9 total for each severity band, as interpretPHQ9() in index.html
+SEVERITY_BANDS = ((4, "Minimal"), (9, "Mild"), (14, "Moderate"),
+                  (19, "Moderately Severe"), (27, "Severe"))
+
+
+class ConsentRecord(msgspec.Struct):
+    """What was agreed to: the consent text version shown (consent.py) and when"""
+    version: Sha256
+    shown_at: Instant
+    agreed_at: Instant
+    checkbox: bool
+
+    def __post_init__(self):
+        if not self.checkbox:
+            raise ValueError("consent checkbox is not ticked")
+        if self.agreed_at < self.shown_at:
+            raise ValueError("consent agreed_at is before shown_at")
+
+
+class Submission(msgspec.Struct):
+    """
+    One /submit payload. The trailing fields are derived in __post_init__
+    and overwrite anything the client sent under those names.
+    """
+    participant_id: ParticipantId
+    session_id: SessionId
+    age: Annotated[int, Meta(ge=1, le=120)]
+    gender: Gender
+    year_of_study: YearOfStudy
+    phq9_scores: Annotated[list[Score], Meta(min_length=9, max_length=9)]
+    phq9_total: Annotated[int, Meta(ge=0, le=27)]
+    phq9_severity: Severity
+    copy_text: str
+    copy_duration: Duration
+    free_text: str
+    free_duration: Duration
+    consent: Optional[ConsentRecord] = None
+    consent_screenshot: Optional[str] = None
+
+    depression_label: int = 0
+    copy_word_count: int = 0
+    copy_char_count: int = 0
+    free_word_count: int = 0
+    free_char_count: int = 0
+    consent_record: Optional[str] = None
+    consent_sha256: Optional[str] = None
+
+    def __post_init__(self):
+        if self.phq9_total != sum(self.phq9_scores):
+            raise ValueError("phq9_total does not match the sum of phq9_scores")
+        if self.phq9_severity != next(label for upper, label in SEVERITY_BANDS
+                                      if self.phq9_total <= upper):
+            raise ValueError("phq9_severity does not match phq9_total")
+        self.depression_label = 1 if self.phq9_total >= 10 else 0
+        self.copy_word_count  = len(self.copy_text.split())
+        self.copy_char_count  = len(self.copy_text)
+        self.free_word_count  = len(self.free_text.split())
+        self.free_char_count  = len(self.free_text)
+        self.consent_record   = None
+        self.consent_sha256   = None
+        if self.consent is not None:
+            # Canonical form: fixed key order, RFC 3339 timestamps, no whitespace
+            record = {"participant_id": self.participant_id, "session_id": self.session_id,
+                      **msgspec.structs.asdict(self.consent)}
+            encoded = msgspec.json.encode(record)
+            self.consent_record = encoded.decode()
+            self.consent_sha256 = hashlib.sha256(encoded).hexdigest()
+
+
+_DECODER = msgspec.json.Decoder(Submission)
+
+
+def decode_submission(body):
+    """Parse and validate a decoded /submit body; raises InvalidSubmission"""
+    try:
+        return _DECODER.decode(body)
+    except (msgspec.ValidationError, msgspec.DecodeError) as e:
+        raise InvalidSubmission(str(e)) from None
+
+
+def build_inserts(submission, ip_address, now, notes=None):
+    """(table, sql, params) for each INSERT, in foreign-key order"""
+    s = submission
+    return [
+        ("participants", INSERT_SQL["participants"], (
+            s.participant_id, s.session_id, ip_address,
+            s.age, s.gender, s.year_of_study,
+            now, DATA_VERSION, now
+        )),
+        ("phq9", INSERT_SQL["phq9"], (
+            s.participant_id,
+            s.phq9_total, s.phq9_severity, s.depression_label,
+            *s.phq9_scores
+        )),
+        ("typing", INSERT_SQL["typing"], (
+            s.participant_id,
+            s.copy_duration, s.copy_word_count, s.copy_char_count, s.copy_text,
+            s.free_duration, s.free_word_count, s.free_char_count, s.free_text,
+        )),
+        ("consent", INSERT_SQL["consent"], (
+            s.participant_id, s.session_id, ip_address, now,
+            s.consent_screenshot, s.consent_record, s.consent_sha256,
+            DATA_VERSION, notes
+        )),
+    ]
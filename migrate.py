@@ -4,10 +4,12 @@ Run once after setting up your Aiven MySQL instance.
 
 Usage:
     python migrate.py
+    python migrate.py --upgrade   # only create/upgrade the tables (no CSV)
 
 Make sure to fill in your Aiven credentials in the config section below.
 """
 
+import argparse
 import mysql.connector
 import pandas as pd
 import sys
@@ -81,12 +83,20 @@ CREATE TABLE IF NOT EXISTS consent_records (
     ip_address          VARCHAR(60),
     consent_timestamp   DATETIME,
     screenshot_base64   LONGTEXT,
+    consent_record      TEXT,
+    consent_sha256      CHAR(64),
     data_version        VARCHAR(5) DEFAULT 'v1',
     notes               TEXT,
     FOREIGN KEY (participant_id) REFERENCES participants(participant_id)
 );
 """
 
+# Columns added after the first deployment: (table, column, definition)
+UPGRADE_COLUMNS = [
+    ("consent_records", "consent_record", "TEXT AFTER screenshot_base64"),
+    ("consent_records", "consent_sha256", "CHAR(64) AFTER consent_record"),
+]
+
 
 def connect():
     try:
@@ -104,6 +114,18 @@ def create_tables(cursor):
     print("Tables created (or already exist).")
 
 
+def upgrade_tables(cursor):
+    """Add UPGRADE_COLUMNS missing from tables created by an older version of this script"""
+    for table, column, definition in UPGRADE_COLUMNS:
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (table, column))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            print(f"  Added {table}.{column}")
+
+
 def migrate(cursor, df):
     inserted = 0
     skipped = 0
@@ -188,14 +210,20 @@ def migrate(cursor, df):
 
 
 def main():
-    df = pd.read_csv(CSV_PATH)
-    print(f"Loaded CSV: {len(df)} rows.")
+    parser = argparse.ArgumentParser(description="Create the study tables and load the v1 CSV")
+    parser.add_argument("--upgrade", action="store_true",
+                        help="only create missing tables and add missing columns")
+    args = parser.parse_args()
 
     conn = connect()
     cursor = conn.cursor()
 
     create_tables(cursor)
-    migrate(cursor, df)
+    upgrade_tables(cursor)
+    if not args.upgrade:
+        df = pd.read_csv(CSV_PATH)
+        print(f"Loaded CSV: {len(df)} rows.")
+        migrate(cursor, df)
 
     conn.commit()
     cursor.close()
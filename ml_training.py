@@ -1,30 +1,116 @@
+import argparse
+import contextlib
+import io
+import json
+import pickle
+import statistics
+import time
+from datetime import datetime
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score, StratifiedKFold
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import (classification_report, confusion_matrix, 
-                            accuracy_score, precision_score, recall_score, 
-                            f1_score, roc_auc_score, roc_curve)
-import matplotlib.pyplot as plt
-import seaborn as sns
-import joblib
 from pathlib import Path
+from features import PHQ9_ITEM_COLUMNS, PHQ9_SEVERITY_LEVELS
+from preprocessing import Preprocessor
+from profiling import profile_stage
 import warnings
 warnings.filterwarnings('ignore')
 
+# sklearn, joblib, matplotlib and seaborn are imported inside the stages that
+# use them: together they are ~1.5s of startup that --help and the cheap
+# `pipeline.py` subcommands should not pay for.
+
+TRAINING_STATE = 'training_state.json'
+DRIFT_REPORT = 'drift_report.json'
+MIN_INCREMENTAL_ROWS = 5
+DRIFT_MEAN_SHIFT_SD = 0.5    # flag a feature whose mean moved by more than this many SDs
+DRIFT_SD_RATIO = (0.5, 2.0)  # ... or whose spread halved / doubled
+
+# Columns of processed_dataset.csv that are not model inputs. The PHQ-9 item
+# answers define the targets, so they must never be features.
+NON_FEATURE_COLUMNS = ['participant_id', 'phq9_severity', 'collection_date',
+                       'age', 'gender', 'year_of_study', 'phq9_total',
+                       'copy_task_text', 'free_writing_text', 'depression_label'] + PHQ9_ITEM_COLUMNS
+
+# Targets for --multi-target, all predicted from the same typing features
+TARGETS = {
+    'depression_label': 'binary',
+    'phq9_severity': 'ordinal',      # PHQ9_SEVERITY_LEVELS index, regressed then rounded
+    'phq9_total': 'regression',
+}
+MULTI_TARGET_BUNDLE = 'multi_target.pkl'
+
+LATENCY_REPEATS = 50
+
+
+def _random_forest():
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(
+        n_estimators=50,  # Reduced for small dataset
+        max_depth=5,      # Reduced to prevent overfitting
+        min_samples_split=2,
+        min_samples_leaf=1,
+        class_weight='balanced',
+        random_state=42,
+        n_jobs=-1
+    )
+
+
+def _random_forest_regressor():
+    from sklearn.ensemble import RandomForestRegressor
+    return RandomForestRegressor(n_estimators=50, max_depth=5, random_state=42, n_jobs=-1)
+
+
+def _hist_gradient_boosting():
+    # Bins each feature into <= 255 buckets and handles NaN natively
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    return HistGradientBoostingClassifier(
+        max_iter=200,
+        learning_rate=0.1,
+        class_weight='balanced',
+        random_state=42
+    )
+
+
+def _hist_gradient_boosting_regressor():
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    return HistGradientBoostingRegressor(max_iter=200, learning_rate=0.1, random_state=42)
+
+
+# Estimator backends: classifier/regressor factories, and whether inputs are
+# median-filled / standardised
+BACKENDS = {
+    'random_forest': {'factory': _random_forest, 'regressor': _random_forest_regressor,
+                      'impute': True, 'scale': True, 'sparse': True},
+    'hist_gradient_boosting': {'factory': _hist_gradient_boosting,
+                               'regressor': _hist_gradient_boosting_regressor,
+                               'impute': False, 'scale': False, 'sparse': False},
+}
+
 class DepressionClassifier:
     """
     Train and evaluate a model to detect depression from typing patterns
     """
     
-    def __init__(self, dataset_path='processed_dataset.csv'):
+    def __init__(self, dataset_path='processed_dataset.csv', text_features_prefix=None,
+                 embeddings_path=None, backend='random_forest'):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}; choose from {sorted(BACKENDS)}")
         self.dataset_path = dataset_path
+        self.backend = backend
+        self.text_features_prefix = text_features_prefix
+        self.embeddings_path = embeddings_path
         self.model = None
-        self.scaler = None
+        self.preprocessor = None
         self.feature_names = None
+        self.extra_blocks = []   # (name, matrix, feature names), row-aligned with the CSV
+        self.text_vectorizer = None
+        self.embedding_encoder = None
+        self.watermark = None
+        self.attribution = None
+        self.target_models = None   # {target: (kind, fitted model)} in --multi-target mode
         self.results = {}
         
+    @profile_stage()
     def load_and_prepare_data(self):
         """Load dataset and prepare for training"""
         print("Loading dataset...")
@@ -33,24 +119,35 @@ class DepressionClassifier:
         print(f"Dataset shape: {df.shape}")
         print(f"Depression distribution:\n{df['depression_label'].value_counts()}")
         
-        # Separate features and target
-        # Drop non-feature columns
-        drop_cols = ['participant_id', 'phq9_severity', 'collection_date', 
-                     'age', 'gender', 'year_of_study', 'phq9_total',
-                     'copy_task_text', 'free_writing_text']
-        
-        # Drop columns that exist
-        existing_drop_cols = [col for col in drop_cols if col in df.columns]
+        X, y = self._split_features(df)
         
-        X = df.drop(columns=existing_drop_cols + ['depression_label'], errors='ignore')
-        y = df['depression_label']
-        
-        # Handle missing values (fill with median)
-        X = X.fillna(X.median())
+        # Missing values are left as NaN here; the Preprocessor fitted on the
+        # training split fills them with medians (HistGradientBoosting routes NaN itself)
         
         # Store feature names for later analysis
         self.feature_names = X.columns.tolist()
         
+        # Rows are exported in collection order, so the row count (plus the
+        # last participant as a sanity check) marks what this model has seen
+        self.watermark = {
+            'rows_seen': len(df),
+            'last_participant_id': str(df['participant_id'].iloc[-1]) if len(df) else None,
+            'label_rate': float(y.mean()) if len(y) else None,
+        }
+        
+        # Optional text blocks, row-aligned with processed_dataset.csv
+        if self.text_features_prefix:
+            from text_features import load_text_features
+            text_matrix, self.text_vectorizer = load_text_features(self.text_features_prefix)
+            self._add_block('text', text_matrix, self.text_vectorizer.feature_names(), len(df))
+            print(f"Text features: {text_matrix.shape[1]} hashed n-gram columns (sparse)")
+        if self.embeddings_path:
+            from embedding_features import load_embedding_features
+            embeddings, self.embedding_encoder = load_embedding_features(self.embeddings_path)
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            self._add_block('embedding', embeddings, self.embedding_encoder.feature_names(), len(df))
+            print(f"Embedding features: {embeddings.shape[1]} dimensions")
+        
         print(f"\nFeatures used: {len(self.feature_names)}")
         print(f"Class distribution: {dict(y.value_counts())}")
         
@@ -62,46 +159,146 @@ class DepressionClassifier:
         
         return X, y, df
     
-    def train_model(self, X_train, y_train):
-        """Train Random Forest classifier"""
-        print("\nTraining Random Forest model...")
+    def _split_features(self, df):
+        """Feature columns and target from a processed_dataset.csv frame"""
+        X = df.drop(columns=NON_FEATURE_COLUMNS, errors='ignore')
+        y = df['depression_label']
+        return X, y
+    
+    def _add_block(self, name, matrix, feature_names, n_rows):
+        if matrix.shape[0] != n_rows:
+            raise ValueError(f"{name} features have {matrix.shape[0]} rows but the dataset "
+                             f"has {n_rows}; re-run csv_feature_extraction.py")
+        self.extra_blocks.append((name, matrix, feature_names))
+    
+    def _with_extra(self, X_scaled, extra):
+        """Append extra blocks; a sparse text block stays sparse (never densified)"""
+        if not extra:
+            return X_scaled
+        import scipy.sparse as sp
+        if any(sp.issparse(block) for block in extra):
+            return sp.hstack([sp.csr_matrix(X_scaled), *extra], format='csr')
+        return np.hstack([X_scaled, *extra])
+    
+    def _transform(self, X, extra=None):
+        """Fitted preprocessing, then the extra blocks"""
+        X = self.preprocessor.transform(X)
+        return self._with_extra(X, extra)
+    
+    @profile_stage()
+    def train_model(self, X_train, y_train, extra_train=None):
+        """Train the configured backend (Random Forest by default)"""
+        print(f"\nTraining {self.backend} model...")
+        spec = BACKENDS[self.backend]
+        
+        import scipy.sparse as sp
+        if not spec['sparse'] and any(sp.issparse(block) for block in extra_train or []):
+            raise ValueError(f"{self.backend} does not accept the sparse text block; "
+                             "train without --text-features or use random_forest")
         
-        # Scale features
-        self.scaler = StandardScaler()
-        X_train_scaled = self.scaler.fit_transform(X_train)
+        # Impute / scale features as the backend wants (text blocks are already L2-normalised)
+        self.preprocessor = Preprocessor.fit(X_train, impute=spec['impute'], standardize=spec['scale'])
+        X_train_scaled = self._transform(X_train, extra_train)
         
         # Train model with balanced class weights
-        self.model = RandomForestClassifier(
-            n_estimators=50,  # Reduced for small dataset
-            max_depth=5,      # Reduced to prevent overfitting
-            min_samples_split=2,
-            min_samples_leaf=1,
-            class_weight='balanced',
-            random_state=42,
-            n_jobs=-1
-        )
+        self.model = spec['factory']()
         
+        start = time.perf_counter()
         self.model.fit(X_train_scaled, y_train)
-        print("Model trained successfully!")
+        self.results['train_seconds'] = time.perf_counter() - start
+        print(f"Model trained successfully! ({self.results['train_seconds']:.2f}s)")
         
         return X_train_scaled
     
-    def evaluate_model(self, X_test, y_test):
+    @profile_stage()
+    def evaluate_model(self, X_test, y_test, extra_test=None):
         """Evaluate model performance"""
         print("\nEvaluating model...")
         
         # Scale test data
-        X_test_scaled = self.scaler.transform(X_test)
+        X_test_scaled = self._transform(X_test, extra_test)
         
         # Predictions
         y_pred = self.model.predict(X_test_scaled)
         y_pred_proba = self.model.predict_proba(X_test_scaled)[:, 1]
         
-        # Calculate metrics
+        self._score(y_test, y_pred, y_pred_proba)
+        return y_pred, y_pred_proba
+    
+    @profile_stage()
+    def train_multi_target(self, X_train, targets_train, extra_train=None, n_jobs=-1):
+        """
+        Fit one model per entry in TARGETS on a single preprocessed matrix.
+        The fits share one thread pool (tree building releases the GIL), so the
+        matrix is never copied and each forest gets a slice of the cores.
+        """
+        from joblib import Parallel, delayed, effective_n_jobs
+        
+        print(f"\nTraining {self.backend} models for {', '.join(TARGETS)}...")
+        spec = BACKENDS[self.backend]
+        self.preprocessor = Preprocessor.fit(X_train, impute=spec['impute'], standardize=spec['scale'])
+        X = self._transform(X_train, extra_train)
+        
+        inner_jobs = max(1, effective_n_jobs(n_jobs) // len(TARGETS))
+        jobs = []
+        for name, kind in TARGETS.items():
+            model = spec['factory']() if kind == 'binary' else spec['regressor']()
+            if 'n_jobs' in model.get_params():
+                model.set_params(n_jobs=inner_jobs)
+            jobs.append((name, kind, model, _encode_target(kind, targets_train[name])))
+        
+        start = time.perf_counter()
+        Parallel(n_jobs=min(len(jobs), effective_n_jobs(n_jobs)), prefer='threads')(
+            delayed(model.fit)(X, y) for _, _, model, y in jobs
+        )
+        self.results['train_seconds'] = time.perf_counter() - start
+        self.target_models = {name: (kind, model) for name, kind, model, _ in jobs}
+        self.model = self.target_models['depression_label'][1]
+        print(f"Models trained successfully! ({self.results['train_seconds']:.2f}s for {len(jobs)} targets)")
+        return X
+    
+    @profile_stage()
+    def evaluate_multi_target(self, X_test, targets_test, extra_test=None):
+        """Per-target metrics; the binary label also fills the usual results/plots"""
+        from sklearn.metrics import (accuracy_score, cohen_kappa_score, mean_absolute_error,
+                                     mean_squared_error, r2_score)
+        
+        print("\nEvaluating models...")
+        X = self._transform(X_test, extra_test)
+        self.results['targets'] = {}
+        for name, (kind, model) in self.target_models.items():
+            y_true = _encode_target(kind, targets_test[name])
+            if kind == 'binary':
+                y_pred = model.predict(X)
+                y_pred_proba = model.predict_proba(X)[:, 1]
+                self._score(y_true, y_pred, y_pred_proba)
+                metrics = {k: self.results[k] for k in ('accuracy', 'f1', 'roc_auc')}
+            elif kind == 'ordinal':
+                levels = _decode_ordinal(model.predict(X))
+                metrics = {
+                    'accuracy': accuracy_score(y_true, levels),
+                    'within_one': float(np.mean(np.abs(levels - y_true) <= 1)),
+                    'quadratic_kappa': cohen_kappa_score(y_true, levels, weights='quadratic'),
+                }
+            else:
+                pred = model.predict(X)
+                metrics = {
+                    'mae': mean_absolute_error(y_true, pred),
+                    'rmse': float(np.sqrt(mean_squared_error(y_true, pred))),
+                    'r2': r2_score(y_true, pred),
+                }
+            self.results['targets'][name] = {k: float(v) for k, v in metrics.items()}
+        return self.model.predict(X), self.model.predict_proba(X)[:, 1]
+    
+    def _score(self, y_test, y_pred, y_pred_proba):
+        """Fill self.results from test-set predictions"""
+        from sklearn.metrics import (classification_report, confusion_matrix, accuracy_score,
+                                     precision_score, recall_score, f1_score, roc_auc_score)
+        
         # Get unique classes in test set
         test_classes = np.unique(y_test)
         
-        self.results = {
+        self.results.update({
             'accuracy': accuracy_score(y_test, y_pred),
             'precision': precision_score(y_test, y_pred, zero_division=0, average='binary' if len(test_classes) > 1 else 'macro'),
             'recall': recall_score(y_test, y_pred, zero_division=0, average='binary' if len(test_classes) > 1 else 'macro'),
@@ -109,18 +306,94 @@ class DepressionClassifier:
             'roc_auc': roc_auc_score(y_test, y_pred_proba) if len(test_classes) > 1 else 0,
             'confusion_matrix': confusion_matrix(y_test, y_pred),
             'classification_report': classification_report(y_test, y_pred, zero_division=0)
+        })
+    
+    def measure_cost(self, X_test, extra_test=None):
+        """Model size and inference latency (one row, and the whole test set) for the report"""
+        X = self._transform(X_test, extra_test)
+        self.model.predict_proba(X[:1])  # warm-up
+        timings = []
+        for _ in range(LATENCY_REPEATS):
+            start = time.perf_counter()
+            self.model.predict_proba(X[:1])
+            timings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        self.model.predict_proba(X)
+        batch_seconds = time.perf_counter() - start
+        
+        self.results.update({
+            'model_bytes': len(pickle.dumps(self.model)) + len(pickle.dumps(self.preprocessor)),
+            'latency_ms': statistics.median(timings) * 1e3,
+            'batch_rows_per_s': X.shape[0] / batch_seconds if batch_seconds > 0 else float('inf'),
+        })
+        return self.cost_summary()
+    
+    def cost_summary(self):
+        return {
+            'backend': self.backend,
+            **{k: self.results.get(k) for k in ('train_seconds', 'model_bytes', 'latency_ms',
+                                                 'batch_rows_per_s', 'accuracy', 'f1', 'roc_auc')},
+        }
+    
+    @profile_stage()
+    def train_out_of_core(self, chunksize=None, epochs=5, store_dir='processed_dataset_ooc'):
+        """
+        Train without loading the dataset into memory (see out_of_core.py):
+        an SGD logistic regression fit chunk by chunk from a memmap store.
+        Returns (y_test, y_pred, y_pred_proba) for the held-out rows.
+        """
+        from out_of_core import CHUNK_SIZE, FeatureStore, train_sgd, predict_test
+        chunksize = chunksize or CHUNK_SIZE
+        
+        header = pd.read_csv(self.dataset_path, nrows=0).columns
+        feature_names = [col for col in header if col not in NON_FEATURE_COLUMNS]
+        print(f"Streaming {self.dataset_path} into {store_dir}/ ({chunksize} rows per chunk)...")
+        store = FeatureStore.build(self.dataset_path, feature_names, store_dir, chunksize=chunksize)
+        print(f"Dataset shape: ({store.n_rows}, {len(feature_names)}) features, "
+              f"{store.n_train} training rows")
+        print(f"Class distribution (train): {store.label_counts}")
+        
+        self.feature_names = feature_names
+        self.preprocessor = store.preprocessor()
+        total = sum(store.label_counts.values())
+        self.watermark = {
+            'rows_seen': store.n_rows,
+            'last_participant_id': store.last_participant_id,
+            'label_rate': store.label_counts.get(1, 0) / total if total else None,
         }
         
-        return y_pred, y_pred_proba
+        print(f"\nTraining SGD logistic regression ({epochs} epochs)...")
+        self.backend = 'sgd_logistic'
+        start = time.perf_counter()
+        self.model = train_sgd(store, epochs=epochs, chunksize=chunksize)
+        self.results['train_seconds'] = time.perf_counter() - start
+        print("Model trained successfully!")
+        
+        print("\nEvaluating model...")
+        y_test, y_pred_proba = predict_test(store, self.model, chunksize=chunksize)
+        y_pred = self.model.classes_[(y_pred_proba >= 0.5).astype(int)]
+        self._score(y_test, y_pred, y_pred_proba)
+        return y_test, y_pred, y_pred_proba
     
-    def get_feature_importance(self):
+    def get_feature_importance(self, X_test=None, y_test=None, extra_test=None):
         """Get and display feature importance"""
         print("\nTop 10 Most Important Features:")
         print("=" * 60)
         
-        importances = self.model.feature_importances_
+        importances = getattr(self.model, 'feature_importances_', None)
+        if importances is None and hasattr(self.model, 'coef_'):
+            # Linear model on standardised inputs: relative coefficient magnitude
+            importances = np.abs(self.model.coef_[0]) / np.abs(self.model.coef_[0]).sum()
+        elif importances is None:
+            # HistGradientBoosting has no impurity importances; use the held-out drop in score
+            from sklearn.inspection import permutation_importance
+            importances = permutation_importance(
+                self.model, self._transform(X_test, extra_test), y_test,
+                n_repeats=5, random_state=42, n_jobs=-1
+            ).importances_mean
+        names = self.feature_names + [n for _, _, block_names in self.extra_blocks for n in block_names]
         feature_importance_df = pd.DataFrame({
-            'feature': self.feature_names,
+            'feature': names,
             'importance': importances
         }).sort_values('importance', ascending=False)
         
@@ -128,8 +401,58 @@ class DepressionClassifier:
         
         return feature_importance_df
     
+    @profile_stage()
+    def compute_attribution(self, X_test, y_test, extra_test=None, n_repeats=10, with_shap=False):
+        """Permutation importance (and optional SHAP) on the held-out split, cached per model"""
+        from attribution import feature_attribution
+        print("\nFeature attribution (held-out split):")
+        print("=" * 60)
+        X_base = self.preprocessor.transform(X_test)
+        self.attribution = feature_attribution(
+            self.model, X_base, np.asarray(y_test), self.feature_names, extra=extra_test,
+            n_repeats=n_repeats, with_shap=with_shap
+        )
+        print(self.attribution.head(10).to_string(index=False))
+        self.attribution.to_csv('feature_attribution.csv', index=False)
+        print("Attribution table saved as 'feature_attribution.csv'")
+        return self.attribution
+    
+    def plot_attribution(self, top_n=15):
+        """Permutation importance (with spread over repeats) and mean |SHAP| side by side"""
+        import matplotlib.pyplot as plt
+        
+        top = self.attribution.head(top_n)
+        has_shap = 'shap_mean_abs' in top
+        fig, axes = plt.subplots(1, 2 if has_shap else 1, figsize=(15 if has_shap else 8, 8), squeeze=False)
+        
+        axes[0, 0].barh(range(len(top)), top['permutation_importance'], xerr=top['permutation_std'],
+                        color='#3498db')
+        axes[0, 0].set_yticks(range(len(top)))
+        axes[0, 0].set_yticklabels(top['feature'])
+        axes[0, 0].set_xlabel('Score drop when permuted')
+        axes[0, 0].set_title(f'Permutation Importance (Top {top_n})')
+        axes[0, 0].invert_yaxis()
+        
+        if has_shap:
+            axes[0, 1].barh(range(len(top)), top['shap_mean_abs'], color='#2ecc71')
+            axes[0, 1].set_yticks(range(len(top)))
+            axes[0, 1].set_yticklabels(top['feature'])
+            axes[0, 1].set_xlabel('Mean |SHAP value|')
+            axes[0, 1].set_title('TreeSHAP Importance')
+            axes[0, 1].invert_yaxis()
+        
+        plt.tight_layout()
+        plt.savefig('feature_attribution.png', dpi=300, bbox_inches='tight')
+        print("Plot saved as 'feature_attribution.png'")
+        plt.close(fig)
+    
+    @profile_stage()
     def plot_results(self, y_test, y_pred, y_pred_proba, feature_importance_df):
         """Generate visualization plots"""
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        from sklearn.metrics import roc_curve
+        
         print("\nGenerating plots...")
         
         fig, axes = plt.subplots(2, 2, figsize=(15, 12))
@@ -188,18 +511,217 @@ class DepressionClassifier:
         print("Plots saved as 'model_evaluation_plots.png'")
         plt.show()
     
+    @profile_stage()
     def save_model(self, output_dir='models'):
-        """Save trained model and scaler"""
+        """Save trained model and preprocessing pipeline"""
+        import joblib
+        
         Path(output_dir).mkdir(exist_ok=True)
         
         model_path = f"{output_dir}/depression_classifier.pkl"
-        scaler_path = f"{output_dir}/feature_scaler.pkl"
+        preprocessor_path = f"{output_dir}/preprocessor.pkl"
         
         joblib.dump(self.model, model_path)
-        joblib.dump(self.scaler, scaler_path)
-        
-        print(f"\nModel saved to {model_path}")
-        print(f"Scaler saved to {scaler_path}")
+        joblib.dump(self.preprocessor, preprocessor_path)
+        
+        print(f"\nModel saved to {model_path} ({self.backend})")
+        print(f"Preprocessor saved to {preprocessor_path}")
+        
+        # Superseded by preprocessor.pkl
+        legacy_scaler_path = Path(output_dir) / "feature_scaler.pkl"
+        if legacy_scaler_path.exists():
+            legacy_scaler_path.unlink()
+        
+        # demo_app.py uses the vectorizer's presence to decide whether to add text features
+        vectorizer_path = Path(output_dir) / "text_vectorizer.pkl"
+        if self.text_vectorizer is not None:
+            joblib.dump(self.text_vectorizer, vectorizer_path)
+            print(f"Text vectorizer saved to {vectorizer_path}")
+        elif vectorizer_path.exists():
+            vectorizer_path.unlink()
+        
+        encoder_path = Path(output_dir) / "embedding_encoder.pkl"
+        if self.embedding_encoder is not None:
+            joblib.dump(self.embedding_encoder, encoder_path)
+            print(f"Embedding encoder config saved to {encoder_path}")
+        elif encoder_path.exists():
+            encoder_path.unlink()
+        
+        # All targets share preprocessor.pkl (and any text/embedding blocks)
+        bundle_path = Path(output_dir) / MULTI_TARGET_BUNDLE
+        if self.target_models is not None:
+            joblib.dump({
+                'backend': self.backend,
+                'feature_names': self.feature_names,
+                'severity_levels': PHQ9_SEVERITY_LEVELS,
+                'targets': {name: {'kind': kind, 'model': model}
+                            for name, (kind, model) in self.target_models.items()},
+            }, bundle_path)
+            print(f"Multi-target models saved to {bundle_path}")
+        elif bundle_path.exists():
+            bundle_path.unlink()
+        
+        if self.watermark is not None:
+            state = {
+                **self.watermark,
+                'backend': self.backend,
+                'scaled': self.preprocessor.standardize,
+                'feature_names': self.feature_names,
+                'medians': (None if self.preprocessor.medians is None else
+                            dict(zip(self.feature_names, self.preprocessor.medians.tolist()))),
+                'n_estimators': len(getattr(self.model, 'estimators_', [])),
+                'updated_at': datetime.now().isoformat(timespec='seconds'),
+                'history': [{'mode': 'full', 'rows_seen': self.watermark['rows_seen'],
+                             'n_estimators': len(getattr(self.model, 'estimators_', [])),
+                             'at': datetime.now().isoformat(timespec='seconds')}],
+            }
+            state_path = Path(output_dir) / TRAINING_STATE
+            state_path.write_text(json.dumps(state, indent=2))
+            print(f"Training watermark saved to {state_path} ({state['rows_seen']} rows)")
+    
+    @profile_stage()
+    def incremental_update(self, output_dir='models', new_trees=10, min_rows=MIN_INCREMENTAL_ROWS):
+        """
+        Warm-start the saved model on rows appended to the dataset since the
+        last training run: the scaling statistics are updated with partial_fit and
+        `new_trees` trees are grown on the new rows only. Returns the drift
+        report, or None if there was nothing to train on.
+        """
+        import joblib
+        from sklearn.metrics import accuracy_score, roc_auc_score
+        
+        output_dir = Path(output_dir)
+        state_path = output_dir / TRAINING_STATE
+        if not state_path.exists():
+            raise FileNotFoundError(f"{state_path} not found; run a full training first")
+        state = json.loads(state_path.read_text())
+        if state.get('backend', 'random_forest') != 'random_forest':
+            raise ValueError(f"Incremental updates grow random forest trees; the saved model is "
+                             f"{state['backend']}. Run a full training instead")
+        for name in ('text_vectorizer.pkl', 'embedding_encoder.pkl', MULTI_TARGET_BUNDLE):
+            if (output_dir / name).exists():
+                raise ValueError(f"{output_dir / name} exists: incremental updates only support "
+                                 "a single-target model on the typing/linguistic features; "
+                                 "run a full training instead")
+        rows_seen = state['rows_seen']
+        
+        # Re-read the last row already seen so a rewritten or reordered export is caught
+        print(f"Loading rows after watermark ({rows_seen} rows seen)...")
+        df = pd.read_csv(self.dataset_path, skiprows=range(1, rows_seen))
+        if len(df) == 0 or str(df['participant_id'].iloc[0]) != state['last_participant_id']:
+            raise ValueError(f"{self.dataset_path} no longer starts with the {rows_seen} rows "
+                             "the model was trained on; run a full training instead")
+        df = df.iloc[1:].reset_index(drop=True)
+        
+        if len(df) < min_rows:
+            print(f"Only {len(df)} new rows (need {min_rows}); model left unchanged")
+            return None
+        
+        self.model = joblib.load(output_dir / "depression_classifier.pkl")
+        self.preprocessor = joblib.load(output_dir / "preprocessor.pkl")
+        self.feature_names = state['feature_names']
+        
+        X_new, y_new = self._split_features(df)
+        X_new = X_new.reindex(columns=self.feature_names)
+        # Every tree in a forest must vote over the same classes
+        if set(np.unique(y_new)) != set(self.model.classes_):
+            print(f"New rows only contain classes {sorted(np.unique(y_new))}; "
+                  "waiting for more data before updating")
+            return None
+        
+        # Score the new rows with the previous model before it sees them
+        pre = self.preprocessor
+        old_mean, old_scale = pre.mean.copy(), pre.scale.copy()
+        old_proba = self.model.predict_proba(pre.transform(X_new))[:, 1]
+        old_pred = self.model.classes_[(old_proba >= 0.5).astype(int)]
+        n_trees_before = len(getattr(self.model, 'estimators_', []))
+        
+        print(f"\nUpdating model with {len(df)} new rows (+{new_trees} trees)...")
+        pre.partial_fit(X_new)
+        _rescale_thresholds(self.model, old_mean, old_scale, pre.mean, pre.scale)
+        self.model.set_params(warm_start=True, n_estimators=n_trees_before + new_trees)
+        self.model.fit(pre.transform(X_new), y_new)
+        self.model.set_params(warm_start=False)
+        
+        new_proba = self.model.predict_proba(pre.transform(X_new))[:, 1]
+        new_pred = self.model.classes_[(new_proba >= 0.5).astype(int)]
+        
+        report = drift_report(X_new, y_new, old_mean, old_scale, state.get('label_rate'))
+        report.update({
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'new_rows': len(df),
+            'rows_seen_before': rows_seen,
+            'n_estimators_before': n_trees_before,
+            'n_estimators': len(getattr(self.model, 'estimators_', [])),
+            'previous_model_on_new_rows': {
+                'accuracy': float(accuracy_score(y_new, old_pred)),
+                'roc_auc': float(roc_auc_score(y_new, old_proba)),
+            },
+            'prediction_agreement': float(np.mean(old_pred == new_pred)),
+            'mean_abs_proba_change': float(np.mean(np.abs(new_proba - old_proba))),
+        })
+        
+        joblib.dump(self.model, output_dir / "depression_classifier.pkl")
+        joblib.dump(pre, output_dir / "preprocessor.pkl")
+        
+        n_total = rows_seen + len(df)
+        state.update({
+            'rows_seen': n_total,
+            'last_participant_id': str(df['participant_id'].iloc[-1]),
+            'label_rate': (state['label_rate'] * rows_seen + float(y_new.sum())) / n_total,
+            'n_estimators': len(getattr(self.model, 'estimators_', [])),
+            'updated_at': report['at'],
+        })
+        state['history'].append({'mode': 'incremental', 'rows_seen': n_total,
+                                 'n_estimators': state['n_estimators'], 'at': report['at']})
+        state_path.write_text(json.dumps(state, indent=2))
+        (output_dir / DRIFT_REPORT).write_text(json.dumps(report, indent=2))
+        
+        print_drift_report(report)
+        print(f"\nModel updated: {n_trees_before} -> {state['n_estimators']} trees, "
+              f"watermark {rows_seen} -> {n_total} rows")
+        print(f"Drift report saved to {output_dir / DRIFT_REPORT}")
+        return report
+    
+    def _cost_section(self):
+        cost = self.cost_summary()
+        section = f"""MODEL COST ({self.backend}):
+--------------------------
+Training time:     {_fmt(cost['train_seconds'], '.2f')} s
+Model size:        {_fmt(cost['model_bytes'] and cost['model_bytes'] / 1024, ',.1f')} KB
+Latency (1 row):   {_fmt(cost['latency_ms'], '.3f')} ms
+Batch throughput:  {_fmt(cost['batch_rows_per_s'], ',.0f')} rows/s
+"""
+        comparison = self.results.get('backend_comparison')
+        if comparison:
+            section += "\nBACKEND COMPARISON (same split):\n--------------------------------\n"
+            section += (f"{'backend':<24}{'train s':>9}{'size KB':>10}{'1-row ms':>10}"
+                        f"{'rows/s':>12}{'acc':>7}{'f1':>7}{'auc':>7}\n")
+            for c in comparison:
+                if 'error' in c:
+                    section += f"{c['backend']:<24}skipped: {c['error']}\n"
+                    continue
+                section += (f"{c['backend']:<24}{c['train_seconds']:>9.2f}{c['model_bytes'] / 1024:>10,.1f}"
+                            f"{c['latency_ms']:>10.3f}{c['batch_rows_per_s']:>12,.0f}"
+                            f"{c['accuracy']:>7.3f}{c['f1']:>7.3f}{c['roc_auc']:>7.3f}\n")
+        return section
+    
+    def _targets_section(self):
+        targets = self.results.get('targets')
+        if not targets:
+            return ""
+        lines = ["\nMULTI-TARGET METRICS (shared features):", "---------------------------------------"]
+        for name, metrics in targets.items():
+            values = ", ".join(f"{k} {v:.3f}" for k, v in metrics.items())
+            lines.append(f"{name:<18} ({TARGETS[name]}): {values}")
+        return "\n".join(lines) + "\n"
+    
+    def _attribution_section(self):
+        if self.attribution is None:
+            return ""
+        return ("\nPERMUTATION IMPORTANCE (held-out, top 10):\n"
+                "------------------------------------------\n"
+                + self.attribution.head(10).to_string(index=False) + "\n")
     
     def generate_report(self):
         """Generate a text report of results"""
@@ -220,6 +742,7 @@ Recall:    {self.results['recall']:.3f}
 F1-Score:  {self.results['f1']:.3f}
 ROC-AUC:   {self.results['roc_auc']:.3f}
 
+{self._cost_section()}{self._targets_section()}{self._attribution_section()}
 CONFUSION MATRIX:
 ----------------
 {self.results['confusion_matrix']}
@@ -237,16 +760,167 @@ DETAILED CLASSIFICATION REPORT:
         print(report)
         print("\nReport saved to 'model_evaluation_report.txt'")
 
-def main():
+def _encode_target(kind, values):
+    if kind == 'ordinal':
+        return pd.Series(values).map(PHQ9_SEVERITY_LEVELS.index).to_numpy()
+    return np.asarray(values)
+
+
+def _decode_ordinal(predictions):
+    return np.clip(np.rint(predictions), 0, len(PHQ9_SEVERITY_LEVELS) - 1).astype(int)
+
+
+def _fmt(value, spec):
+    return 'n/a' if value is None else format(value, spec)
+
+
+def _rescale_thresholds(model, old_mean, old_scale, new_mean, new_scale):
+    """
+    Move the split thresholds of already-grown trees into the updated scaling
+    space, so each existing split still cuts at the same raw feature value
+    """
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        split = tree.feature >= 0
+        f = tree.feature[split]
+        raw = tree.threshold[split] * old_scale[f] + old_mean[f]
+        tree.threshold[split] = (raw - new_mean[f]) / new_scale[f]
+
+
+def drift_report(X_new, y_new, ref_mean, ref_scale, ref_label_rate):
+    """Per-feature mean/spread shift of the new rows against the previous training data"""
+    mean_shift = (X_new.mean().to_numpy() - ref_mean) / ref_scale
+    sd_ratio = X_new.std(ddof=0).to_numpy() / ref_scale
+    features = {
+        name: {'mean_shift_sd': float(shift), 'sd_ratio': float(ratio)}
+        for name, shift, ratio in zip(X_new.columns, mean_shift, sd_ratio)
+    }
+    drifted = [name for name, stats in features.items()
+               if abs(stats['mean_shift_sd']) > DRIFT_MEAN_SHIFT_SD
+               or not DRIFT_SD_RATIO[0] <= stats['sd_ratio'] <= DRIFT_SD_RATIO[1]]
+    return {
+        'label_rate_before': ref_label_rate,
+        'label_rate_new': float(y_new.mean()),
+        'drifted_features': drifted,
+        'features': features,
+    }
+
+
+def print_drift_report(report):
+    print("\nDrift vs previous model:")
+    print("=" * 60)
+    print(f"Previous model on new rows: accuracy {report['previous_model_on_new_rows']['accuracy']:.3f}, "
+          f"ROC-AUC {report['previous_model_on_new_rows']['roc_auc']:.3f}")
+    print(f"Prediction agreement (old vs updated): {report['prediction_agreement']:.3f}")
+    print(f"Depression rate: {report['label_rate_before']:.3f} -> {report['label_rate_new']:.3f}")
+    if report['drifted_features']:
+        print(f"⚠️  {len(report['drifted_features'])} drifted feature(s):")
+        for name in report['drifted_features']:
+            stats = report['features'][name]
+            print(f"  {name:<40} shift {stats['mean_shift_sd']:+.2f} SD, "
+                  f"spread x{stats['sd_ratio']:.2f}")
+    else:
+        print("✅ No feature drift above threshold")
+
+
+def split_dataset(classifier, X, y, test_size=0.2):
+    """Train/test split; extra feature blocks (if any) are split with the same rows"""
+    from sklearn.model_selection import train_test_split
+    
+    arrays = [X, y] + [matrix for _, matrix, _ in classifier.extra_blocks]
+    try:
+        splits = train_test_split(
+            *arrays, test_size=test_size, random_state=42, stratify=y
+        )
+    except ValueError:
+        # If stratification fails due to small sample
+        splits = train_test_split(
+            *arrays, test_size=test_size, random_state=42
+        )
+    X_train, X_test, y_train, y_test = splits[:4]
+    return X_train, X_test, y_train, y_test, splits[4::2], splits[5::2]
+
+
+def compare_backends(classifier, **classifier_kwargs):
+    """Train every other backend on the same split and collect its cost/metrics"""
+    comparison = []
+    for name in BACKENDS:
+        if name == classifier.backend:
+            comparison.append(classifier.cost_summary())
+            continue
+        print(f"Comparing backend: {name}...")
+        other = DepressionClassifier(classifier.dataset_path, backend=name, **classifier_kwargs)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                X, y, _ = other.load_and_prepare_data()
+                X_train, X_test, y_train, y_test, extra_train, extra_test = split_dataset(other, X, y)
+                other.train_model(X_train, y_train, extra_train)
+                other.evaluate_model(X_test, y_test, extra_test)
+                other.measure_cost(X_test, extra_test)
+        except ValueError as e:
+            comparison.append({'backend': name, 'error': str(e)})
+            continue
+        comparison.append(other.cost_summary())
+    classifier.results['backend_comparison'] = comparison
+    return comparison
+
+
+def main(argv=None):
     """
     Main execution pipeline
     """
+    parser = argparse.ArgumentParser(description="Train the depression classifier")
+    parser.add_argument('--text-features', action='store_true',
+                        help="also train on processed_dataset_text.npz (sparse n-gram TF-IDF)")
+    parser.add_argument('--embeddings', action='store_true',
+                        help="also train on processed_dataset_embeddings.npy (sentence embeddings)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="update the saved model with rows added since the last training")
+    parser.add_argument('--new-trees', type=int, default=10,
+                        help="trees to grow on the new rows in --incremental mode")
+    parser.add_argument('--out-of-core', action='store_true',
+                        help="stream processed_dataset.csv from disk and fit an SGD model chunk by chunk")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="rows per chunk in --out-of-core mode (default 100000)")
+    parser.add_argument('--epochs', type=int, default=5,
+                        help="passes over the training rows in --out-of-core mode")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='random_forest',
+                        help="estimator to train and save")
+    parser.add_argument('--compare-backends', action='store_true',
+                        help="also train the other backends and add a cost comparison to the report")
+    parser.add_argument('--attribution', action='store_true',
+                        help="parallel permutation importance on the test split (cached per model)")
+    parser.add_argument('--importance-repeats', type=int, default=10,
+                        help="shuffles per feature for --attribution")
+    parser.add_argument('--shap', action='store_true',
+                        help="add mean |SHAP| values to --attribution (needs the shap package)")
+    parser.add_argument('--multi-target', action='store_true',
+                        help="also predict phq9_total and phq9_severity, saved in one bundle")
+    args = parser.parse_args(argv)
+    
     print("=" * 80)
     print("DEPRESSION DETECTION FROM TYPING PATTERNS - ML TRAINING")
     print("=" * 80)
     
+    if args.incremental:
+        DepressionClassifier('processed_dataset.csv').incremental_update(new_trees=args.new_trees)
+        return
+    
+    if args.out_of_core:
+        classifier = DepressionClassifier('processed_dataset.csv')
+        y_test, y_pred, y_pred_proba = classifier.train_out_of_core(args.chunksize, args.epochs)
+        feature_importance_df = classifier.get_feature_importance()
+        classifier.plot_results(y_test, y_pred, y_pred_proba, feature_importance_df)
+        classifier.generate_report()
+        classifier.save_model()
+        return
+    
     # Initialize classifier
-    classifier = DepressionClassifier('processed_dataset.csv')
+    block_kwargs = dict(
+        text_features_prefix='processed_dataset_text' if args.text_features else None,
+        embeddings_path='processed_dataset_embeddings.npy' if args.embeddings else None
+    )
+    classifier = DepressionClassifier('processed_dataset.csv', backend=args.backend, **block_kwargs)
     
     # Load data
     X, y, df = classifier.load_and_prepare_data()
@@ -260,27 +934,28 @@ def main():
     # Split data (smaller test size for small datasets)
     test_size = 0.2 if len(df) >= 10 else 0.2
     
-    try:
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=42, stratify=y
-        )
-    except ValueError:
-        # If stratification fails due to small sample
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=42
-        )
+    X_train, X_test, y_train, y_test, extra_train, extra_test = split_dataset(classifier, X, y, test_size)
     
     print(f"\nTraining set size: {len(X_train)}")
     print(f"Test set size: {len(X_test)}")
     
-    # Train model
-    classifier.train_model(X_train, y_train)
-    
-    # Evaluate
-    y_pred, y_pred_proba = classifier.evaluate_model(X_test, y_test)
+    # Train and evaluate (the other targets' columns follow the split through the index)
+    if args.multi_target:
+        classifier.train_multi_target(X_train, df.loc[X_train.index], extra_train)
+        y_pred, y_pred_proba = classifier.evaluate_multi_target(X_test, df.loc[X_test.index], extra_test)
+    else:
+        classifier.train_model(X_train, y_train, extra_train)
+        y_pred, y_pred_proba = classifier.evaluate_model(X_test, y_test, extra_test)
+    classifier.measure_cost(X_test, extra_test)
+    if args.compare_backends:
+        compare_backends(classifier, **block_kwargs)
     
     # Feature importance
-    feature_importance_df = classifier.get_feature_importance()
+    feature_importance_df = classifier.get_feature_importance(X_test, y_test, extra_test)
+    
+    if args.attribution:
+        classifier.compute_attribution(X_test, y_test, extra_test, args.importance_repeats, args.shap)
+        classifier.plot_attribution()
     
     # Plot results
     classifier.plot_results(y_test, y_pred, y_pred_proba, feature_importance_df)
@@ -298,7 +973,7 @@ def main():
     print("  - model_evaluation_plots.png")
     print("  - model_evaluation_report.txt")
     print("  - models/depression_classifier.pkl")
-    print("  - models/feature_scaler.pkl")
+    print("  - models/preprocessor.pkl")
     print("\n⚠️  REMEMBER: Results are for TESTING only with 5 participants")
     print("   Collect 40+ participants for scientifically valid results")
 
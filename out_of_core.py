@@ -0,0 +1,233 @@
+"""
+out_of_core.py
+Out-of-core training for processed_dataset.csv files larger than memory.
+
+One streaming pass over the CSV writes the feature matrix to a float32
+memmap store on disk and, for the training rows, accumulates per-column
+moments and quantile sketches. Imputation medians and scaling come out
+of that same pass, so the CSV is never held in memory as a whole. The
+model is then fit chunk by chunk from the memmap with partial_fit.
+
+    processed_dataset_ooc/X.f32       float32 features, row-major
+    processed_dataset_ooc/y.i8        depression_label
+    processed_dataset_ooc/test.bool   held-out rows
+    processed_dataset_ooc/meta.json   feature names, row count, statistics
+
+Usage:
+    python ml_training.py --out-of-core
+    python ml_training.py --out-of-core --chunksize 500000 --epochs 3
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+
+from preprocessing import Preprocessor
+
+CHUNK_SIZE = 100_000
+SKETCH_K = 2048
+LABEL_COLUMN = 'depression_label'
+
+
+class QuantileSketch:
+    """
+    Mergeable streaming quantile sketch (Munro-Paterson style compactors).
+    Level h holds items of weight 2**h; memory is O(k log(n/k)) and the
+    rank error is on the order of log2(n/k) / k.
+    """
+
+    def __init__(self, k=SKETCH_K, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self.levels[0] = np.concatenate([self.levels[0], values[~np.isnan(values)]])
+        h = 0
+        while h < len(self.levels):
+            if len(self.levels[h]) > self.k:
+                self._compact(h)
+            h += 1
+        return self
+
+    def _compact(self, h):
+        items = np.sort(self.levels[h])
+        # An odd item out stays at this level; the rest are halved upwards
+        keep, items = (items[-1:], items[:-1]) if len(items) % 2 else (items[:0], items)
+        promoted = items[self._rng.integers(2)::2]
+        self.levels[h] = keep
+        if h + 1 == len(self.levels):
+            self.levels.append(np.empty(0))
+        self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+
+    def quantile(self, q):
+        values = np.concatenate(self.levels)
+        if len(values) == 0:
+            return np.nan
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        idx = np.searchsorted(cumulative, q * cumulative[-1])
+        return float(values[order][min(idx, len(values) - 1)])
+
+
+class RunningMoments:
+    """Per-column count / mean / sum of squared deviations, ignoring NaN (Chan et al. merge)"""
+
+    def __init__(self, n_columns):
+        self.count = np.zeros(n_columns)
+        self.missing = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+
+    def update(self, X):
+        present = ~np.isnan(X)
+        n_b = present.sum(axis=0).astype(np.float64)
+        self.missing += len(X) - n_b
+        if not n_b.any():
+            return self
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_b = np.where(n_b > 0, np.nansum(X, axis=0, dtype=np.float64) / np.maximum(n_b, 1), 0.0)
+            m2_b = np.nansum((X - mean_b) ** 2, axis=0, dtype=np.float64)
+        n = self.count + n_b
+        delta = mean_b - self.mean
+        safe_n = np.maximum(n, 1)
+        self.mean = self.mean + delta * n_b / safe_n
+        self.m2 = self.m2 + m2_b + delta ** 2 * self.count * n_b / safe_n
+        self.count = n
+        return self
+
+    def imputed(self, fill):
+        """Mean and variance after the missing entries are replaced by `fill`"""
+        n, m = self.count, self.missing
+        total = np.maximum(n + m, 1)
+        mean = (n * self.mean + m * fill) / total
+        m2 = self.m2 + n * m / total * (self.mean - fill) ** 2
+        return mean, m2 / total
+
+
+class FeatureStore:
+    """Memory-mapped feature matrix written by one pass over processed_dataset.csv"""
+
+    def __init__(self, store_dir):
+        self.store_dir = Path(store_dir)
+        meta = json.loads((self.store_dir / 'meta.json').read_text())
+        self.feature_names = meta['feature_names']
+        self.n_rows = meta['n_rows']
+        self.medians = np.asarray(meta['medians'], dtype=np.float64)
+        self.mean = np.asarray(meta['mean'], dtype=np.float64)
+        self.var = np.asarray(meta['var'], dtype=np.float64)
+        self.n_train = meta['n_train']
+        self.label_counts = {int(k): v for k, v in meta['label_counts'].items()}
+        self.last_participant_id = meta['last_participant_id']
+        shape = (self.n_rows, len(self.feature_names))
+        self.X = np.memmap(self.store_dir / 'X.f32', dtype=np.float32, mode='r', shape=shape)
+        self.y = np.memmap(self.store_dir / 'y.i8', dtype=np.int8, mode='r', shape=(self.n_rows,))
+        self.test = np.memmap(self.store_dir / 'test.bool', dtype=bool, mode='r', shape=(self.n_rows,))
+
+    @classmethod
+    def build(cls, csv_path, feature_names, store_dir, chunksize=CHUNK_SIZE, test_size=0.2, seed=42):
+        """Stream csv_path once into store_dir; statistics cover the training rows only"""
+        store_dir = Path(store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+        rng = np.random.default_rng(seed)
+        moments = RunningMoments(len(feature_names))
+        sketches = [QuantileSketch(seed=seed + j) for j in range(len(feature_names))]
+        label_counts = {}
+        n_rows = n_train = 0
+        last_participant_id = None
+
+        usecols = ['participant_id', LABEL_COLUMN] + list(feature_names)
+        dtypes = {name: np.float32 for name in feature_names}
+        with open(store_dir / 'X.f32', 'wb') as fx, open(store_dir / 'y.i8', 'wb') as fy, \
+                open(store_dir / 'test.bool', 'wb') as ft:
+            for chunk in pd.read_csv(csv_path, usecols=usecols, dtype=dtypes, chunksize=chunksize):
+                X = np.ascontiguousarray(chunk[feature_names].to_numpy(dtype=np.float32))
+                y = chunk[LABEL_COLUMN].to_numpy(dtype=np.int8)
+                test = rng.random(len(chunk)) < test_size
+                fx.write(X.tobytes())
+                fy.write(y.tobytes())
+                ft.write(test.tobytes())
+
+                train = ~test
+                moments.update(X[train])
+                for j, sketch in enumerate(sketches):
+                    sketch.update(X[train, j])
+                for label, count in zip(*np.unique(y[train], return_counts=True)):
+                    label_counts[int(label)] = label_counts.get(int(label), 0) + int(count)
+                n_rows += len(chunk)
+                n_train += int(train.sum())
+                last_participant_id = str(chunk['participant_id'].iloc[-1])
+
+        # Columns with no observed values are filled with 0, as they carry no signal
+        medians = np.nan_to_num(np.array([s.quantile(0.5) for s in sketches]), nan=0.0)
+        mean, var = moments.imputed(medians)
+        meta = {
+            'feature_names': list(feature_names),
+            'n_rows': n_rows,
+            'n_train': n_train,
+            'medians': medians.tolist(),
+            'mean': mean.tolist(),
+            'var': var.tolist(),
+            'label_counts': label_counts,
+            'last_participant_id': last_participant_id,
+        }
+        (store_dir / 'meta.json').write_text(json.dumps(meta, indent=2))
+        return cls(store_dir)
+
+    def preprocessor(self):
+        """The Preprocessor that fitting on the training rows in memory would give"""
+        return Preprocessor(self.feature_names, self.medians, self.mean, var=self.var,
+                            n_samples_seen=self.n_train)
+
+    def iter_chunks(self, split='train', chunksize=CHUNK_SIZE, rng=None):
+        """
+        Yield (X, y) for one split, imputed and standardised, chunk by chunk.
+        With an rng the chunk order and the rows within each chunk are shuffled.
+        """
+        preprocessor = self.preprocessor()
+        starts = np.arange(0, self.n_rows, chunksize)
+        if rng is not None:
+            starts = rng.permutation(starts)
+        for start in starts:
+            rows = slice(start, min(start + chunksize, self.n_rows))
+            keep = ~self.test[rows] if split == 'train' else np.asarray(self.test[rows])
+            if not keep.any():
+                continue
+            X = preprocessor.transform(self.X[rows][keep])
+            y = np.asarray(self.y[rows][keep])
+            if rng is not None:
+                order = rng.permutation(len(y))
+                X, y = X[order], y[order]
+            yield X, y
+
+
+def train_sgd(store, epochs=5, chunksize=CHUNK_SIZE, seed=42):
+    """Logistic regression by SGD over the training chunks, with balanced class weights"""
+    classes = np.array(sorted(store.label_counts))
+    total = sum(store.label_counts.values())
+    # Same weighting as class_weight='balanced', which partial_fit does not accept
+    class_weight = np.array([total / (len(classes) * store.label_counts[c]) for c in classes])
+    model = SGDClassifier(loss='log_loss', alpha=1e-4, random_state=seed)
+    rng = np.random.default_rng(seed)
+    for epoch in range(epochs):
+        for X, y in store.iter_chunks('train', chunksize, rng=rng):
+            model.partial_fit(X, y, classes=classes,
+                              sample_weight=class_weight[np.searchsorted(classes, y)])
+        print(f"  epoch {epoch + 1}/{epochs} done")
+    return model
+
+
+def predict_test(store, model, chunksize=CHUNK_SIZE):
+    """(y_test, positive-class probability) over the held-out rows"""
+    ys, probas = [], []
+    for X, y in store.iter_chunks('test', chunksize):
+        ys.append(y)
+        probas.append(model.predict_proba(X)[:, 1])
+    if not ys:
+        return np.empty(0, dtype=np.int8), np.empty(0)
+    return np.concatenate(ys), np.concatenate(probas)
@@ -0,0 +1,118 @@
+"""
+pipeline.py
+One entry point for the offline pipeline:
+
+    sync      offline SQLite submissions -> MySQL     (flask_app/local_store.py)
+    export    MySQL -> all_participant_data.csv       (flask_app/export_to_csv.py)
+    extract   export -> processed_dataset.csv          (csv_feature_extraction.py)
+    train     processed_dataset.csv -> models/         (ml_training.py)
+    score     export -> scores.csv with the saved model (scoring.py)
+    report    print the last training report, watermark and drift summary
+
+Each subcommand forwards its arguments to that module's main(), and the
+module is only imported once its subcommand is chosen, so `--help` and
+`report` start in tens of milliseconds. benchmarks/bench_startup.py checks
+the import time of every subcommand with `python -X importtime`.
+
+Usage:
+    python pipeline.py --help
+    python pipeline.py sync --db lab_session.db
+    python pipeline.py export --tables
+    python pipeline.py extract --text-features
+    python pipeline.py train --backend hist_gradient_boosting
+    python pipeline.py score new_participants.csv --output scores.csv
+    python pipeline.py report
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+
+def _sync(argv):
+    sys.path.insert(0, str(ROOT / 'flask_app'))
+    from local_store import main
+    main(argv)
+
+
+def _export(argv):
+    sys.path.insert(0, str(ROOT / 'flask_app'))
+    from export_to_csv import main
+    main(argv)
+
+
+def _extract(argv):
+    from csv_feature_extraction import main
+    main(argv)
+
+
+def _train(argv):
+    from ml_training import main
+    main(argv)
+
+
+def _score(argv):
+    from scoring import main
+    main(argv)
+
+
+def _report(argv):
+    parser = argparse.ArgumentParser(prog='pipeline.py report',
+                                     description="Print the last training report and model state")
+    parser.add_argument('--models', default='models')
+    parser.add_argument('--report', default='model_evaluation_report.txt')
+    args = parser.parse_args(argv)
+
+    report_path = Path(args.report)
+    if report_path.exists():
+        print(report_path.read_text())
+    else:
+        print(f"{report_path} not found; run: python pipeline.py train")
+
+    # File names as ml_training.TRAINING_STATE / DRIFT_REPORT (not imported, to stay cheap)
+    state_path = Path(args.models) / 'training_state.json'
+    if state_path.exists():
+        state = json.loads(state_path.read_text())
+        print(f"Saved model ({state_path}): {state.get('backend', 'random_forest')}, "
+              f"{state['rows_seen']} rows seen, last participant {state['last_participant_id']}, "
+              f"updated {state.get('updated_at', '?')}")
+        for entry in state.get('history', []):
+            print(f"  {entry['at']}  {entry['mode']:<12} rows={entry['rows_seen']}"
+                  f"  trees={entry['n_estimators']}")
+
+    drift_path = Path(args.models) / 'drift_report.json'
+    if drift_path.exists():
+        drift = json.loads(drift_path.read_text())
+        flagged = drift['drifted_features']
+        print(f"Last drift check ({drift.get('at', '?')}): depression rate "
+              f"{drift['label_rate_before']:.3f} -> {drift['label_rate_new']:.3f}, "
+              f"{len(flagged)} drifted feature(s){': ' + ', '.join(flagged) if flagged else ''}")
+
+
+COMMANDS = {
+    'sync': (_sync, "push submissions collected offline (SQLite) to MySQL"),
+    'export': (_export, "export the study database to all_participant_data.csv"),
+    'extract': (_extract, "extract typing/linguistic features -> processed_dataset.csv"),
+    'train': (_train, "train, evaluate and save the classifier"),
+    'score': (_score, "score an export with the saved model"),
+    'report': (_report, "print the last training report and model state"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Offline pipeline for the typing-pattern depression study",
+        epilog="Run 'python pipeline.py <command> --help' for a command's options.")
+    subparsers = parser.add_subparsers(dest='command', metavar='command', required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        # Options are parsed by the module itself, so its --help is the one shown
+        subparsers.add_parser(name, help=help_text, add_help=False)
+    args, rest = parser.parse_known_args(argv)
+    COMMANDS[args.command][0](rest)
+
+
+if __name__ == "__main__":
+    main()
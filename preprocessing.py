@@ -0,0 +1,101 @@
+"""
+preprocessing.py
+Fitted preprocessing shared by training (ml_training.py) and serving
+(demo_app.py), saved next to the model as models/preprocessor.pkl.
+
+Column order, the float64 cast, median imputation and standardisation are
+fit once on the training split and folded into one affine map per column,
+so a batch or a single live row is transformed by one vectorised expression:
+
+    x' = x * inv_scale + offset        (missing -> fill)
+"""
+
+import numpy as np
+
+
+class Preprocessor:
+    """
+    Column order + float64 cast + median fill + standardisation.
+    medians=None leaves NaN in place (backends with native missing-value
+    support); mean=None skips standardisation. scale defaults to sqrt(var).
+    """
+
+    def __init__(self, feature_names, medians=None, mean=None, scale=None, var=None, n_samples_seen=0):
+        n = len(feature_names)
+        self.feature_names = list(feature_names)
+        self.medians = None if medians is None else np.asarray(medians, dtype=np.float64)
+        self.standardize = mean is not None
+        self.mean = np.zeros(n) if mean is None else np.asarray(mean, dtype=np.float64)
+        if scale is None:
+            scale = np.ones(n) if var is None else _safe_scale(np.asarray(var, dtype=np.float64))
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.var = self.scale ** 2 if var is None else np.asarray(var, dtype=np.float64)
+        self.n_samples_seen = n_samples_seen
+        self._fuse()
+
+    def _fuse(self):
+        self.inv_scale_ = 1.0 / self.scale
+        self.offset_ = -self.mean * self.inv_scale_
+        self.fill_ = None if self.medians is None else self.medians * self.inv_scale_ + self.offset_
+
+    @classmethod
+    def fit(cls, X, impute=True, standardize=True):
+        """Fit on a DataFrame of raw feature columns (the training split)"""
+        values = X.to_numpy(dtype=np.float64)
+        medians = None
+        if impute:
+            # Columns with no observed values are filled with 0
+            with np.errstate(all='ignore'):
+                medians = np.nan_to_num(np.nanmedian(values, axis=0), nan=0.0) if len(values) \
+                    else np.zeros(values.shape[1])
+            values = np.where(np.isnan(values), medians, values)
+        mean = scale = var = None
+        if standardize:
+            mean = np.nanmean(values, axis=0)
+            var = np.nanvar(values, axis=0)
+            scale = _safe_scale(var)
+        return cls(X.columns, medians, mean, scale, var, n_samples_seen=len(values))
+
+    def transform(self, X):
+        """DataFrame (any column order; absent columns count as missing) or array in feature order"""
+        if hasattr(X, 'reindex'):
+            X = X.reindex(columns=self.feature_names)
+        values = np.asarray(X, dtype=np.float64)
+        out = values * self.inv_scale_ + self.offset_
+        if self.fill_ is not None:
+            np.copyto(out, np.broadcast_to(self.fill_, out.shape), where=np.isnan(values))
+        return out
+
+    def transform_row(self, features):
+        """One feature dict (missing keys are imputed) -> 1 x n_features array"""
+        row = np.fromiter((features.get(name, np.nan) for name in self.feature_names),
+                          dtype=np.float64, count=len(self.feature_names))
+        return self.transform(row[None, :])
+
+    def partial_fit(self, X):
+        """Fold more rows into the standardisation statistics; medians stay fixed"""
+        if not self.standardize:
+            return self
+        values = X.reindex(columns=self.feature_names).to_numpy(dtype=np.float64) \
+            if hasattr(X, 'reindex') else np.asarray(X, dtype=np.float64)
+        if self.medians is not None:
+            values = np.where(np.isnan(values), self.medians, values)
+        n_a, n_b = self.n_samples_seen, len(values)
+        if n_b == 0:
+            return self
+        mean_b, var_b = values.mean(axis=0), values.var(axis=0)
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        m2 = self.var * n_a + var_b * n_b + delta ** 2 * n_a * n_b / n
+        self.mean = self.mean + delta * n_b / n
+        self.var = m2 / n
+        self.scale = _safe_scale(self.var)
+        self.n_samples_seen = n
+        self._fuse()
+        return self
+
+
+def _safe_scale(var):
+    # As StandardScaler: constant columns are left unscaled
+    scale = np.sqrt(var)
+    return np.where(scale > 10 * np.finfo(np.float64).eps, scale, 1.0)
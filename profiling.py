@@ -0,0 +1,162 @@
+"""
+profiling.py
+Opt-in stage profiling for csv_feature_extraction.py and ml_training.py.
+
+Nothing is recorded unless PIPELINE_PROFILE=1 is set; otherwise the
+decorated stages are returned untouched at import time and cost nothing.
+
+Environment variables:
+    PIPELINE_PROFILE=1            record wall/CPU time, peak RSS and allocations per stage
+    PIPELINE_PROFILE_DIR=profiles where reports are written
+    PIPELINE_PROFILE_CPROFILE=1   also dump <stage>.prof (pstats / snakeviz / py-spy compatible)
+    PIPELINE_PROFILE_FLAME=1      also sample stacks into <stage>.folded (flamegraph.pl / speedscope)
+
+Usage:
+    PIPELINE_PROFILE=1 PIPELINE_PROFILE_FLAME=1 python ml_training.py
+"""
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ENABLED = os.environ.get("PIPELINE_PROFILE") == "1"
+PROFILE_DIR = Path(os.environ.get("PIPELINE_PROFILE_DIR", "profiles"))
+USE_CPROFILE = os.environ.get("PIPELINE_PROFILE_CPROFILE") == "1"
+USE_FLAME = os.environ.get("PIPELINE_PROFILE_FLAME") == "1"
+SAMPLE_INTERVAL = 0.005
+
+_stats = {}
+_depth = 0
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's stack at a fixed interval into folded-stack counts"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _record(name, wall, cpu, rss_before, rss_after, blocks):
+    entry = _stats.setdefault(name, {
+        "calls": 0, "wall_s": 0.0, "cpu_s": 0.0,
+        "peak_rss_mb": None, "rss_growth_mb": 0.0, "alloc_blocks": 0,
+    })
+    entry["calls"] += 1
+    entry["wall_s"] += wall
+    entry["cpu_s"] += cpu
+    entry["alloc_blocks"] += blocks
+    if rss_after is not None:
+        entry["peak_rss_mb"] = max(entry["peak_rss_mb"] or 0, rss_after)
+        entry["rss_growth_mb"] += rss_after - rss_before
+
+
+def profile_stage(name=None):
+    """
+    Decorator marking a pipeline stage. Nested stages (e.g. per-row
+    linguistic features inside process_csv) are aggregated by call count;
+    cProfile and stack sampling only run for the outermost stage.
+    """
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        stage = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            global _depth
+            outermost = _depth == 0
+            profiler = sampler = None
+            if outermost and USE_CPROFILE:
+                import cProfile
+                profiler = cProfile.Profile()
+            if outermost and USE_FLAME:
+                sampler = _StackSampler(threading.get_ident())
+                sampler.start()
+
+            rss_before = _peak_rss_mb()
+            blocks_before = sys.getallocatedblocks()
+            wall0, cpu0 = time.perf_counter(), time.process_time()
+            _depth += 1
+            try:
+                if profiler is not None:
+                    return profiler.runcall(fn, *args, **kwargs)
+                return fn(*args, **kwargs)
+            finally:
+                _depth -= 1
+                wall = time.perf_counter() - wall0
+                cpu = time.process_time() - cpu0
+                blocks = sys.getallocatedblocks() - blocks_before
+                _record(stage, wall, cpu, rss_before, _peak_rss_mb(), blocks)
+
+                if profiler is not None or sampler is not None:
+                    PROFILE_DIR.mkdir(exist_ok=True)
+                if profiler is not None:
+                    profiler.dump_stats(str(PROFILE_DIR / f"{stage}.prof"))
+                if sampler is not None:
+                    sampler.stop()
+                    with open(PROFILE_DIR / f"{stage}.folded", "w") as f:
+                        for stack, count in sampler.samples.most_common():
+                            f.write(f"{stack} {count}\n")
+
+        return wrapper
+    return decorator
+
+
+def report():
+    """Print the per-stage table and save it as JSON"""
+    if not _stats:
+        return
+    print("\n" + "=" * 80)
+    print("STAGE PROFILE")
+    print("=" * 80)
+    print(f"{'stage':<30}{'calls':>7}{'wall s':>10}{'cpu s':>10}{'peak RSS MB':>13}{'alloc blocks':>14}")
+    for stage, s in sorted(_stats.items(), key=lambda kv: -kv[1]["wall_s"]):
+        rss = f"{s['peak_rss_mb']:.1f}" if s["peak_rss_mb"] is not None else "n/a"
+        print(f"{stage:<30}{s['calls']:>7}{s['wall_s']:>10.3f}{s['cpu_s']:>10.3f}{rss:>13}{s['alloc_blocks']:>14}")
+
+    PROFILE_DIR.mkdir(exist_ok=True)
+    path = PROFILE_DIR / f"stages_{Path(sys.argv[0]).stem or 'python'}.json"
+    path.write_text(json.dumps(_stats, indent=2))
+    print(f"\nStage profile saved to {path}")
+
+
+if ENABLED:
+    atexit.register(report)
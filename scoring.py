@@ -0,0 +1,97 @@
+"""
+scoring.py
+Batch scoring of an export (all_participant_data.csv format) with the saved
+model: the training feature kernels (features.build_feature_frame), the
+fitted models/preprocessor.pkl and, when they were saved, the text and
+embedding blocks in the order DepressionClassifier._with_extra stacks them.
+
+Usage:
+    python scoring.py all_participant_data.csv
+    python scoring.py new_participants.csv --models models --output scores.csv
+"""
+
+import argparse
+from pathlib import Path
+
+OUTPUT_PATH = 'scores.csv'
+
+
+def load_bundle(model_dir='models'):
+    """Saved model, preprocessor and optional blocks, as demo_app.load_model"""
+    import joblib
+
+    model_dir = Path(model_dir)
+    model_path = model_dir / 'depression_classifier.pkl'
+    preprocessor_path = model_dir / 'preprocessor.pkl'
+    if not (model_path.exists() and preprocessor_path.exists()):
+        raise FileNotFoundError(f"{model_path} / {preprocessor_path} not found; run ml_training.py first")
+
+    def optional(name):
+        path = model_dir / name
+        return joblib.load(path) if path.exists() else None
+
+    return {
+        'model': joblib.load(model_path),
+        'preprocessor': joblib.load(preprocessor_path),
+        'text_vectorizer': optional('text_vectorizer.pkl'),
+        'embedding_encoder': optional('embedding_encoder.pkl'),
+        'multi_target': optional('multi_target.pkl'),
+    }
+
+
+def score_frame(df, bundle):
+    """Raw export DataFrame -> participant_id, probability, prediction (+ PHQ-9 estimates)"""
+    import numpy as np
+    import pandas as pd
+
+    import features
+
+    X = bundle['preprocessor'].transform(features.build_feature_frame(df))
+    texts = df['free_writing_text'].fillna('').astype(str).tolist()
+    if bundle['embedding_encoder'] is not None:
+        embedding = bundle['embedding_encoder'].encode(texts).astype(np.float16).astype(np.float32)
+    if bundle['text_vectorizer'] is not None:
+        import scipy.sparse as sp
+        blocks = [sp.csr_matrix(X), bundle['text_vectorizer'].transform(texts)]
+        if bundle['embedding_encoder'] is not None:
+            blocks.append(sp.csr_matrix(embedding))
+        X = sp.hstack(blocks, format='csr')
+    elif bundle['embedding_encoder'] is not None:
+        X = np.hstack([X, embedding])
+
+    probability = bundle['model'].predict_proba(X)[:, 1]
+    scores = pd.DataFrame({
+        'participant_id': df['participant_id'].to_numpy(),
+        'depression_probability': probability,
+        'depression_prediction': bundle['model'].predict(X),
+    })
+    if bundle['multi_target'] is not None:
+        targets = bundle['multi_target']['targets']
+        levels = bundle['multi_target']['severity_levels']
+        total = targets['phq9_total']['model'].predict(X)
+        level = np.clip(np.rint(targets['phq9_severity']['model'].predict(X)), 0, len(levels) - 1)
+        scores['phq9_total_estimate'] = np.clip(total, 0.0, 27.0)
+        scores['phq9_severity_estimate'] = [levels[int(i)] for i in level]
+    return scores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score an export with the saved model")
+    parser.add_argument('input', nargs='?', default='all_participant_data.csv',
+                        help="export in all_participant_data.csv format")
+    parser.add_argument('--models', default='models', help="directory written by ml_training.py")
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+
+    df = pd.read_csv(args.input)
+    scores = score_frame(df, load_bundle(args.models))
+    scores.to_csv(args.output, index=False)
+    print(f"Scored {len(scores)} participants from {args.input} -> {args.output}")
+    print(f"Predicted depressed: {int(scores['depression_prediction'].sum())} "
+          f"({scores['depression_prediction'].mean():.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,19 @@ import uuid
 import random
 import string
 import base64
+import json
+import sqlite3
+import sys
+import threading
 from datetime import datetime
+from pathlib import Path
 import mysql.connector
+import mysql.connector.pooling
+
+from typing_component import typing_task
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "flask_app"))
+from local_store import COLLECTION_MODE, TABLES, already_saved, get_local_store  # noqa: E402
 
 # ─────────────────────────────────────────
 # Page config
@@ -18,22 +29,44 @@ st.set_page_config(
 )
 
 # ─────────────────────────────────────────
-# MySQL connection (credentials in st.secrets)
+# MySQL connection pool (credentials in st.secrets)
+# One pool per server process, shared by every Streamlit session, so
+# each save reuses an open TLS connection instead of handshaking again.
 # ─────────────────────────────────────────
+POOL_SIZE = 5
+POOL_WAIT_SECONDS = 5            # a save waits this long for a free connection before falling back
+SPOOL_DIR = Path("spool")        # JSON spool of earlier versions, moved into the local store
+SYNC_RETRY_SECONDS = 60
+
+@st.cache_resource
+def get_pool():
+    return mysql.connector.pooling.MySQLConnectionPool(
+        pool_name="collector",
+        pool_size=POOL_SIZE,
+        pool_reset_session=True,
+        host=st.secrets["mysql"]["host"],
+        port=int(st.secrets["mysql"]["port"]),
+        user=st.secrets["mysql"]["user"],
+        password=st.secrets["mysql"]["password"],
+        database=st.secrets["mysql"]["database"],
+        ssl_ca=st.secrets["mysql"].get("ssl_ca", None)
+    )
+
 def get_db():
-    try:
-        conn = mysql.connector.connect(
-            host=st.secrets["mysql"]["host"],
-            port=int(st.secrets["mysql"]["port"]),
-            user=st.secrets["mysql"]["user"],
-            password=st.secrets["mysql"]["password"],
-            database=st.secrets["mysql"]["database"],
-            ssl_ca=st.secrets["mysql"].get("ssl_ca", None)
-        )
-        return conn
-    except Exception as e:
-        st.error(f"Database connection error: {e}")
-        return None
+    """Check a connection out of the pool, reconnecting it if the server dropped it"""
+    # get_connection() raises PoolError at once when every connection is checked
+    # out; a save holds one for well under a second, so wait briefly for a free one
+    deadline = time.monotonic() + POOL_WAIT_SECONDS
+    while True:
+        try:
+            conn = get_pool().get_connection()
+            break
+        except mysql.connector.errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+    conn.ping(reconnect=True, attempts=2, delay=1)
+    return conn
 
 # ─────────────────────────────────────────
 # Session state initialization
@@ -46,8 +79,6 @@ if "participant_data" not in st.session_state:
     st.session_state.participant_data = {}
 if "keystroke_data" not in st.session_state:
     st.session_state.keystroke_data = []
-if "task_start_time" not in st.session_state:
-    st.session_state.task_start_time = None
 if "consent_screenshot" not in st.session_state:
     st.session_state.consent_screenshot = None
 
@@ -85,81 +116,157 @@ def interpret_phq9(score):
 # ─────────────────────────────────────────
 # Save to MySQL
 # ─────────────────────────────────────────
-def save_to_mysql():
+INSERT_SQL = {
+    "participants": """
+        INSERT INTO participants
+            (participant_id, session_id, ip_address, age, gender,
+             year_of_study, consent_timestamp, data_version, collection_date)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    """,
+    "phq9_responses": """
+        INSERT INTO phq9_responses
+            (participant_id, phq9_total, phq9_severity, depression_label,
+             q1,q2,q3,q4,q5,q6,q7,q8,q9)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    """,
+    "typing_data": """
+        INSERT INTO typing_data
+            (participant_id,
+             copy_task_duration, copy_task_word_count, copy_task_char_count, copy_task_text,
+             free_writing_duration, free_writing_word_count, free_writing_char_count, free_writing_text)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    """,
+    "consent_records": """
+        INSERT INTO consent_records
+            (participant_id, session_id, ip_address, consent_timestamp,
+             screenshot_base64, data_version, notes)
+        VALUES (%s,%s,%s,%s,%s,%s,%s)
+    """,
+}
+
+def build_submission():
+    """Collect the four table rows for this session into a JSON-serialisable record"""
+    pid   = st.session_state.participant_data["demographics"]["participant_id"]
+    sid   = st.session_state.session_id
+    ip    = get_ip()
+    demo  = st.session_state.participant_data["demographics"]
+    phq9  = st.session_state.participant_data["phq9"]
+    copy_task  = st.session_state.keystroke_data[0] if len(st.session_state.keystroke_data) > 0 else {}
+    free_task  = st.session_state.keystroke_data[1] if len(st.session_state.keystroke_data) > 1 else {}
+    now   = datetime.now().isoformat(sep=" ", timespec="seconds")
+
+    return {
+        "participant_id": pid,
+        "rows": {
+            "participants": [pid, sid, ip, demo["age"], demo["gender"], demo["year_of_study"], now, "v2", now],
+            "phq9_responses": [
+                pid, phq9["total_score"], phq9["severity"],
+                1 if phq9["total_score"] >= 10 else 0,
+                *phq9["individual_scores"]
+            ],
+            "typing_data": [
+                pid,
+                copy_task.get("duration", 0),
+                len(copy_task.get("text_content", "").split()),
+                len(copy_task.get("text_content", "")),
+                copy_task.get("text_content", ""),
+                free_task.get("duration", 0),
+                len(free_task.get("text_content", "").split()),
+                len(free_task.get("text_content", "")),
+                free_task.get("text_content", ""),
+            ],
+            "consent_records": [pid, sid, ip, now, st.session_state.consent_screenshot, "v2", None],
+        },
+    }
+
+def record_inserts(record):
+    """(table, sql, params) for each row, in foreign-key order (local_store.LocalStore.write)"""
+    return [(table, INSERT_SQL[table], record["rows"][table]) for table in TABLES]
+
+def write_submission(record):
+    """Write all four rows in a single transaction; nothing is kept if any insert fails"""
+    conn = get_db()
+    cursor = conn.cursor()
     try:
-        conn = get_db()
-        if conn is None:
-            return False
-        cursor = conn.cursor()
-
-        pid   = st.session_state.participant_data["demographics"]["participant_id"]
-        sid   = st.session_state.session_id
-        ip    = get_ip()
-        demo  = st.session_state.participant_data["demographics"]
-        phq9  = st.session_state.participant_data["phq9"]
-        copy_task  = st.session_state.keystroke_data[0] if len(st.session_state.keystroke_data) > 0 else {}
-        free_task  = st.session_state.keystroke_data[1] if len(st.session_state.keystroke_data) > 1 else {}
-        now   = datetime.now()
-
-        # participants
-        cursor.execute("""
-            INSERT INTO participants
-                (participant_id, session_id, ip_address, age, gender,
-                 year_of_study, consent_timestamp, data_version, collection_date)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """, (pid, sid, ip, demo["age"], demo["gender"], demo["year_of_study"], now, "v2", now))
-
-        # phq9_responses
-        cursor.execute("""
-            INSERT INTO phq9_responses
-                (participant_id, phq9_total, phq9_severity, depression_label,
-                 q1,q2,q3,q4,q5,q6,q7,q8,q9)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            pid, phq9["total_score"], phq9["severity"],
-            1 if phq9["total_score"] >= 10 else 0,
-            *phq9["individual_scores"]
-        ))
-
-        # typing_data
-        cursor.execute("""
-            INSERT INTO typing_data
-                (participant_id,
-                 copy_task_duration, copy_task_word_count, copy_task_char_count, copy_task_text,
-                 free_writing_duration, free_writing_word_count, free_writing_char_count, free_writing_text)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            pid,
-            copy_task.get("duration", 0),
-            len(copy_task.get("text_content", "").split()),
-            len(copy_task.get("text_content", "")),
-            copy_task.get("text_content", ""),
-            free_task.get("duration", 0),
-            len(free_task.get("text_content", "").split()),
-            len(free_task.get("text_content", "")),
-            free_task.get("text_content", ""),
-        ))
-
-        # consent_records
-        cursor.execute("""
-            INSERT INTO consent_records
-                (participant_id, session_id, ip_address, consent_timestamp,
-                 screenshot_base64, data_version, notes)
-            VALUES (%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            pid, sid, ip, now,
-            st.session_state.consent_screenshot,
-            "v2", None
-        ))
-
+        conn.start_transaction()
+        for _, sql, params in record_inserts(record):
+            cursor.execute(sql, params)
         conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
         cursor.close()
-        conn.close()
+        conn.close()   # returns the connection to the pool
+
+def write_local(record):
+    """Write to the local store; a repeat of a submission already there counts as saved"""
+    try:
+        get_local_store().write(record_inserts(record))
+    except sqlite3.IntegrityError as e:
+        if not already_saved(e):
+            raise
+
+def import_spool(store):
+    """Move submissions spooled as JSON by earlier versions into the local store"""
+    for path in sorted(SPOOL_DIR.glob("*.json")):
+        try:
+            store.write(record_inserts(json.loads(path.read_text())))
+        except sqlite3.IntegrityError:
+            pass                  # already imported
+        path.unlink()
+
+@st.cache_resource
+def start_sync_worker():
+    """One background thread per server process that pushes the local store to MySQL"""
+    store = get_local_store()
+    import_spool(store)
+    def run():
+        while True:
+            time.sleep(SYNC_RETRY_SECONDS)
+            try:
+                if store.counts().get("pending"):
+                    outcomes = store.sync(get_db)
+                    if outcomes["failed"] or outcomes["conflict"]:
+                        print(f"local-sync: {outcomes['failed']} submissions rejected by MySQL, "
+                              f"{outcomes['conflict']} with a colliding participant_id; "
+                              "see `python flask_app/local_store.py status`")
+            except Exception as e:
+                print(f"local-sync: {e}; retrying in {SYNC_RETRY_SECONDS}s")
+    worker = threading.Thread(target=run, name="local-sync", daemon=True)
+    worker.start()
+    return worker
+
+if COLLECTION_MODE != "local":
+    start_sync_worker()
+
+def save_to_mysql():
+    try:
+        record = build_submission()
+    except Exception as e:
+        st.error(f"Error preparing your response: {e}")
+        return False
+
+    if COLLECTION_MODE == "local":
+        # Lab session without network: `python flask_app/local_store.py sync` uploads later
+        write_local(record)
         return True
 
+    try:
+        write_submission(record)
+    except (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError,
+            mysql.connector.errors.PoolError) as e:
+        # MySQL unreachable: the sync worker uploads it once it is back
+        write_local(record)
+        st.warning(f"Database unavailable ({e}). Your response was stored locally "
+                   "and will be uploaded automatically.")
     except Exception as e:
-        st.error(f"Error saving to database: {e}")
+        if already_saved(e):
+            return True           # a double submit of a response MySQL already has
+        # MySQL refused the rows themselves; a local copy would fail to sync the same way
+        st.error(f"Error saving your response: {e}")
         return False
+    return True
 
 # ─────────────────────────────────────────
 # Stage 0: Consent & Demographics
@@ -295,34 +402,19 @@ elif st.session_state.stage == 2:
     st.info("Please type the text shown below exactly as written. Type naturally at your normal pace.")
     st.text_area("Reference Text", value=COPY_TEXT, height=150, disabled=True, key="copy_reference")
 
-    if "copy_task_started" not in st.session_state:
-        st.session_state.copy_task_started = False
-        st.session_state.copy_task_text = ""
-
-    if not st.session_state.copy_task_started:
-        if st.button("Start Task", type="primary"):
-            st.session_state.copy_task_started = True
-            st.session_state.task_start_time = time.time()
-            st.rerun()
-    else:
-        typed_text = st.text_area("Your typing:", value=st.session_state.copy_task_text, height=150, key="copy_input")
-        st.session_state.copy_task_text = typed_text
-        st.caption(f"Words typed: {len(typed_text.split())}")
-
-        if st.button("Complete Task", type="primary"):
-            if len(typed_text.strip()) < 50:
-                st.error("Please type more text before completing.")
-            else:
-                st.session_state.keystroke_data.append({
-                    "task": "copy_task",
-                    "start_time": st.session_state.task_start_time,
-                    "end_time": time.time(),
-                    "text_content": typed_text,
-                    "duration": time.time() - st.session_state.task_start_time
-                })
-                st.session_state.stage = 3
-                st.session_state.copy_task_started = False
-                st.rerun()
+    result = typing_task(key="copy_task", label="Your typing:", height=150, min_chars=50)
+
+    if result is not None:
+        st.session_state.keystroke_data.append({
+            "task": "copy_task",
+            "start_time": result["start_time"],
+            "end_time": result["end_time"],
+            "text_content": result["text"],
+            "duration": result["duration"],
+            "keystrokes": result["keystrokes"]
+        })
+        st.session_state.stage = 3
+        st.rerun()
 
 # ─────────────────────────────────────────
 # Stage 3: Free Writing
@@ -332,38 +424,22 @@ elif st.session_state.stage == 3:
     st.markdown("---")
     st.info(FREE_WRITING_PROMPT)
 
-    if "free_task_started" not in st.session_state:
-        st.session_state.free_task_started = False
-        st.session_state.free_task_text = ""
-
-    if not st.session_state.free_task_started:
-        if st.button("Start Task", type="primary"):
-            st.session_state.free_task_started = True
-            st.session_state.task_start_time = time.time()
-            st.rerun()
-    else:
-        typed_text = st.text_area("Write here (aim for 3-4 minutes):", value=st.session_state.free_task_text, height=200, key="free_input")
-        st.session_state.free_task_text = typed_text
-
-        elapsed = time.time() - st.session_state.task_start_time
-        col1, col2 = st.columns(2)
-        with col1: st.caption(f"⏱️ Time: {int(elapsed // 60)}:{int(elapsed % 60):02d}")
-        with col2: st.caption(f"📝 Words: {len(typed_text.split())}")
-
-        if st.button("Complete Task", type="primary"):
-            if len(typed_text.strip()) < 50:
-                st.error("Please write more before completing.")
-            else:
-                st.session_state.keystroke_data.append({
-                    "task": "free_writing",
-                    "start_time": st.session_state.task_start_time,
-                    "end_time": time.time(),
-                    "text_content": typed_text,
-                    "duration": time.time() - st.session_state.task_start_time
-                })
-                st.session_state.stage = 4
-                st.session_state.free_task_started = False
-                st.rerun()
+    result = typing_task(
+        key="free_writing", label="Write here (aim for 3-4 minutes):", height=200, min_chars=50,
+        min_chars_error="Please write more before completing."
+    )
+
+    if result is not None:
+        st.session_state.keystroke_data.append({
+            "task": "free_writing",
+            "start_time": result["start_time"],
+            "end_time": result["end_time"],
+            "text_content": result["text"],
+            "duration": result["duration"],
+            "keystrokes": result["keystrokes"]
+        })
+        st.session_state.stage = 4
+        st.rerun()
 
 # ─────────────────────────────────────────
 # Stage 4: Completion
@@ -0,0 +1,112 @@
+"""
+text_features.py
+Optional hashed n-gram TF-IDF representation of free_writing_text.
+
+The hashing trick keeps the feature space a fixed size however large the
+vocabulary grows, so fitting only has to count document frequencies and
+both fit and transform can stream over the raw CSV in chunks. The result
+is stored as a sparse CSR matrix next to processed_dataset.csv:
+
+    processed_dataset_text.npz      CSR matrix, one row per participant
+    processed_dataset_text.pkl      fitted HashedTfidf (needed to transform new text)
+
+Usage:
+    python csv_feature_extraction.py --text-features
+"""
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+TEXT_COLUMN = 'free_writing_text'
+CHUNK_SIZE = 10_000
+
+
+class HashedTfidf:
+    """
+    Word (1-2 gram) and character (3-5 gram) hashed TF-IDF.
+    Columns [0, word_features) are word n-grams, the rest character n-grams.
+    """
+
+    def __init__(self, word_features=2 ** 16, char_features=2 ** 16,
+                 word_ngrams=(1, 2), char_ngrams=(3, 5)):
+        self.word_features = word_features
+        self.char_features = char_features
+        self.word_ngrams = word_ngrams
+        self.char_ngrams = char_ngrams
+        self.idf_ = None
+        self.n_docs_ = 0
+        self._doc_freq = None
+
+    @property
+    def n_features(self):
+        return self.word_features + self.char_features
+
+    def feature_names(self):
+        return ([f'text_word_hash_{i}' for i in range(self.word_features)]
+                + [f'text_char_hash_{i}' for i in range(self.char_features)])
+
+    def _vectorizers(self):
+        common = dict(lowercase=True, alternate_sign=False, norm=None, dtype=np.float32)
+        return (
+            HashingVectorizer(analyzer='word', ngram_range=self.word_ngrams,
+                              n_features=self.word_features, **common),
+            HashingVectorizer(analyzer='char_wb', ngram_range=self.char_ngrams,
+                              n_features=self.char_features, **common),
+        )
+
+    def _term_counts(self, texts):
+        texts = ['' if not isinstance(t, str) else t for t in texts]
+        word_vec, char_vec = self._vectorizers()
+        return sp.hstack([word_vec.transform(texts), char_vec.transform(texts)], format='csr')
+
+    def partial_fit(self, texts):
+        """Accumulate document frequencies from one chunk of texts"""
+        counts = self._term_counts(texts)
+        if self._doc_freq is None:
+            self._doc_freq = np.zeros(self.n_features, dtype=np.int64)
+        self._doc_freq += np.bincount(counts.indices, minlength=self.n_features)
+        self.n_docs_ += counts.shape[0]
+        # Smoothed idf, as sklearn's TfidfTransformer(smooth_idf=True)
+        self.idf_ = (np.log((1 + self.n_docs_) / (1 + self._doc_freq)) + 1).astype(np.float32)
+        return self
+
+    def transform(self, texts):
+        """Sublinear tf * idf, L2-normalised per row; returns CSR"""
+        counts = self._term_counts(texts)
+        np.log1p(counts.data, out=counts.data)
+        counts = counts @ sp.diags(self.idf_, format='csr')
+        return normalize(counts, norm='l2', copy=False).tocsr()
+
+
+def _read_text_chunks(csv_path, chunksize):
+    for chunk in pd.read_csv(csv_path, usecols=[TEXT_COLUMN], chunksize=chunksize):
+        yield chunk[TEXT_COLUMN].tolist()
+
+
+def build_text_features(csv_path, output_prefix='processed_dataset_text',
+                        chunksize=CHUNK_SIZE, **vectorizer_kwargs):
+    """
+    Two streaming passes over csv_path: fit document frequencies, then
+    transform chunk by chunk. Memory is bounded by one chunk plus the output.
+    """
+    tfidf = HashedTfidf(**vectorizer_kwargs)
+    for texts in _read_text_chunks(csv_path, chunksize):
+        tfidf.partial_fit(texts)
+
+    blocks = [tfidf.transform(texts) for texts in _read_text_chunks(csv_path, chunksize)]
+    matrix = sp.vstack(blocks, format='csr') if blocks else sp.csr_matrix((0, tfidf.n_features))
+
+    matrix_path = f'{output_prefix}.npz'
+    model_path = f'{output_prefix}.pkl'
+    sp.save_npz(matrix_path, matrix, compressed=True)
+    joblib.dump(tfidf, model_path)
+    return matrix_path, model_path, matrix
+
+
+def load_text_features(output_prefix='processed_dataset_text'):
+    """Return (CSR matrix, fitted HashedTfidf)"""
+    return sp.load_npz(f'{output_prefix}.npz').tocsr(), joblib.load(f'{output_prefix}.pkl')
@@ -0,0 +1,38 @@
+"""
+typing_component.py
+Browser-side typing task for streamlit_collector.py and demo_app.py.
+
+st.text_area reruns the whole script on every edit; this component keeps
+the text, timer, word count and keystroke timings in the browser and
+returns them to Python once, when the participant presses Complete.
+"""
+
+from pathlib import Path
+
+import streamlit.components.v1 as components
+
+_typing_task = components.declare_component(
+    "typing_task",
+    path=str(Path(__file__).parent / "components" / "typing_task"),
+)
+
+
+def typing_task(key, label="", placeholder="", height=150, min_chars=50,
+                min_chars_error="Please type more text before completing.",
+                start_label="Start Task", complete_label="Complete Task"):
+    """
+    Render a typing task. Returns None until the task is completed, then a dict:
+        text, start_time, end_time, duration (seconds, epoch-based)
+        keystrokes: [[ms since start, hold ms, kind], ...]  kind 0=char 1=delete 2=other
+    """
+    return _typing_task(
+        key=key,
+        label=label,
+        placeholder=placeholder,
+        height=height,
+        min_chars=min_chars,
+        min_chars_error=min_chars_error,
+        start_label=start_label,
+        complete_label=complete_label,
+        default=None,
+    )
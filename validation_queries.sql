@@ -83,11 +83,12 @@ WHERE t.copy_task_duration > 0 AND t.free_writing_duration > 0
 GROUP BY q.depression_label;
 
 
--- 11. Consent records audit (v2 should all have screenshots)
+-- 11. Consent records audit (v2 should all have a screenshot or a consent record)
 SELECT data_version,
        COUNT(*) AS total,
        SUM(CASE WHEN screenshot_base64 IS NOT NULL THEN 1 ELSE 0 END) AS with_screenshot,
-       SUM(CASE WHEN screenshot_base64 IS NULL THEN 1 ELSE 0 END) AS without_screenshot
+       SUM(CASE WHEN consent_sha256 IS NOT NULL THEN 1 ELSE 0 END) AS with_record,
+       SUM(CASE WHEN screenshot_base64 IS NULL AND consent_sha256 IS NULL THEN 1 ELSE 0 END) AS without_proof
 FROM consent_records
 GROUP BY data_version;
 